@@ -0,0 +1,34 @@
+import argparse
+parser = argparse.ArgumentParser(description="Benchmark interferogram generation, Chambolle labelling and dataset storage")
+parser.add_argument('output', type=str, help="Path to the JSON file with results")
+parser.add_argument('--sizes', type=int, nargs='+', default=[128, 256], help="Sizes of images")
+parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8], help="Numbers of images solved at once by Chambolle projection")
+parser.add_argument('--workers', type=int, nargs='+', default=[1], help="Numbers of worker processes of generation and labelling")
+parser.add_argument('--images', type=int, default=16, help="Number of images in single measurement")
+parser.add_argument('--repeat', type=int, default=3, help="Number of measurements of every result, the fastest one is reported")
+parser.add_argument('--only', type=str, nargs='+', default=None, help="Benchmarks to run: interferogram, generation, chambolle, labelling, storage (Default is all)")
+parser.add_argument('--compare', type=str, default=None, help="JSON file of previous run, regressions are printed and the script exits with code 1")
+parser.add_argument('--threshold', type=float, default=0.1, help="Relative change reported by comparison")
+args = parser.parse_args()
+
+import json
+import sys
+
+from src.benchmarks import BENCHMARKS, runBenchmarks, compareBenchmarks
+
+if __name__ == "__main__":
+    report = runBenchmarks(args.sizes, args.batch_sizes, args.workers, args.images, BENCHMARKS if args.only is None else args.only, args.repeat, args.output)
+
+    for result in report["results"]:
+        print("{benchmark:>13} {variant:>28} size {size:5d} batch {batchSize:3d} workers {workers:3d}: {imagesPerSec:10.2f} images/sec".format(**result))
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        changes = compareBenchmarks(baseline, report, args.threshold)
+        for change in changes:
+            print("{} {} {} size {} batch {} workers {}: {} {:.4g} -> {:.4g} ({:+.1%})".format(
+                "REGRESSION" if change["regression"] else "improvement", change["benchmark"], change["variant"], change["size"],
+                change["batchSize"], change["workers"], change["metric"], change["baseline"], change["current"], change["change"]))
+        if any(change["regression"] for change in changes):
+            sys.exit(1)
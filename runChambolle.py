@@ -5,12 +5,20 @@ parser.add_argument('output', type=str, help="Name of the output file")
 parser.add_argument('version', type=int, help="Which version of Chambolle algorithm to use, 0 for Stop Criterion, 1 for Reference image")
 parser.add_argument('number_of_images', type=int, help="Number of images to process")
 parser.add_argument('starting_image', type=int, help="Number of starting image")
+parser.add_argument('--batch-size', type=int, default=1, help="Number of images labelled at once on CPU")
+parser.add_argument('--group-size', type=int, default=None, help="Number of consecutive images of the same object (Frequencies_Per_Object), each solve starts from the previous solution of the object")
+parser.add_argument('--workers', type=int, default=1, help="Number of worker processes labelling on CPU, job with more than one worker is resumed when run again")
+parser.add_argument('--dtype', type=str, default='float64', choices=['float64', 'float32'], help="Floating point type of Chambolle iterations on CPU, float32 is faster but labels can differ by few iterations")
+parser.add_argument('--tile-memory', type=float, default=None, help="Solve every image in tiles that fit in given megabytes, for images larger than memory")
+parser.add_argument('--cache', type=str, default=None, help="Directory of cache of labels, images labelled by earlier runs with the same parameters are not solved again")
+parser.add_argument('--cache-size', type=float, default=1024, help="Maximal size of cache of labels in megabytes, the least recently used labels are removed")
+parser.add_argument('--cache-outputs', action='store_true', help="Store filtered images in cache of labels as well")
+parser.add_argument('--metrics-jsonl', type=str, default=None, help="File that time of stages and counters are appended to as JSON lines")
+parser.add_argument('--metrics-prometheus', type=str, default=None, help="Prometheus text file with time of stages and counters, replaced on every export")
+parser.add_argument('--metrics-interval', type=float, default=10.0, help="Time between exports of metrics in seconds")
 args = parser.parse_args()
 
 import numpy as np
-import cupy as cp
-from PIL import Image
-import matplotlib.pyplot as plt
 import time
 
 import os, sys, inspect
@@ -18,8 +26,13 @@ cmd_subfolder = os.path.realpath(os.path.abspath(os.path.join(os.path.split(insp
 if cmd_subfolder not in sys.path:
     sys.path.insert(0, cmd_subfolder)
 
-from src.chambolleProjectionGPU import chambolleProjectionGPU, gpuChambolleProjectionStopCriterion
 from src.chambolleProjection import chambolleProjection, chambolleProjectionStopCriterion
+from src.chambolleProjectionBatch import chambolleProjectionBatch, chambolleProjectionStopCriterionBatch
+from src import gpuAvailable
+from src.imagePairLoader import imagePairLoader
+from src.parallelLabelling import runLabelling
+from src.labelCache import LabelCache
+from src.metrics import Metrics
 
 def runChambolle(images_folder, outputFile, version = 1, number_of_images = 1, starting_image = 0):
     '''
@@ -32,7 +45,7 @@ def runChambolle(images_folder, outputFile, version = 1, number_of_images = 1, s
     Parameters
     ----------
     images_folder : str
-        folder with images for Chambole input
+        folder with images for Chambole input, either BMP dataset or folder of array shards
     outputFile : str
         name of the csv file to put results
     version : int
@@ -43,23 +56,14 @@ def runChambolle(images_folder, outputFile, version = 1, number_of_images = 1, s
         id of the image from which algorithm should start 
     '''
 
-    INTERFEROGRAM_PATH = images_folder + "Interferogram\\"
-    FRINGES_PATH = images_folder + "Fringes\\"
+    load = imagePairLoader(images_folder)
     OUTPUTFILE = ".\\Results\\Labels\\" + outputFile
 
     csv_file = open(OUTPUTFILE, "a")
     
     try:
         for i in range(starting_image, starting_image + number_of_images):
-            filename = str(i) + ".bmp"
-
-            f_path = INTERFEROGRAM_PATH + filename
-            f = np.array(Image.open(f_path).convert('L'))
-            f = np.divide(f - np.min(f), np.max(f) - np.min(f))
-            
-            f_ref_path = FRINGES_PATH + filename
-            f_ref = np.array(Image.open(f_ref_path).convert('L'))
-            f_ref = np.divide(f_ref - np.min(f_ref), np.max(f_ref) - np.min(f_ref))
+            filename, f, f_ref = load(i)
 
             start_time = time.time()
             v = np.array([])
@@ -81,6 +85,59 @@ def runChambolle(images_folder, outputFile, version = 1, number_of_images = 1, s
     except KeyboardInterrupt:
         csv_file.close()
 
+def runChambolleBatch(images_folder, outputFile, version = 1, number_of_images = 1, starting_image = 0, batch_size = 16):
+    '''
+    Function to find number of iterations for Chambolle projection algorithm for stacks of images. This function works on CPU.
+    Results are saved to csv file.
+
+    Source: 
+    Cywińska, Maria, Maciej Trusiak, and Krzysztof Patorski. "Automatized fringe pattern preprocessing using unsupervised variational image decomposition." Optics express 27.16 (2019): 22542-22562.
+
+    Parameters
+    ----------
+    images_folder : str
+        folder with images for Chambole input, either BMP dataset or folder of array shards
+    outputFile : str
+        name of the csv file to put results
+    version : int
+        version of Chambolle algorithm to use, 0 for Stop Criterio, 1 for Reference image
+    number_of_images : int
+        number of consecutive images to be processed
+    starting_image : int
+        id of the image from which algorithm should start 
+    batch_size : int
+        number of images labelled at once
+    '''
+
+    load = imagePairLoader(images_folder)
+    OUTPUTFILE = ".\\Results\\Labels\\" + outputFile
+
+    csv_file = open(OUTPUTFILE, "a")
+    
+    try:
+        for start in range(starting_image, starting_image + number_of_images, batch_size):
+            stop = min(start + batch_size, starting_image + number_of_images)
+            filenames, f, f_ref = zip(*[load(i) for i in range(start, stop)])
+            f = np.array(f)
+            f_ref = np.array(f_ref)
+
+            start_time = time.time()
+            if version == 0:
+                [v, its, rms] = chambolleProjectionBatch(f, f_ref)
+            elif version == 1:
+                [v, its, rms] = chambolleProjectionStopCriterionBatch(f)
+            stop_time = time.time()
+
+            for k in range(len(filenames)):
+                csv_file.write("{},{}\n".format(filenames[k], its[k]))
+                print("File: {}".format(filenames[k]))
+                print("RMS = {}, Itarations: {}".format(rms[k], its[k]))
+            print("--- {} seconds ---".format(stop_time - start_time))
+
+        csv_file.close()
+    except KeyboardInterrupt:
+        csv_file.close()
+
 def runChambolleGPU(images_folder, outputFile, version = 1, number_of_images = 1, starting_image = 0):
     '''
     Function to find number of iterations for Chambolle projection algorithm for specific image. This function works on GPU.
@@ -92,7 +149,7 @@ def runChambolleGPU(images_folder, outputFile, version = 1, number_of_images = 1
     Parameters
     ----------
     images_folder : str
-        folder with images for Chambole input
+        folder with images for Chambole input, either BMP dataset or folder of array shards
     outputFile : str
         name of the csv file to put results
     version : int
@@ -103,23 +160,19 @@ def runChambolleGPU(images_folder, outputFile, version = 1, number_of_images = 1
         id of the image from which algorithm should start 
     '''
 
-    INTERFEROGRAM_PATH = images_folder + "Interferogram\\"
-    FRINGES_PATH = images_folder + "Fringes\\"
+    import cupy as cp
+    from src.chambolleProjectionGPU import chambolleProjectionGPU, gpuChambolleProjectionStopCriterion
+
+    load = imagePairLoader(images_folder)
     OUTPUTFILE = ".\\Results\\Labels\\" + outputFile
 
     csv_file = open(OUTPUTFILE, "a")
     
     try:
         for i in range(starting_image, starting_image + number_of_images):
-            filename = str(i) + ".bmp"
-
-            f_path = INTERFEROGRAM_PATH + filename
-            f = cp.array(Image.open(f_path).convert('L'))
-            f = cp.divide(f - cp.min(f), cp.max(f) - cp.min(f))
-            
-            f_ref_path = FRINGES_PATH + filename
-            f_ref = cp.array(Image.open(f_ref_path).convert('L'))
-            f_ref = cp.divide(f_ref - cp.min(f_ref), cp.max(f_ref) - cp.min(f_ref))
+            filename, f, f_ref = load(i)
+            f = cp.asarray(f)
+            f_ref = cp.asarray(f_ref)
 
             start_time = time.time()
             v = cp.array([])
@@ -141,13 +194,24 @@ def runChambolleGPU(images_folder, outputFile, version = 1, number_of_images = 1
         csv_file.close()
 
 if __name__ == "__main__":
-    cuda = cp.cuda.runtime.getDeviceCount()
-    print("Number of CUDA compatible devices:")
-    print(cuda)
-
-    if cuda != 0:
+    if gpuAvailable():
         print("Chambolle will run on GPU!")
         runChambolleGPU(args.images_folder, args.output, args.version, args.number_of_images, args.starting_image)
     else:
         print("Chambolle will run on CPU!")
-        runChambolle(args.images_folder, args.output, args.version, args.number_of_images, args.starting_image)
\ No newline at end of file
+        metrics = None
+        if args.metrics_jsonl is not None or args.metrics_prometheus is not None:
+            metrics = Metrics(exportInterval = args.metrics_interval, jsonLinesFile = args.metrics_jsonl, prometheusFile = args.metrics_prometheus)
+
+        cache = None
+        if args.cache is not None:
+            cache = LabelCache(args.cache, int(args.cache_size * 2**20), args.cache_outputs)
+
+        if args.workers > 1 or args.group_size is not None or metrics is not None or args.dtype != 'float64' or cache is not None or args.tile_memory is not None:
+            runLabelling(args.images_folder, ".\\Results\\Labels\\" + args.output, args.version, args.number_of_images, args.starting_image, args.workers, args.batch_size, groupSize = args.group_size, metrics = metrics, dtype = np.dtype(args.dtype), cache = cache, tileMemory = None if args.tile_memory is None else int(args.tile_memory * 2**20))
+            if metrics is not None:
+                print(metrics.summary())
+        elif args.batch_size > 1:
+            runChambolleBatch(args.images_folder, args.output, args.version, args.number_of_images, args.starting_image, args.batch_size)
+        else:
+            runChambolle(args.images_folder, args.output, args.version, args.number_of_images, args.starting_image)
\ No newline at end of file
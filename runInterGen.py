@@ -1,19 +1,35 @@
 import argparse
 parser = argparse.ArgumentParser(description="Generate interferogram images")
 parser.add_argument('results_folder', type=str, help="Absolute directory of the folder where to put the results")
+parser.add_argument('--workers', type=int, default=1, help="Number of processes used for generation")
+parser.add_argument('--writer-threads', type=int, default=0, help="Number of threads saving images in background, 0 to save synchronously")
+parser.add_argument('--grayscale', action='store_true', help="Save 8-bit single-channel images instead of RGB")
+parser.add_argument('--shards', action='store_true', help="Write float32 array shards with sample parameters instead of BMP images")
+parser.add_argument('--compress', action='store_true', help="Compress array shards")
+parser.add_argument('--dtype', type=str, default='float64', choices=['float64', 'float32'], help="Floating point type of generation, float32 uses half of memory and is faster")
+parser.add_argument('--chebyshev-sweep', action='store_true', help="Calculate frequencies of every object from single cosine per fringe orientation with Chebyshev recurrence")
+parser.add_argument('--seed', type=int, default=None, help="Root seed of the generation, the same seed reproduces the dataset")
+parser.add_argument('--metrics-jsonl', type=str, default=None, help="File that time of stages and counters are appended to as JSON lines")
+parser.add_argument('--metrics-prometheus', type=str, default=None, help="Prometheus text file with time of stages and counters, replaced on every export")
+parser.add_argument('--metrics-interval', type=float, default=10.0, help="Time between exports of metrics in seconds")
 args = parser.parse_args()
 
+import os
 import time
 import json
 
 from src.InterferogramGenerator import InterferogramFromRandomPolynomials
+from src.imageWriter import ImageWriter
+from src.shardStore import ShardWriter
+from src.metrics import Metrics
+from src.randomState import resolveSeed
 
-def InterGen(results_folder, settings_filename):
+def InterGen(results_folder, settings_filename, workers = 1, seed = None, writerThreads = 0, grayscale = False, shards = False, compress = False, metrics = None, dtype = 'float64', chebyshevSweep = False):
     settings_file = open(settings_filename)
     data = json.load(settings_file)
     settings_file.close()
     
-    InGen = InterferogramFromRandomPolynomials(data['Image_Size'])
+    InGen = InterferogramFromRandomPolynomials(data['Image_Size'], dtype = dtype)
     InGen.setFrequencyBoundaries(
         data['Frequencies']['Min_Frequency'], 
         data['Frequencies']['Max_Frequency']
@@ -22,14 +38,37 @@ def InterGen(results_folder, settings_filename):
         data['Orientation']['Min_Orientation_Angle'], 
         data['Orientation']['Max_Orientation_Angle']
         )
+    if writerThreads > 0 or grayscale:
+        InGen.setImageWriter(ImageWriter(max(writerThreads, 1), grayscale = grayscale))
+    if shards:
+        InGen.setArrayStore(ShardWriter(results_folder, compressed = compress))
+    if metrics is not None:
+        InGen.setMetrics(metrics)
+    InGen.setChebyshevSweep(chebyshevSweep)
+
+    # Seed drawn for the run is printed and saved with the settings, so the dataset can be regenerated with --seed
+    seed = resolveSeed(seed)
+    print("Root seed: %d" % seed)
+    os.makedirs(results_folder, exist_ok = True)
+    with open(os.path.join(results_folder, os.path.basename(settings_filename)), "w") as settings_file:
+        json.dump(dict(data, Seed = seed), settings_file, indent = 4)
+
     InGen.generateALODI2(
         data['Frequencies']['Frequencies_Per_Object'], 
         data['Number_Of_Images'], 
-        results_folder
+        results_folder,
+        workers = workers,
+        seed = seed
         )
 
 if __name__ == "__main__":
     start_time = time.time()
+
+    metrics = None
+    if args.metrics_jsonl is not None or args.metrics_prometheus is not None:
+        metrics = Metrics(exportInterval = args.metrics_interval, jsonLinesFile = args.metrics_jsonl, prometheusFile = args.metrics_prometheus)
     
-    InterGen(args.results_folder, "launchInterGen.json")
+    InterGen(args.results_folder, "launchInterGen.json", args.workers, args.seed, args.writer_threads, args.grayscale, args.shards, args.compress, metrics, args.dtype, args.chebyshev_sweep)
     print("Execution time: %.2f sec" % (time.time() - start_time))
+    if metrics is not None:
+        print(metrics.summary())
@@ -0,0 +1,19 @@
+import argparse
+parser = argparse.ArgumentParser(description="Pack dataset into memory-mapped arrays for Chambolle labelling")
+parser.add_argument('images_folder', type=str, help="Absolute directory of the dataset (BMP images or array shards)")
+parser.add_argument('output_folder', type=str, help="Absolute directory of the packed dataset")
+parser.add_argument('number_of_images', type=int, help="Number of images to pack")
+parser.add_argument('starting_image', type=int, help="Number of starting image")
+args = parser.parse_args()
+
+import time
+
+from src.imagePairLoader import imagePairLoader
+from src.memmapDataset import packMemmapDataset
+
+if __name__ == "__main__":
+    start_time = time.time()
+
+    load = imagePairLoader(args.images_folder)
+    packMemmapDataset(load, range(args.starting_image, args.starting_image + args.number_of_images), args.output_folder)
+    print("Execution time: %.2f sec" % (time.time() - start_time))
@@ -0,0 +1,28 @@
+import argparse
+parser = argparse.ArgumentParser(description="Compare solvers of Chambolle projection by iterations and time to reach the same error against reference image")
+parser.add_argument('images_folder', type=str, help="Absolute directory of the dataset (BMP images, array shards or memory-mapped dataset)")
+parser.add_argument('number_of_images', type=int, help="Number of images to use")
+parser.add_argument('starting_image', type=int, help="Number of starting image")
+parser.add_argument('--solvers', type=str, nargs='+', default=None, help="Solvers to compare: chambolle, fgp, primalDual (Default is all)")
+parser.add_argument('--max-iterations', type=int, default=20000, help="Number of iterations after which solver gives up reaching the target error")
+args = parser.parse_args()
+
+from src.imagePairLoader import imagePairLoader
+from src.solverBenchmark import solverBenchmark, summarizeSolverBenchmark
+
+if __name__ == "__main__":
+    load = imagePairLoader(args.images_folder)
+    results = solverBenchmark(load, range(args.starting_image, args.starting_image + args.number_of_images), args.solvers, maxIterations = args.max_iterations)
+
+    for result in results:
+        print("File: {}, solver: {}, iterations: {}, time: {:.3f} sec, RMS = {:.5f} (target {:.5f}){}".format(
+            result["image"], result["solver"], result["iterations"], result["time"], result["rms"], result["target"],
+            "" if result["reached"] else ", target not reached"))
+
+    print()
+    for solver, summary in summarizeSolverBenchmark(results).items():
+        if summary["reached"] == 0:
+            print("{}: target reached for 0 of {} images".format(solver, summary["images"]))
+        else:
+            print("{}: target reached for {} of {} images, median iterations: {:.0f}, median time: {:.3f} sec".format(
+                solver, summary["reached"], summary["images"], summary["iterations"], summary["time"]))
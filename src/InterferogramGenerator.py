@@ -1,15 +1,18 @@
-from numba import jit
+import itertools
 import numpy as np
 import math
-from PIL import Image, ImageOps
-import matplotlib.pyplot as plt
+from PIL import Image
 
-from src.gauss_n import gauss_n
-from src.generateRandomPolynomial import generateRandomPolynomial
+from src.gauss_n import separableGauss
+from src.generateRandomPolynomial import drawPolynomialCoefficients, contractBasis, separablePolynomial
+from src.gridCache import coordinateAxis, coordinateGrid, monomialBasis, monomialBasisFits
 from src.generateSphericalObject import generateSphericalObject
-from src.normalizeImage import normalizeImage
-from src.progressBar import progressBar
-from src.chambolleProjection import chambolleProjection
+from src.normalizeImage import normalizeImage, normalizeImageStack
+from src.interferogramBatch import separableInterferogramBatch, sphericalInterferogramBatch, phaseShiftedInterferograms, chebyshevSweepBatch
+from src.metrics import reportProgress, stopwatch, timer
+from src.parallelGeneration import runSharded, streamSharded
+from src.randomState import resolveSeed, sampleGenerator
+from src.imageWriter import encodeRescaled
 
 class InterferogramGenerator:
     """
@@ -22,7 +25,9 @@ class InterferogramGenerator:
     allInterferograms : numpy.ndarray
         array that stores images of interferograms (Optional to use)
     _X, _Y : numpy.ndarray
-        distribution of values from -1 to 1
+        distribution of values from -1 to 1, read-only grids shared by instances of the same size
+    _axis : numpy.ndarray
+        values from -1 to 1 along rows and columns of `_X` and `_Y`, separable functions are calculated from it
     _size : int
         size of the interferogram image
     _minFrequency : int
@@ -35,10 +40,26 @@ class InterferogramGenerator:
         maximal orientation angle of fringe pattern
     _a : numpy.ndarray
         function of background of fringe pattern
+    _gauss : numpy.ndarray
+        read-only default gaussian background, envelope of polynomial backgrounds
     _b : numpy.ndarray
         function of amplitude of fringe pattern
     _n : numpy.ndarray
         function of noise of fringe pattern
+    _rng : numpy.random.Generator
+        random generator of the instance
+    _dtype : numpy.dtype
+        floating point type of grids, functions and generated images
+    _writer : ImageWriter
+        background writer used to save images, None if images are saved synchronously
+    _store : ShardWriter
+        chunked array store that samples are written to, None if images are saved to files
+    _chebyshevSweep : bool
+        True if frequency sweeps of `generateALODI2` are calculated with Chebyshev recurrence
+    _metrics : Metrics
+        metrics that receive time of stages of generation, None if they are not collected
+    lastSeed : int
+        root seed of the last generation run or stream, its samples are regenerated from it, None before the first run
 
     Methods
     -------
@@ -50,8 +71,24 @@ class InterferogramGenerator:
         Sets background function of interferogram
     setNoiseFunction(noise)
         Sets noise function of interferogram
+    setImageWriter(writer)
+        Sets background writer used to save images
+    setArrayStore(store)
+        Sets chunked array store that generated samples are written to instead of image files
+    setMetrics(metrics)
+        Sets metrics that receive time of stages of generation and report its progress
+    setChebyshevSweep(enabled)
+        Sets if frequency sweeps of single object are calculated with Chebyshev recurrence
     createInterferogram(angle, frequency, codedObject)
         Returns single interferogram image
+    createInterferograms(angles, frequencies, codedObject, backgrounds = None, out = None)
+        Returns stack of interferogram images computed in one vectorized pass
+    createSphericalInterferograms(obj, frequencies, backgrounds = None, out = None)
+        Returns stack of interferogram images of spherical fringes computed in one vectorized pass
+    createPhaseShiftedInterferograms(angle, frequency, phaseObject, shifts = 4, out = None)
+        Returns sequence of phase shifted interferogram images of single object
+    createFrequencySweep(phaseObject, step, orders, angles = None, backgrounds = None, out = None)
+        Returns stack of interferogram images of single object with frequencies that are multiples of `step`
     createMultipleInterferograms(codedObject, numOfFrequencies, numOfOrientations)
         Creates multiple interferogram images and stores them in `self.allInterferograms`
     saveInterferograms(folder, startNum = 0)
@@ -59,22 +96,36 @@ class InterferogramGenerator:
     """
     allInterferograms = []
     
-    def __init__(self, N):
+    def __init__(self, N, seed = None, dtype = np.float64):
         """
         Parameters
         ----------
         N : int
             Size of the image
+        seed : None, int or numpy.random.Generator
+            Seed of the random generator of the instance (Default is fresh entropy)
+        dtype : numpy.dtype
+            Floating point type of generated images, float32 halves memory and is faster (Default is float64)
         """
-        self._X, self._Y = np.meshgrid(np.linspace(-1, 1, N), np.linspace(-1, 1, N))
+        self._rng = np.random.default_rng(seed)
+        self._dtype = np.dtype(dtype)
+        self._X, self._Y = coordinateGrid(N, self._dtype)
+        self._axis = coordinateAxis(N, self._dtype)
         self._size = N
         self._minFrequency = 1
         self._maxFrequency = 1000
         self._minOrientationAngle = 0.0
         self._maxOrientationAngle = math.pi
-        self._a = gauss_n(self._X, self._Y)
+        self._gauss = separableGauss(self._axis, self._axis, 0.0, 0.0, 1.0, 3.0, np.empty((N, N), dtype = self._dtype))
+        self._gauss.setflags(write = False)
+        self._a = self._gauss
         self._b = 1.0
-        self._n = 0.075*np.random.normal(0.0, 1.0, (self._size, self._size))
+        self._n = (0.075*self._rng.normal(0.0, 1.0, (self._size, self._size))).astype(self._dtype, copy = False)
+        self._writer = None
+        self._store = None
+        self._metrics = None
+        self._chebyshevSweep = False
+        self.lastSeed = None
     
     def setFrequencyBoundaries(self, minF, maxF):
         '''
@@ -126,6 +177,77 @@ class InterferogramGenerator:
         '''
         self._n = noise
 
+    def setImageWriter(self, writer):
+        '''
+        Sets background writer used to save images
+
+        Parameters
+        ----------
+        writer : ImageWriter
+            writer that encodes and saves images in background threads, None to save images synchronously
+        '''
+        self._writer = writer
+        if writer is not None and self._metrics is not None:
+            writer.setMetrics(self._metrics)
+
+    def setArrayStore(self, store):
+        '''
+        Sets chunked array store that generated samples are written to instead of image files
+
+        Parameters
+        ----------
+        store : ShardWriter
+            store that writes float32 samples with their parameters into shards, None to save image files
+        '''
+        self._store = store
+
+    def setMetrics(self, metrics):
+        '''
+        Sets metrics that receive time of stages of generation and report its progress instead of progress bar.
+        Metrics are passed to image writer as well.
+
+        Parameters
+        ----------
+        metrics : Metrics
+            metrics of the run, None to draw only throttled progress bar
+        '''
+        self._metrics = metrics
+        if self._writer is not None:
+            self._writer.setMetrics(metrics)
+
+    def setChebyshevSweep(self, enabled):
+        '''
+        Sets if frequency sweeps of single object in `generateALODI2` are calculated with `createFrequencySweep`.
+        Images differ from ones calculated directly only by rounding.
+
+        Parameters
+        ----------
+        enabled : bool
+            True to use Chebyshev recurrence, False to evaluate cosine of every image (Default of the instance)
+        '''
+        self._chebyshevSweep = enabled
+
+    def _runSeed(self, seed, metadata = False):
+        '''
+        Returns root seed of new run, see `resolveSeed`, and keeps it in `lastSeed`, so runs with drawn seed can be regenerated.
+        If `metadata` is True and array store is set, seed is written to metadata of the store as well.
+        '''
+        self.lastSeed = resolveSeed(self._rng if seed is None else seed)
+        if metadata and self._store is not None:
+            self._store.writeMetadata({'seed': self.lastSeed})
+        return self.lastSeed
+
+    def _flushOutputs(self):
+        '''
+        Waits until images queued in background writer are saved and writes buffered samples of array store
+        '''
+        if self._writer is not None:
+            with timer(self._metrics, "writerWait"):
+                self._writer.flush()
+        if self._store is not None:
+            with timer(self._metrics, "write"):
+                self._store.flush()
+
     def createInterferogram(self, angle, frequency, phaseObject, absMaxValue = 1, normalized = False):
         '''
         Returns single interferogram image
@@ -139,8 +261,9 @@ class InterferogramGenerator:
         phaseObject : numpy.ndarray
             object to be coded in the phase of the interferogram
         '''
-        phi = math.pi / 2 * (math.cos(angle) * self._X + math.sin(angle) * self._Y) + phaseObject
-        I = self._a + self._b*np.cos(frequency * phi) + self._n
+        phi = math.pi / 2 * self._carrier(angle) + phaseObject
+        # Integer frequency drawn by numpy would promote float32 images to float64
+        I = self._a + self._b*np.cos(self._dtype.type(frequency) * phi) + self._n
         return (normalizeImage(I, normFactor = absMaxValue) * normalized) + (I * (not normalized))
     
     def createSphericalInterferogram(self, obj, frequency = 1.0, absMaxValue = 1, normalized = False):
@@ -154,7 +277,168 @@ class InterferogramGenerator:
         '''
         I = self._a + self._b*np.cos(frequency * obj) + self._n
         return (normalizeImage(I, normFactor = absMaxValue) * normalized) + (I * (not normalized))
-    
+
+    def createInterferograms(self, angles, frequencies, phaseObject, backgrounds = None, absMaxValue = 1, normalized = False, out = None):
+        '''
+        Returns stack of interferogram images computed in one vectorized pass
+
+        Attributes
+        ----------
+        angles : numpy.ndarray
+            orientation angle of fringe pattern for every image
+        frequencies : numpy.ndarray
+            spatial frequency of fringe pattern for every image
+        phaseObject : numpy.ndarray
+            object to be coded in the phase of the interferograms
+        backgrounds : numpy.ndarray
+            background function for every image of shape (batch, N, N) (Default is `self._a` for all images)
+        out : numpy.ndarray
+            preallocated buffer of shape (batch, N, N) to write images to (Default is new array)
+        '''
+        angles, frequencies = np.broadcast_arrays(np.atleast_1d(np.asarray(angles, dtype=np.float64)), np.atleast_1d(np.asarray(frequencies, dtype=np.float64)))
+        out = self._batchBuffer(angles.shape[0], out)
+        separableInterferogramBatch(self._axis, self._axis, phaseObject, angles, frequencies, self._batchBackgrounds(backgrounds, out), float(self._b), self._n, out)
+        if normalized:
+            normalizeImageStack(out, absMaxValue)
+        return out
+
+    def createSphericalInterferograms(self, obj, frequencies, backgrounds = None, absMaxValue = 1, normalized = False, out = None):
+        '''
+        Returns stack of interferogram images of spherical fringes computed in one vectorized pass
+
+        Attributes
+        ----------
+        obj : numpy.ndarray
+            spherical object coded in the phase of the interferograms
+        frequencies : numpy.ndarray
+            spatial frequency of fringe pattern for every image
+        backgrounds : numpy.ndarray
+            background function for every image of shape (batch, N, N) (Default is `self._a` for all images)
+        out : numpy.ndarray
+            preallocated buffer of shape (batch, N, N) to write images to (Default is new array)
+        '''
+        frequencies = np.atleast_1d(np.asarray(frequencies, dtype=np.float64))
+        out = self._batchBuffer(frequencies.shape[0], out)
+        sphericalInterferogramBatch(obj, frequencies, self._batchBackgrounds(backgrounds, out), float(self._b), self._n, out)
+        if normalized:
+            normalizeImageStack(out, absMaxValue)
+        return out
+
+    def createPhaseShiftedInterferograms(self, angle, frequency, phaseObject, shifts = 4, absMaxValue = 1, normalized = False, out = None):
+        '''
+        Returns sequence of phase shifted interferogram images of single object, e.g. for phase shifting interferometry.
+        Frames share object, background and noise, frame `k` is `createInterferogram(angle, frequency, phaseObject)`
+        with phase shifted by `shifts[k]`. Cosine and sine of the phase are evaluated once for all frames.
+
+        Attributes
+        ----------
+        angle : float
+            orientation angle of fringe pattern
+        frequency : float
+            spatial frequency of fringe pattern
+        phaseObject : numpy.ndarray
+            object to be coded in the phase of the interferograms
+        shifts : int or numpy.ndarray
+            phase shift of every frame, or number of frames K with shifts `2 * pi * k / K` (Default is 4)
+        normalized : bool
+            set to True to normalize whole sequence at once, so frames keep the same scale
+        out : numpy.ndarray
+            preallocated buffer of shape (K, N, N) to write frames to (Default is new array)
+        '''
+        if np.ndim(shifts) == 0:
+            shifts = 2 * math.pi * np.arange(shifts) / shifts
+        shifts = np.asarray(shifts, dtype=np.float64)
+        out = self._batchBuffer(shifts.shape[0], out)
+        phaseShiftedInterferograms(self._axis, self._axis, phaseObject, float(angle), float(frequency), shifts, self._a, float(self._b), self._n, out)
+        if normalized:
+            np.copyto(out, normalizeImage(out, normFactor = absMaxValue))
+        return out
+
+    def createFrequencySweep(self, phaseObject, step, orders, angles = None, backgrounds = None, absMaxValue = 1, normalized = False, out = None):
+        '''
+        Returns stack of interferogram images of single object whose frequencies are integer multiples of `step`.
+        Image `k` has frequency `step * orders[k]`, with `angles` it is the same as image of `createInterferograms`,
+        otherwise phase is the object alone like in `createSphericalInterferograms`. Images of the same angle are calculated
+        from single cosine with Chebyshev recurrence, so sweep of K frequencies costs one cosine per distinct angle.
+
+        Attributes
+        ----------
+        phaseObject : numpy.ndarray
+            object to be coded in the phase of the interferograms
+        step : float
+            base frequency
+        orders : numpy.ndarray
+            positive integer multiple of the base frequency for every image
+        angles : numpy.ndarray
+            orientation angle of fringe pattern for every image, None for fringes of the object alone
+        backgrounds : numpy.ndarray
+            background function for every image of shape (batch, N, N) (Default is `self._a` for all images)
+        out : numpy.ndarray
+            preallocated buffer of shape (batch, N, N) to write images to (Default is new array)
+        '''
+        orders = np.atleast_1d(np.asarray(orders, dtype=np.int64))
+        out = self._batchBuffer(orders.shape[0], out)
+        self._sweep(phaseObject, step, orders, angles, self._batchBackgrounds(backgrounds, out), self._n, out)
+        if normalized:
+            normalizeImageStack(out, absMaxValue)
+        return out
+
+    def _sweep(self, phaseObject, step, orders, angles, backgrounds, noise, out):
+        '''
+        Writes frequency sweep to `out`, images of every distinct angle are calculated by single Chebyshev recurrence
+        '''
+        if np.any(orders < 1):
+            raise ValueError("Orders of frequency sweep must be positive integers, got {}".format(orders))
+        step = self._dtype.type(step)
+        if angles is None:
+            groups = [(None, np.arange(orders.shape[0]))]
+        else:
+            angles = np.broadcast_to(np.asarray(angles, dtype=np.float64), orders.shape)
+            groups = [(angle, np.flatnonzero(angles == angle)) for angle in np.unique(angles)]
+
+        for angle, slots in groups:
+            slots = slots[np.argsort(orders[slots], kind = 'stable')]
+            if angle is None:
+                theta = step * phaseObject
+            else:
+                theta = step * (math.pi / 2 * self._carrier(angle) + phaseObject)
+            chebyshevSweepBatch(theta, orders[slots], slots, backgrounds, float(self._b), noise, out)
+        return out
+
+    def _carrier(self, angle):
+        '''
+        Returns linear carrier `cos(angle) * X + sin(angle) * Y` broadcast from the axes, so the grids are not read
+        '''
+        return math.cos(angle) * self._axis + math.sin(angle) * self._axis[:, np.newaxis]
+
+    def _polynomial(self, coefficients):
+        '''
+        Returns random polynomial with given coefficients evaluated on cached monomials of the image grid,
+        or evaluated from powers of the axes if monomials do not fit the grid cache
+        '''
+        n = coefficients.shape[0] // 3
+        if not monomialBasisFits(self._size, n, self._dtype):
+            return separablePolynomial(self._axis, self._axis, coefficients, np.empty((self._size, self._size), dtype = self._dtype))
+        return contractBasis(monomialBasis(self._size, n, self._dtype), coefficients)
+
+    def _batchBuffer(self, batch, out):
+        '''
+        Returns buffer for stack of `batch` images, allocates it if `out` is not given
+        '''
+        if out is None:
+            return np.empty((batch, self._size, self._size), dtype = self._dtype)
+        if out.shape != (batch, self._size, self._size):
+            raise ValueError("Output buffer of shape {} does not match batch of shape {}".format(out.shape, (batch, self._size, self._size)))
+        return out
+
+    def _batchBackgrounds(self, backgrounds, out):
+        '''
+        Returns stack of backgrounds matching `out`, defaults to `self._a` repeated for every image
+        '''
+        if backgrounds is None:
+            return np.broadcast_to(self._a, out.shape)
+        return backgrounds
+
     def createMultipleInterferograms(self, phaseObject, numOfFrequencies, numOfOrientations):
         '''
         Creates multiple interferogram images and stores them in `self.allInterferograms`
@@ -189,10 +473,15 @@ class InterferogramGenerator:
             starting number for numeration of filenames (Default is 0)
         '''
         for i in range(len(self.allInterferograms)):
-            rescaled = (255.0 / self.allInterferograms[i].max() * (self.allInterferograms[i] - self.allInterferograms[i].min())).astype(np.float64)
-            img = Image.fromarray(rescaled)
+            # Floating point images are stored by PIL in float32 anyway
+            rescaled = (255.0 / self.allInterferograms[i].max() * (self.allInterferograms[i] - self.allInterferograms[i].min())).astype(np.float32)
             filename = folder + str(i + startNum) + '.bmp'
-            img.convert('RGB').save(filename)
+            if self._writer is not None:
+                self._writer.submitRescaled(rescaled, filename)
+            else:
+                img = Image.fromarray(rescaled)
+                img.convert('RGB').save(filename)
+        self._flushOutputs()
 
 class InterferogramFromRandomPolynomials(InterferogramGenerator):
     """
@@ -206,11 +495,19 @@ class InterferogramFromRandomPolynomials(InterferogramGenerator):
         Sets range of spatial frequencies of interferogram
     generateALODI(numOfFrequencies, numOfOrientations, quantity, folder)
         Method to generate A Lot Of Different Interferograms
+    renderALODISample(index, seed)
+        Returns single interferogram of `generateALODI` run without saving it
+    renderALODI2Object(index, numOfFrequencies, seed)
+        Returns frequency sweep of single object of `generateALODI2` run without saving it
+    streamALODI(quantity = None, seed = None)
+        Yields samples of `generateALODI` run lazily instead of saving them
+    streamALODI2(numOfFrequencies, quantity = None, seed = None)
+        Yields samples of `generateALODI2` run lazily instead of saving them
     """
     
     def saveInterferogram(self, image, folder, interferogramNumber):
         '''
-        Saves single interferogram
+        Saves single interferogram, in background if image writer is set
 
         Attributes
         ----------
@@ -221,12 +518,19 @@ class InterferogramFromRandomPolynomials(InterferogramGenerator):
         interferogramNumber : int
             number that is going to be filename
         '''
-        rescaled = normalizeImage(image, normFactor=255).astype(np.float64)
-        img = Image.fromarray(rescaled)
         filename = folder + str(interferogramNumber) + '.bmp'
-        img.convert('RGB').save(filename)
-
-    def generateALODI(self, numOfFrequencies, numOfOrientations, quantity, folder, no_noise = True):
+        if self._writer is not None:
+            self._writer.submit(image, filename)
+        else:
+            lap = stopwatch(self._metrics)
+            rescaled = normalizeImage(image, normFactor=255)
+            lap("normalization")
+            img = encodeRescaled(rescaled)
+            lap("encoding")
+            img.save(filename)
+            lap("write")
+
+    def generateALODI(self, numOfFrequencies, numOfOrientations, quantity, folder, no_noise = True, workers = 1, seed = None):
         '''
         Generates multiple interferograms. Quantity is specified by user. 
         Interferograms are generated with random object in phase and random background function.
@@ -243,57 +547,149 @@ class InterferogramFromRandomPolynomials(InterferogramGenerator):
             path to folder in which image will be saved
         no_noise : bool
             set to True to generate without noise function
+        workers : int
+            number of processes to shard generation across (Default is 1)
+        seed : None, int or numpy.random.Generator
+            root seed of the run, every sample is regenerated by `renderALODISample(i, seed)` (Default is drawn from generator of the instance and kept in `lastSeed`)
         '''
-        x = np.linspace(-1, 1, self._size)
-        y = np.linspace(-1, 1, self._size)
-        X, Y = np.meshgrid(x, y)
-
         folder_fringes = folder + "\\Fringes\\"
         folder_interferogram = folder + "\\Interferogram\\"
+        seed = self._runSeed(seed, metadata = True)
 
-        for i in range(quantity):
-            objType = np.random.choice(np.arange(3), p=[0.01, 0.04, 0.95])
-            '''
-            0 -> Prazki liniowe
-            1 -> Prazki kolowe
-            2 -> Prazki wielomianowe stopnia najwyzej 3
-            '''
-            if objType == 0:
-                obj = generateRandomPolynomial(X, Y, 1)
-            elif objType == 2:
-                obj = generateRandomPolynomial(X, Y, 3)
-
-            bg = generateRandomPolynomial(X, Y, 4) * gauss_n(X, Y)
-            self.setBackgroundFunction(bg)
-            
-            if no_noise:
-                self.setNoiseFunction(np.zeros(bg.shape)) # For Chambolle
-                    
-            if objType == 1:
-                x0 = np.random.uniform(-0.5, 0.5)
-                y0 = np.random.uniform(-0.5, 0.5)
-                f = np.random.randint(0.5 * self._minFrequency, 2 * self._maxFrequency)
-                h = np.random.randint(-3, 3)
-
-                spObj = generateSphericalObject(X, Y, x0, y0, f, h)
-                I = self.createSphericalInterferogram(spObj)
-                refI = self._b*np.cos(spObj)
+        if workers > 1:
+            runSharded(self, '_generateALODISamples', quantity, (folder_fringes, folder_interferogram, no_noise, seed), workers)
+        else:
+            self._generateALODISamples(0, quantity, folder_fringes, folder_interferogram, no_noise, seed, quantity)
 
-                self.saveInterferogram(refI, folder_fringes, i)
-                self.saveInterferogram(I, folder_interferogram, i)
-            else:
-                freq = np.random.randint(self._minFrequency, self._maxFrequency)
-                angle = np.random.randint(self._minOrientationAngle, self._maxOrientationAngle)
+    def _generateALODISamples(self, start, stop, folder_fringes, folder_interferogram, no_noise, seed, quantity = None):
+        '''
+        Generates interferograms with numbers from range `[start, stop)` together with their reference fringes
+
+        Attributes
+        ----------
+        start : int
+            number of the first generated interferogram
+        stop : int
+            number after the last generated interferogram
+        folder_fringes : str
+            path to folder in which reference fringes will be saved
+        folder_interferogram : str
+            path to folder in which interferograms will be saved
+        no_noise : bool
+            set to True to generate without noise function
+        seed : int
+            root seed of the run
+        quantity : int
+            number of all generated interferograms, progress bar is shown only if it is given
 
-                I = self.createInterferogram(angle, freq, obj)
-                refI = self._b*np.cos(freq * (math.pi / 2 * (math.cos(angle) * self._X + math.sin(angle) * self._Y) + obj))
+        Returns
+        -------
+        count : int
+            number of generated interferograms
+        '''
+        for i in range(start, stop):
+            I, refI, bg, params = self.renderALODISample(i, seed, no_noise)
 
+            if self._store is not None:
+                with timer(self._metrics, "write"):
+                    self._store.append(i, I, refI, params)
+            else:
                 self.saveInterferogram(refI, folder_fringes, i)
                 self.saveInterferogram(I, folder_interferogram, i)
 
-            progressBar(i + 1, quantity, "Interferogram generation progress: ")
+            if self._metrics is not None:
+                self._metrics.count("images")
+            if quantity is not None:
+                reportProgress(self._metrics, i + 1, quantity, "Interferogram generation progress: ")
+
+        self._flushOutputs()
+        return stop - start
+
+    def renderALODISample(self, index, seed, no_noise = True):
+        '''
+        Returns single interferogram of `generateALODI` run together with its reference fringes.
+        Random stream of the sample depends only on `seed` and `index`.
+
+        Attributes
+        ----------
+        index : int
+            number of the interferogram
+        seed : int
+            root seed of the run
+        no_noise : bool
+            set to True to generate without noise function
+
+        Returns
+        -------
+        I : numpy.ndarray
+            interferogram
+        refI : numpy.ndarray
+            reference fringes without background function
+        bg : numpy.ndarray
+            background function
+        params : dict
+            parameters the sample was generated with
+        '''
+        X, Y = self._X, self._Y
+        lap = stopwatch(self._metrics)
+        rng = sampleGenerator(seed, index)
+        params = {'index': index, 'objType': 0, 'objCoefficients': None, 'sphere': None}
 
-    def generateALODI2(self, numOfFrequencies, quantity, folder, no_noise = True):
+        objType = rng.choice(np.arange(3), p=[0.01, 0.04, 0.95])
+        '''
+        0 -> Prazki liniowe
+        1 -> Prazki kolowe
+        2 -> Prazki wielomianowe stopnia najwyzej 3
+        '''
+        params['objType'] = int(objType)
+        if objType == 0:
+            objCoefficients = drawPolynomialCoefficients(1, rng)
+        elif objType == 2:
+            objCoefficients = drawPolynomialCoefficients(3, rng)
+        lap("rng")
+        if objType != 1:
+            obj = self._polynomial(objCoefficients)
+            params['objCoefficients'] = objCoefficients.tolist()
+            lap("object")
+
+        bgCoefficients = drawPolynomialCoefficients(4, rng)
+        lap("rng")
+        bg = self._polynomial(bgCoefficients) * self._gauss
+        params['bgCoefficients'] = bgCoefficients.tolist()
+        self.setBackgroundFunction(bg)
+        
+        if no_noise:
+            self.setNoiseFunction(np.zeros(bg.shape, dtype = self._dtype)) # For Chambolle
+        lap("background")
+                
+        if objType == 1:
+            x0 = rng.uniform(-0.5, 0.5)
+            y0 = rng.uniform(-0.5, 0.5)
+            f = rng.integers(0.5 * self._minFrequency, 2 * self._maxFrequency)
+            h = rng.integers(-3, 3)
+            params['sphere'] = {'x0': x0, 'y0': y0, 'f': int(f), 'h': int(h)}
+            params['frequency'] = 1.0
+            params['angle'] = None
+            lap("rng")
+
+            spObj = generateSphericalObject(X, Y, x0, y0, f, h)
+            lap("object")
+            I = self.createSphericalInterferogram(spObj)
+            refI = self._b*np.cos(spObj)
+        else:
+            freq = rng.integers(self._minFrequency, self._maxFrequency)
+            angle = rng.integers(self._minOrientationAngle, self._maxOrientationAngle)
+            params['frequency'] = float(freq)
+            params['angle'] = float(angle)
+            lap("rng")
+
+            I = self.createInterferogram(angle, freq, obj)
+            refI = self._b*np.cos(self._dtype.type(freq) * (math.pi / 2 * self._carrier(angle) + obj))
+        lap("interferogram")
+
+        return I, refI, bg, params
+
+    def generateALODI2(self, numOfFrequencies, quantity, folder, no_noise = True, workers = 1, seed = None):
         '''
         Generates multiple interferograms. Quantity is specified by user. 
         Interferograms are generated with random object in phase and random background function.
@@ -308,71 +704,287 @@ class InterferogramFromRandomPolynomials(InterferogramGenerator):
             path to folder in which image will be saved
         no_noise : bool
             set to True to generate without noise function
+        workers : int
+            number of processes to shard generation across (Default is 1)
+        seed : None, int or numpy.random.Generator
+            root seed of the run, every object is regenerated by `renderALODI2Object(i, numOfFrequencies, seed)` (Default is drawn from generator of the instance and kept in `lastSeed`)
         '''
-        x = np.linspace(-1, 1, self._size)
-        y = np.linspace(-1, 1, self._size)
-        X, Y = np.meshgrid(x, y)
+        imgNum = int(quantity / numOfFrequencies)
+        seed = self._runSeed(seed, metadata = True)
+
+        if workers > 1:
+            runSharded(self, '_generateALODI2Objects', imgNum, (numOfFrequencies, folder, no_noise, seed), workers, imagesPerUnit = numOfFrequencies)
+        else:
+            self._generateALODI2Objects(0, imgNum, numOfFrequencies, folder, no_noise, seed, quantity)
+
+    def _generateALODI2Objects(self, start, stop, numOfFrequencies, folder, no_noise, seed, quantity = None):
+        '''
+        Generates sweeps of `numOfFrequencies` interferograms for objects with numbers from range `[start, stop)`
+
+        Attributes
+        ----------
+        start : int
+            number of the first object
+        stop : int
+            number after the last object
+        numOfFrequencies : int
+            number of different frequencies of fringe pattern that single pattern will be generated with
+        folder : str
+            path to folder in which images will be saved
+        no_noise : bool
+            set to True to generate without noise function
+        seed : int
+            root seed of the run
+        quantity : int
+            number of all generated interferograms, progress bar is shown only if it is given
 
+        Returns
+        -------
+        count : int
+            number of generated interferograms
+        '''
         folder_interferogram = folder
 
-        imgNum = int(quantity / numOfFrequencies)
+        backgrounds = np.empty((numOfFrequencies, self._size, self._size), dtype = self._dtype)
+        images = np.empty((numOfFrequencies, self._size, self._size), dtype = self._dtype)
 
-        for i in range(imgNum):
-            objType = np.random.choice(np.arange(3), p=[0.01, 0.09, 0.90])
-            '''
-            0 -> Prazki liniowe
-            1 -> Prazki kolowe
-            2 -> Prazki wielomianowe stopnia najwyzej 3
-            '''
-            if objType == 0:
-                obj = generateRandomPolynomial(X, Y, 1)
-            elif objType == 2:
-                obj = generateRandomPolynomial(X, Y, 3)
-
-            if no_noise:
-                self.setNoiseFunction(np.zeros(X.shape)) # For Chambolle
-                    
-            freqScalar = (self._maxFrequency - self._minFrequency) / numOfFrequencies
-            
-            if objType == 1:
-                x0 = np.random.uniform(-0.5, 0.5)
-                y0 = np.random.uniform(-0.5, 0.5)
-                f = np.random.randint(0.5 * self._minFrequency, 2 * self._maxFrequency)
-                h = np.random.randint(-3, 3)
-
-                spObj = generateSphericalObject(X, Y, x0, y0, f, h)
-
-                for j in range(1, numOfFrequencies+1):
-                    # Background parameters
-                    mu_x = (1.0 + 0.5) * np.random.random_sample() - 0.5
-                    mu_y = (1.0 + 0.5) * np.random.random_sample() - 0.5
-                    amp = (1 - 0.5) * np.random.random_sample() + 0.5
-                    sigma = (4.5 - 1.5) * np.random.random_sample() + 1.5
-                    bg = gauss_n(X, Y, mu_x, mu_y, amp, sigma)
-                    self.setBackgroundFunction(bg)
-
-                    freq = freqScalar * j / 2
-                    I = self.createSphericalInterferogram(spObj, freq)
-                    self.saveInterferogram(I, folder_interferogram, i * numOfFrequencies + j)
-                    progressBar(i * numOfFrequencies + j, quantity, "Interferogram generation progress: ")
-            else:
-                for j in range(1, numOfFrequencies+1):
-                    # Background parameters
-                    mu_x = (1.0 + 0.5) * np.random.random_sample() - 0.5
-                    mu_y = (1.0 + 0.5) * np.random.random_sample() - 0.5
-                    amp = (1 - 0.5) * np.random.random_sample() + 0.5
-                    sigma = (4.5 - 1.5) * np.random.random_sample() + 1.5
-                    bg = gauss_n(X, Y, mu_x, mu_y, amp, sigma)
-                    self.setBackgroundFunction(bg)
+        references = np.empty((numOfFrequencies, self._size, self._size), dtype = self._dtype) if self._store is not None else None
 
-                    angle = np.random.randint(self._minOrientationAngle, self._maxOrientationAngle)
-                    freq = freqScalar * j
-                    I = self.createInterferogram(angle, freq, obj)
-                    self.saveInterferogram(I, folder_interferogram, i * numOfFrequencies + j)
-                    progressBar(i * numOfFrequencies + j, quantity, "Interferogram generation progress: ")
+        for i in range(start, stop):
+            _, _, _, params = self.renderALODI2Object(i, numOfFrequencies, seed, no_noise, out = images, backgrounds = backgrounds, references = references)
 
+            for j in range(1, numOfFrequencies+1):
+                if self._store is not None:
+                    with timer(self._metrics, "write"):
+                        self._store.append(i * numOfFrequencies + j, images[j-1], references[j-1], params[j-1])
+                else:
+                    self.saveInterferogram(images[j-1], folder_interferogram, i * numOfFrequencies + j)
+                if quantity is not None:
+                    reportProgress(self._metrics, i * numOfFrequencies + j, quantity, "Interferogram generation progress: ")
+            if self._metrics is not None:
+                self._metrics.count("images", numOfFrequencies)
 
-    def generateALODIandLabel(self, numOfFrequencies, numOfOrientations, quantity, folder, no_noise = True):
+        self._flushOutputs()
+        return (stop - start) * numOfFrequencies
+
+    def renderALODI2Object(self, index, numOfFrequencies, seed, no_noise = True, out = None, backgrounds = None, references = None):
+        '''
+        Returns frequency sweep of single object of `generateALODI2` run.
+        Random stream of the object depends only on `seed` and `index`.
+
+        Attributes
+        ----------
+        index : int
+            number of the object
+        numOfFrequencies : int
+            number of different frequencies of fringe pattern that single pattern will be generated with
+        seed : int
+            root seed of the run
+        no_noise : bool
+            set to True to generate without noise function
+        out : numpy.ndarray
+            preallocated buffer of shape (numOfFrequencies, N, N) for interferograms (Default is new array)
+        backgrounds : numpy.ndarray
+            preallocated buffer of shape (numOfFrequencies, N, N) for background functions (Default is new array)
+        references : numpy.ndarray
+            preallocated buffer of shape (numOfFrequencies, N, N) for reference fringes, they are computed only if it is given
+
+        Returns
+        -------
+        images : numpy.ndarray
+            stack of interferograms, image `images[j-1]` is saved under number `index * numOfFrequencies + j`
+        references : numpy.ndarray
+            stack of reference fringes without background function, None if buffer was not given
+        backgrounds : numpy.ndarray
+            stack of background functions
+        params : list
+            parameters every image of the stack was generated with
+        '''
+        X, Y = self._X, self._Y
+        lap = stopwatch(self._metrics)
+        rng = sampleGenerator(seed, index)
+
+        if backgrounds is None:
+            backgrounds = np.empty((numOfFrequencies, self._size, self._size), dtype = self._dtype)
+        angles = np.zeros(numOfFrequencies)
+        freqScalar = (self._maxFrequency - self._minFrequency) / numOfFrequencies
+        frequencies = freqScalar * np.arange(1, numOfFrequencies+1)
+        objParams = {'objType': 0, 'objCoefficients': None, 'sphere': None}
+        bgParams = []
+
+        objType = rng.choice(np.arange(3), p=[0.01, 0.09, 0.90])
+        '''
+        0 -> Prazki liniowe
+        1 -> Prazki kolowe
+        2 -> Prazki wielomianowe stopnia najwyzej 3
+        '''
+        objParams['objType'] = int(objType)
+        if objType == 0:
+            objCoefficients = drawPolynomialCoefficients(1, rng)
+        elif objType == 2:
+            objCoefficients = drawPolynomialCoefficients(3, rng)
+        lap("rng")
+        if objType != 1:
+            obj = self._polynomial(objCoefficients)
+            objParams['objCoefficients'] = objCoefficients.tolist()
+            lap("object")
+
+        if no_noise:
+            self.setNoiseFunction(np.zeros(X.shape, dtype = self._dtype)) # For Chambolle
+
+        if objType == 1:
+            x0 = rng.uniform(-0.5, 0.5)
+            y0 = rng.uniform(-0.5, 0.5)
+            f = rng.integers(0.5 * self._minFrequency, 2 * self._maxFrequency)
+            h = rng.integers(-3, 3)
+            objParams['sphere'] = {'x0': x0, 'y0': y0, 'f': int(f), 'h': int(h)}
+            lap("rng")
+
+            spObj = generateSphericalObject(X, Y, x0, y0, f, h)
+            frequencies = frequencies / 2
+            lap("object")
+
+        for j in range(1, numOfFrequencies+1):
+            # Background parameters
+            mu_x = (1.0 + 0.5) * rng.random() - 0.5
+            mu_y = (1.0 + 0.5) * rng.random() - 0.5
+            amp = (1 - 0.5) * rng.random() + 0.5
+            sigma = (4.5 - 1.5) * rng.random() + 1.5
+            lap("rng")
+            separableGauss(self._axis, self._axis, mu_x, mu_y, amp, sigma, backgrounds[j-1])
+            bgParams.append({'mu_x': mu_x, 'mu_y': mu_y, 'amp': amp, 'sigma': sigma})
+            lap("background")
+
+            if objType != 1:
+                angles[j-1] = rng.integers(self._minOrientationAngle, self._maxOrientationAngle)
+                lap("rng")
+
+        params = []
+        for j in range(1, numOfFrequencies+1):
+            params.append(dict(objParams, index = index * numOfFrequencies + j, frequency = float(frequencies[j-1]),
+                angle = None if objType == 1 else float(angles[j-1]), background = bgParams[j-1]))
+
+        zero = self._dtype.type(0)
+        if self._chebyshevSweep:
+            # Frequencies are multiples of the first one, spherical fringes have no carrier
+            orders = np.arange(1, numOfFrequencies+1)
+            phase, sweepAngles = (spObj, None) if objType == 1 else (obj, angles)
+            images = self.createFrequencySweep(phase, frequencies[0], orders, sweepAngles, backgrounds, out = out)
+            if references is not None:
+                self._sweep(phase, frequencies[0], orders, sweepAngles, np.broadcast_to(zero, references.shape), np.broadcast_to(zero, X.shape), references)
+        elif objType == 1:
+            images = self.createSphericalInterferograms(spObj, frequencies, backgrounds, out = out)
+            if references is not None:
+                sphericalInterferogramBatch(spObj, frequencies, np.broadcast_to(zero, references.shape), float(self._b), np.broadcast_to(zero, X.shape), references)
+        else:
+            images = self.createInterferograms(angles, frequencies, obj, backgrounds, out = out)
+            if references is not None:
+                separableInterferogramBatch(self._axis, self._axis, obj, angles, frequencies, np.broadcast_to(zero, references.shape), float(self._b), np.broadcast_to(zero, X.shape), references)
+        lap("interferogram")
+
+        return images, references, backgrounds, params
+
+    def streamALODI(self, quantity = None, no_noise = True, seed = None, start = 0, workers = 0, prefetch = None, chunkSize = 8):
+        '''
+        Yields samples of `generateALODI` run one by one instead of saving them, nothing is written to the disk.
+        Sample `i` is the same as `renderALODISample(i, seed, no_noise)`, so stream is reproducible for given seed.
+        Samples are rendered when they are requested, or prefetched by background worker processes if `workers` is given.
+
+        Attributes
+        ----------
+        quantity : int
+            number of samples, None for endless stream
+        no_noise : bool
+            set to True to generate without noise function
+        seed : None, int or numpy.random.Generator
+            root seed of the run (Default is drawn from generator of the instance and kept in `lastSeed`)
+        start : int
+            number of the first sample, e.g. to split stream between consumers (Default is 0)
+        workers : int
+            number of background processes rendering samples ahead of the consumer, 0 renders them in the calling thread (Default is 0)
+        prefetch : int
+            number of chunks rendered ahead of the consumer (Default is twice the number of workers)
+        chunkSize : int
+            number of samples rendered at once by single worker (Default is 8)
+
+        Yields
+        ------
+        sample : tuple
+            interferogram, reference fringes, background function and parameters, see `renderALODISample`
+        '''
+        seed = self._runSeed(seed)
+        stop = None if quantity is None else start + quantity
+
+        if workers > 0:
+            yield from streamSharded(self, '_renderALODISamples', start, stop, (seed, no_noise), workers, prefetch, chunkSize)
+        else:
+            for i in itertools.count(start) if stop is None else range(start, stop):
+                yield from self._renderALODISamples(i, i + 1, seed, no_noise)
+
+    def _renderALODISamples(self, start, stop, seed, no_noise):
+        '''
+        Returns samples of `generateALODI` run with numbers from range `[start, stop)`, see `renderALODISample`
+        '''
+        samples = [self.renderALODISample(i, seed, no_noise) for i in range(start, stop)]
+        if self._metrics is not None:
+            self._metrics.count("images", len(samples))
+        return samples
+
+    def streamALODI2(self, numOfFrequencies, quantity = None, no_noise = True, seed = None, start = 0, workers = 0, prefetch = None, chunkSize = 2):
+        '''
+        Yields samples of `generateALODI2` run one by one instead of saving them, nothing is written to the disk.
+        Sweep of every object is rendered at once by `renderALODI2Object(i, numOfFrequencies, seed, no_noise)` and its images
+        are yielded in order of their numbers. Samples are rendered when they are requested, or prefetched by background
+        worker processes if `workers` is given.
+
+        Attributes
+        ----------
+        numOfFrequencies : int
+            number of different frequencies of fringe pattern that single pattern will be generated with
+        quantity : int
+            number of samples, rounded down to whole objects like in `generateALODI2`, None for endless stream
+        no_noise : bool
+            set to True to generate without noise function
+        seed : None, int or numpy.random.Generator
+            root seed of the run (Default is drawn from generator of the instance and kept in `lastSeed`)
+        start : int
+            number of the first object, its first image has number `start * numOfFrequencies + 1` (Default is 0)
+        workers : int
+            number of background processes rendering objects ahead of the consumer, 0 renders them in the calling thread (Default is 0)
+        prefetch : int
+            number of chunks rendered ahead of the consumer (Default is twice the number of workers)
+        chunkSize : int
+            number of objects rendered at once by single worker (Default is 2)
+
+        Yields
+        ------
+        sample : tuple
+            interferogram, reference fringes, background function and parameters of single image, see `renderALODI2Object`
+        '''
+        seed = self._runSeed(seed)
+        stop = None if quantity is None else start + int(quantity / numOfFrequencies)
+
+        if workers > 0:
+            yield from streamSharded(self, '_renderALODI2Samples', start, stop, (numOfFrequencies, seed, no_noise), workers, prefetch, chunkSize)
+        else:
+            for i in itertools.count(start) if stop is None else range(start, stop):
+                yield from self._renderALODI2Samples(i, i + 1, numOfFrequencies, seed, no_noise)
+
+    def _renderALODI2Samples(self, start, stop, numOfFrequencies, seed, no_noise):
+        '''
+        Returns samples of single images of objects with numbers from range `[start, stop)`, see `renderALODI2Object`.
+        Every object gets new arrays, so yielded samples are never overwritten.
+        '''
+        samples = []
+        for i in range(start, stop):
+            references = np.empty((numOfFrequencies, self._size, self._size), dtype = self._dtype)
+            images, references, backgrounds, params = self.renderALODI2Object(i, numOfFrequencies, seed, no_noise, references = references)
+            samples.extend(zip(images, references, backgrounds, params))
+        if self._metrics is not None:
+            self._metrics.count("images", len(samples))
+        return samples
+
+    def generateALODIandLabel(self, numOfFrequencies, numOfOrientations, quantity, folder, no_noise = True, workers = 1, seed = None):
         '''
         Generates multiple interferograms. Quantity is specified by user. 
         Interferograms are generated with random object in phase and random background function.
@@ -389,54 +1001,9 @@ class InterferogramFromRandomPolynomials(InterferogramGenerator):
             path to folder in which image will be saved
         no_noise : bool
             set to True to generate without noise function
+        workers : int
+            number of processes to shard generation across (Default is 1)
+        seed : None, int or numpy.random.Generator
+            root seed of the run (Default is drawn from generator of the instance and kept in `lastSeed`)
         '''
-        x = np.linspace(-1, 1, self._size)
-        y = np.linspace(-1, 1, self._size)
-        X, Y = np.meshgrid(x, y)
-
-        folder_fringes = folder + "\\Fringes\\"
-        folder_interferogram = folder + "\\Interferogram\\"
-
-        for i in range(0, 0 + quantity):
-            objType = np.random.choice(np.arange(3), p=[0.01, 0.04, 0.95])
-            '''
-            0 -> Prazki liniowe
-            1 -> Prazki kolowe
-            2 -> Prazki wielomianowe stopnia najwyzej 3
-            '''
-            if objType == 0:
-                obj = generateRandomPolynomial(X, Y, 1)
-            elif objType == 2:
-                obj = generateRandomPolynomial(X, Y, 3)
-
-            bg = generateRandomPolynomial(X, Y, 4) * gauss_n(X, Y)
-            self.setBackgroundFunction(bg)
-            
-            if no_noise:
-                self.setNoiseFunction(np.zeros(bg.shape)) # For Chambolle
-                    
-            if objType == 1:
-                x0 = np.random.uniform(-0.5, 0.5)
-                y0 = np.random.uniform(-0.5, 0.5)
-                f = np.random.randint(0.5 * self._minFrequency, 2 * self._maxFrequency)
-                h = np.random.randint(-3, 3)
-
-                spObj = generateSphericalObject(X, Y, x0, y0, f, h)
-                I = self.createSphericalInterferogram(spObj)
-                refI = self._b*np.cos(spObj)
-
-                # chambolleProjection(I, refI, bg)
-                self.saveInterferogram(refI, folder_fringes, i)
-                self.saveInterferogram(I, folder_interferogram, i)
-            else:
-                freq = np.random.randint(self._minFrequency, self._maxFrequency)
-                angle = np.random.randint(self._minOrientationAngle, self._maxOrientationAngle)
-
-                I = self.createInterferogram(angle, freq, obj)
-                refI = self._b*np.cos(freq * (math.pi / 2 * (math.cos(angle) * self._X + math.sin(angle) * self._Y) + obj))
-
-                # chambolleProjection(I, refI, bg)
-                self.saveInterferogram(refI, folder_fringes, i)
-                self.saveInterferogram(I, folder_interferogram, i)
-
-            progressBar(i + 1, quantity, "Interferogram generation progress: ")
\ No newline at end of file
+        self.generateALODI(numOfFrequencies, numOfOrientations, quantity, folder, no_noise, workers, seed)
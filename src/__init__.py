@@ -1,9 +1,74 @@
 # __init__.py
-from .chambolleProjection import chambolleProjection, chambolleProjectionStopCriterion
-from .chambolleProjectionGPU import chambolleProjectionGPU, gpuChambolleProjectionStopCriterion
-from .gauss_n import gauss_n
-from .generateRandomPolynomial import generateRandomPolynomial
-from .generateSphericalObject import generateSphericalObject
-from .InterferogramGenerator import InterferogramGenerator, InterferogramFromRandomPolynomials
-from .normalizeImage import normalizeImage
-from .progressBar import progressBar
\ No newline at end of file
+# Submodules are imported on first use of their names, so importing the package does not load numba,
+# PIL or cupy. GPU functions need cupy only when they are used.
+import importlib
+import sys
+import types
+
+_EXPORTS = {
+    'benchmarks': ['runBenchmarks', 'compareBenchmarks', 'environmentInfo', 'benchmarkInterferograms', 'benchmarkGeneration', 'benchmarkChambolle', 'benchmarkLabelling', 'benchmarkStorage'],
+    'chambolleKernels': ['divergenceResidual', 'updateDual', 'projectDual', 'extrapolate', 'primalStep', 'chambolleTile'],
+    'chambolleProjection': ['chambolleProjection', 'chambolleProjectionStopCriterion', 'initialDual', 'coldChange'],
+    'chambolleProjectionAccelerated': ['chambolleProjectionFGP', 'chambolleProjectionStopCriterionFGP', 'chambolleProjectionPrimalDual'],
+    'chambolleProjectionBatch': ['chambolleProjectionBatch', 'chambolleProjectionStopCriterionBatch'],
+    'chambolleProjectionPyramid': ['chambolleProjectionPyramid', 'chambolleProjectionStopCriterionPyramid', 'downsample2D', 'prolongDual', 'pyramidLevels'],
+    'chambolleProjectionTiled': ['chambolleProjectionTiled', 'chambolleProjectionStopCriterionTiled', 'tileLayout', 'spectralNorm'],
+    'chambolleProjectionGPU': ['chambolleProjectionGPU', 'gpuChambolleProjectionStopCriterion'],
+    'convergenceMonitor': ['ConvergenceMonitor', 'RmsMonitor', 'ChangeMonitor', 'TargetMonitor', 'rmsDifferenceStack', 'differenceMoments'],
+    'gauss_n': ['gauss_n', 'separableGauss'],
+    'generateRandomPolynomial': ['generateRandomPolynomial', 'drawPolynomialCoefficients', 'evaluatePolynomial', 'polynomialBasis', 'contractBasis', 'separablePolynomial'],
+    'generateSphericalObject': ['generateSphericalObject'],
+    'gridCache': ['coordinateAxis', 'coordinateGrid', 'monomialBasis', 'monomialBasisFits', 'setGridCacheBudget', 'clearGridCache'],
+    'imageWriter': ['ImageWriter', 'encodeImage', 'encodeRescaled'],
+    'imagePairLoader': ['imagePairLoader', 'imageName', 'normalizeMinMax'],
+    'labelCache': ['LabelCache', 'labelKey'],
+    'interferogramBatch': ['interferogramBatch', 'separableInterferogramBatch', 'sphericalInterferogramBatch', 'phaseShiftedInterferograms', 'chebyshevSweepBatch'],
+    'InterferogramGenerator': ['InterferogramGenerator', 'InterferogramFromRandomPolynomials'],
+    'memmapDataset': ['MemmapDataset', 'packMemmapDataset', 'isMemmapDataset'],
+    'metrics': ['Metrics', 'reportProgress', 'throttledProgress'],
+    'normalizeImage': ['normalizeImage', 'normalizeImageStack'],
+    'parallelLabelling': ['runLabelling', 'labelImages', 'groupImages', 'mergeLabels', 'readLabels'],
+    'progressBar': ['progressBar'],
+    'solverBenchmark': ['solverBenchmark', 'summarizeSolverBenchmark', 'SOLVERS'],
+    'shardStore': ['ShardWriter', 'ShardReader', 'isShardStore'],
+    'randomState': ['resolveSeed', 'sampleGenerator'],
+    'warmup': ['warmup', 'warmupGeneration', 'warmupChambolle'],
+}
+
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_MODULES)
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name, value):
+        # Submodules named like their functions must not shadow the functions
+        if isinstance(value, types.ModuleType) and name in _MODULES:
+            return
+        super().__setattr__(name, value)
+
+sys.modules[__name__].__class__ = _Package
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module('.' + _MODULES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+def gpuAvailable():
+    '''
+    Function that checks if cupy is installed and there is at least one CUDA compatible device.
+
+    Returns:
+    ----------
+    result : bool
+        True if GPU functions can be used
+    '''
+    try:
+        import cupy as cp
+        return cp.cuda.runtime.getDeviceCount() > 0
+    except Exception:
+        return False
@@ -0,0 +1,445 @@
+import contextlib
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import numpy as np
+
+from src.InterferogramGenerator import InterferogramFromRandomPolynomials
+from src.chambolleProjection import chambolleProjection, chambolleProjectionStopCriterion
+from src.chambolleProjectionBatch import chambolleProjectionBatch, chambolleProjectionStopCriterionBatch
+from src.generateRandomPolynomial import drawPolynomialCoefficients
+from src.generateSphericalObject import generateSphericalObject
+from src.imagePairLoader import imagePairLoader, normalizeMinMax
+from src.imageWriter import encodeImage
+from src.memmapDataset import packMemmapDataset
+from src.parallelLabelling import runLabelling
+from src.shardStore import ShardWriter
+from src.warmup import warmup
+
+SEED = 2021
+KEY_FIELDS = ("benchmark", "variant", "size", "batchSize", "workers")
+# Metrics compared by `compareBenchmarks`, True if higher value is better
+METRICS = {"imagesPerSec": True, "iterationsPerSec": True, "timeToTolerance": False}
+
+def _generator(size):
+    '''
+    Returns generator with fixed seed and frequencies used by all benchmarks
+    '''
+    generator = InterferogramFromRandomPolynomials(size, seed = SEED)
+    generator.setFrequencyBoundaries(10, 60)
+    return generator
+
+def _samples(size, count):
+    '''
+    Returns `count` pairs of interferogram and reference fringes of `generateALODI` with fixed seed, rescaled to range [0, 1]
+    '''
+    generator = _generator(size)
+    pairs = []
+    for i in range(count):
+        I, refI, _, _ = generator.renderALODISample(i, SEED)
+        pairs.append((normalizeMinMax(I), normalizeMinMax(refI)))
+    return pairs
+
+def _record(benchmark, variant, size, batchSize = 1, workers = 1, **metrics):
+    '''
+    Returns single result, fields `KEY_FIELDS` identify it across runs
+    '''
+    return dict(benchmark = benchmark, variant = variant, size = size, batchSize = batchSize, workers = workers, **metrics)
+
+def _best(measure, repeat):
+    '''
+    Runs `measure` that returns tuple (seconds, value) `repeat` times and returns the fastest run,
+    so short measurements are not distorted by other processes
+    '''
+    return min((measure() for _ in range(repeat)), key = lambda run: run[0])
+
+@contextlib.contextmanager
+def _quiet():
+    '''
+    Hides progress bars printed by timed functions
+    '''
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def environmentInfo():
+    '''
+    Function that describes machine and code the benchmarks were run on.
+
+    Returns:
+    ----------
+    info : dict
+        commit of the repository, versions of python and libraries, number of processors and time of the run
+    '''
+    import numba
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd = os.path.dirname(os.path.abspath(__file__)),
+            capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "numba": numba.__version__,
+        "platform": platform.platform(),
+        "processors": os.cpu_count(),
+        "time": datetime.datetime.now().isoformat(timespec = "seconds"),
+    }
+
+def benchmarkInterferograms(sizes, count = 32, repeat = 3):
+    '''
+    Function that measures throughput of `createInterferogram` and `createSphericalInterferogram` without saving images.
+
+    Parameters
+    ----------
+    sizes : list
+        sizes of images
+    count : int
+        number of images created in single measurement
+    repeat : int
+        number of measurements, the fastest one is reported
+
+    Returns:
+    ----------
+    results : list
+        results with images per second
+    '''
+    results = []
+    for size in sizes:
+        generator = _generator(size)
+        rng = np.random.default_rng(SEED)
+        obj = generator._polynomial(drawPolynomialCoefficients(3, rng))
+        spObj = generateSphericalObject(generator._X, generator._Y, 0.1, -0.2, 20, 2)
+
+        cases = {
+            "createInterferogram": lambda: generator.createInterferogram(0.5, 30, obj),
+            "createSphericalInterferogram": lambda: generator.createSphericalInterferogram(spObj),
+        }
+        for variant, create in cases.items():
+            def measure():
+                start_time = time.perf_counter()
+                for _ in range(count):
+                    create()
+                return time.perf_counter() - start_time, None
+
+            seconds, _ = _best(measure, repeat)
+            results.append(_record("interferogram", variant, size, imagesPerSec = count / seconds, seconds = seconds))
+    return results
+
+def benchmarkGeneration(sizes, workers = (1,), quantity = 64, numOfFrequencies = 4, repeat = 3):
+    '''
+    Function that measures throughput of `generateALODI`, `generateALODI2` and `generateALODIandLabel`
+    including saving BMP images to temporary folder.
+
+    Parameters
+    ----------
+    sizes : list
+        sizes of images
+    workers : list
+        numbers of worker processes
+    quantity : int
+        number of generated interferograms
+    numOfFrequencies : int
+        number of frequencies of single object
+    repeat : int
+        number of measurements, the fastest one is reported
+
+    Returns:
+    ----------
+    results : list
+        results with images per second, reference fringes of `generateALODI` are not counted
+    '''
+    results = []
+    for size in sizes:
+        for numWorkers in workers:
+            for variant in ("generateALODI", "generateALODI2", "generateALODIandLabel"):
+                def measure():
+                    generator = _generator(size)
+                    with tempfile.TemporaryDirectory() as folder:
+                        run = os.path.join(folder, "run")
+                        for subfolder in ("Fringes", "Interferogram"):
+                            os.makedirs(os.path.join(run, subfolder))
+
+                        start_time = time.perf_counter()
+                        with _quiet():
+                            if variant == "generateALODI2":
+                                generator.generateALODI2(numOfFrequencies, quantity, run + os.sep, workers = numWorkers, seed = SEED)
+                            else:
+                                getattr(generator, variant)(numOfFrequencies, 1, quantity, run, workers = numWorkers, seed = SEED)
+                        return time.perf_counter() - start_time, None
+
+                seconds, _ = _best(measure, repeat)
+                results.append(_record("generation", variant, size, workers = numWorkers, imagesPerSec = quantity / seconds, seconds = seconds))
+    return results
+
+def benchmarkChambolle(sizes, batchSizes = (1,), count = 8, tol = 1e-5, repeat = 3):
+    '''
+    Function that measures both versions of Chambolle projection on interferograms of `generateALODI`.
+    Batch size 1 uses `chambolleProjection` and `chambolleProjectionStopCriterion`, larger batches use their batch versions.
+
+    Parameters
+    ----------
+    sizes : list
+        sizes of images
+    batchSizes : list
+        numbers of images solved at once
+    count : int
+        number of solved images
+    tol : float
+        error tolerance of the algorithm
+    repeat : int
+        number of measurements, the fastest one is reported
+
+    Returns:
+    ----------
+    results : list
+        results with images per second, mean time to tolerance per image, mean number of iterations
+        and iterations per second, iterations are counted as labels of the images
+    '''
+    results = []
+    for size in sizes:
+        pairs = _samples(size, count)
+        for batchSize in batchSizes:
+            for variant in ("reference", "stopCriterion"):
+                def measure():
+                    iterations = []
+                    start_time = time.perf_counter()
+                    for position in range(0, count, batchSize):
+                        f, f_ref = (np.array(images) for images in zip(*pairs[position:position + batchSize]))
+                        if batchSize > 1 and variant == "reference":
+                            iterations.extend(chambolleProjectionBatch(f, f_ref, tol = tol)[1])
+                        elif batchSize > 1:
+                            iterations.extend(chambolleProjectionStopCriterionBatch(f, tol = tol)[1])
+                        elif variant == "reference":
+                            iterations.append(chambolleProjection(f[0], f_ref[0], tol = tol)[1])
+                        else:
+                            iterations.append(chambolleProjectionStopCriterion(f[0], tol = tol)[1])
+                    return time.perf_counter() - start_time, iterations
+
+                seconds, iterations = _best(measure, repeat)
+
+                results.append(_record("chambolle", variant, size, batchSize = batchSize, imagesPerSec = count / seconds,
+                    timeToTolerance = seconds / count, iterations = float(np.mean(iterations)),
+                    iterationsPerSec = float(np.sum(iterations)) / seconds, seconds = seconds))
+    return results
+
+def benchmarkLabelling(sizes, workers = (1,), batchSizes = (1,), count = 16, repeat = 3):
+    '''
+    Function that measures throughput of `runLabelling` on memory-mapped dataset in temporary folder.
+
+    Parameters
+    ----------
+    sizes : list
+        sizes of images
+    workers : list
+        numbers of worker processes
+    batchSizes : list
+        numbers of images labelled at once by single worker
+    count : int
+        number of labelled images
+    repeat : int
+        number of measurements, the fastest one is reported
+
+    Returns:
+    ----------
+    results : list
+        results with images per second of both versions of the algorithm, start of worker processes is included
+    '''
+    results = []
+    for size in sizes:
+        pairs = _samples(size, count)
+        with tempfile.TemporaryDirectory() as folder:
+            dataset = os.path.join(folder, "dataset")
+            packMemmapDataset(lambda i: (str(i), pairs[i][0], pairs[i][1]), range(count), dataset)
+
+            for numWorkers in workers:
+                for batchSize in batchSizes:
+                    for version, variant in ((0, "reference"), (1, "stopCriterion")):
+                        def measure():
+                            # Labelling resumes from existing labels file, so every run writes a new one
+                            output = os.path.join(folder, "labels.csv")
+                            if os.path.isfile(output):
+                                os.remove(output)
+                            start_time = time.perf_counter()
+                            with _quiet():
+                                runLabelling(dataset, output, version, count, 0, numWorkers, batchSize, chunkSize = max(batchSize, count // (2 * numWorkers)))
+                            return time.perf_counter() - start_time, None
+
+                        seconds, _ = _best(measure, repeat)
+                        results.append(_record("labelling", variant, size, batchSize, numWorkers, imagesPerSec = count / seconds, seconds = seconds))
+    return results
+
+def _saveBMP(pairs, folder):
+    '''
+    Saves pairs as BMP dataset read by `imagePairLoader`
+    '''
+    for subfolder in ("Fringes", "Interferogram"):
+        os.makedirs(os.path.join(folder, subfolder), exist_ok = True)
+    for i, (f, f_ref) in enumerate(pairs):
+        encodeImage(f).save(folder + "Interferogram\\" + str(i) + ".bmp")
+        encodeImage(f_ref).save(folder + "Fringes\\" + str(i) + ".bmp")
+
+def _saveShards(pairs, folder, compressed):
+    '''
+    Saves pairs as array shards
+    '''
+    with ShardWriter(folder, compressed = compressed) as writer:
+        for i, (f, f_ref) in enumerate(pairs):
+            writer.append(i, f, f_ref)
+
+def _saveMemmap(pairs, folder):
+    '''
+    Saves pairs as memory-mapped dataset
+    '''
+    packMemmapDataset(lambda i: (str(i), pairs[i][0], pairs[i][1]), range(len(pairs)), folder)
+
+def benchmarkStorage(sizes, count = 64, repeat = 3):
+    '''
+    Function that measures save and load throughput of pairs of interferogram and reference fringes
+    for BMP images, array shards, compressed array shards and memory-mapped dataset. Images are loaded by `imagePairLoader`.
+
+    Parameters
+    ----------
+    sizes : list
+        sizes of images
+    count : int
+        number of saved and loaded pairs
+    repeat : int
+        number of measurements, the fastest one is reported
+
+    Returns:
+    ----------
+    results : list
+        results with pairs of images per second, variants are `<format>-save` and `<format>-load`
+    '''
+    formats = {
+        "bmp": _saveBMP,
+        "shards": lambda pairs, folder: _saveShards(pairs, folder, False),
+        "shardsCompressed": lambda pairs, folder: _saveShards(pairs, folder, True),
+        "memmap": _saveMemmap,
+    }
+
+    results = []
+    for size in sizes:
+        pairs = _samples(size, count)
+        for name, save in formats.items():
+            with tempfile.TemporaryDirectory() as folder:
+                def measureSave():
+                    dataset = os.path.join(folder, name) + os.sep
+                    shutil.rmtree(dataset, ignore_errors = True)
+                    start_time = time.perf_counter()
+                    save(pairs, dataset)
+                    return time.perf_counter() - start_time, dataset
+
+                def measureLoad():
+                    load = imagePairLoader(dataset)
+                    start_time = time.perf_counter()
+                    for i in range(count):
+                        _, f, f_ref = load(i)
+                        # Memory-mapped images are read only when they are used
+                        np.sum(f) + np.sum(f_ref)
+                    return time.perf_counter() - start_time, None
+
+                seconds, dataset = _best(measureSave, repeat)
+                results.append(_record("storage", name + "-save", size, imagesPerSec = count / seconds, seconds = seconds))
+                seconds, _ = _best(measureLoad, repeat)
+                results.append(_record("storage", name + "-load", size, imagesPerSec = count / seconds, seconds = seconds))
+    return results
+
+BENCHMARKS = ("interferogram", "generation", "chambolle", "labelling", "storage")
+
+def runBenchmarks(sizes = (128, 256), batchSizes = (1, 8), workers = (1,), count = 16, benchmarks = BENCHMARKS, repeat = 3, outputFile = None):
+    '''
+    Function that runs benchmarks of generation, Chambolle labelling and storage with fixed seeds.
+    Kernels are compiled before measurements, so the first measurement does not include compilation.
+
+    Parameters
+    ----------
+    sizes : list
+        sizes of images
+    batchSizes : list
+        numbers of images solved at once by Chambolle projection
+    workers : list
+        numbers of worker processes of generation and labelling
+    count : int
+        number of images in single measurement of Chambolle projection, labelling and storage,
+        generation uses 4 times more images
+    benchmarks : list
+        names of benchmarks to run, subset of `BENCHMARKS`
+    repeat : int
+        number of measurements of every result, the fastest one is reported (Default is 3)
+    outputFile : str
+        path to JSON file to save the report (Optional)
+
+    Returns:
+    ----------
+    report : dict
+        `environment` from `environmentInfo`, `settings` of the run and list of `results`
+    '''
+    warmup()
+
+    results = []
+    if "interferogram" in benchmarks:
+        results += benchmarkInterferograms(sizes, repeat = repeat)
+    if "generation" in benchmarks:
+        results += benchmarkGeneration(sizes, workers, 4 * count, repeat = repeat)
+    if "chambolle" in benchmarks:
+        results += benchmarkChambolle(sizes, batchSizes, count, repeat = repeat)
+    if "labelling" in benchmarks:
+        results += benchmarkLabelling(sizes, workers, batchSizes, count, repeat = repeat)
+    if "storage" in benchmarks:
+        results += benchmarkStorage(sizes, count, repeat = repeat)
+
+    report = {
+        "environment": environmentInfo(),
+        "settings": {"sizes": list(sizes), "batchSizes": list(batchSizes), "workers": list(workers), "count": count, "repeat": repeat, "seed": SEED},
+        "results": results,
+    }
+    if outputFile is not None:
+        with open(outputFile, "w") as file:
+            json.dump(report, file, indent = 2)
+    return report
+
+def compareBenchmarks(baseline, current, threshold = 0.1):
+    '''
+    Function that compares two reports of `runBenchmarks` result by result.
+    Results are matched by fields `KEY_FIELDS` and compared by metrics `METRICS`.
+
+    Parameters
+    ----------
+    baseline : dict
+        report of the reference run, e.g. loaded from JSON file of previous commit
+    current : dict
+        report of the checked run
+    threshold : float
+        relative change of metric that is reported as regression or improvement (Default is 0.1)
+
+    Returns:
+    ----------
+    changes : list
+        dicts with keys of the result, `metric`, `baseline`, `current`, relative `change`
+        and `regression` set to True if the metric got worse
+    '''
+    key = lambda result: tuple(result[field] for field in KEY_FIELDS)
+    reference = {key(result): result for result in baseline["results"]}
+
+    changes = []
+    for result in current["results"]:
+        old = reference.get(key(result))
+        if old is None:
+            continue
+        for metric, higherIsBetter in METRICS.items():
+            if metric not in result or metric not in old or old[metric] == 0:
+                continue
+            change = (result[metric] - old[metric]) / old[metric]
+            if abs(change) >= threshold:
+                changes.append(dict({field: result[field] for field in KEY_FIELDS}, metric = metric, baseline = old[metric],
+                    current = result[metric], change = change, regression = (change < 0) == higherIsBetter))
+    return changes
@@ -0,0 +1,313 @@
+from numba import jit, prange
+import numpy as np
+
+@jit(nopython=True, parallel=True, cache=True)
+def divergenceResidual(xi, f, mi, x2, g):
+    '''
+    Function that calculates divergence of the dual field of every image of the stack in single pass.
+    Writes reconstruction `x2 = mi * div(xi)` and residual `g = div(xi) - f / mi` to preallocated buffers.
+    Boosted with Numba: works in C and with parallel computing.
+
+    Parameters
+    ----------
+    xi : numpy.ndarray
+        dual field of shape (2, B, N, M)
+    f : numpy.ndarray
+        stack of input images of shape (B, N, M)
+    mi : float
+        regularization parameter of the dtype of `f`, Python float makes float32 stacks compute in float64
+    x2 : numpy.ndarray
+        buffer of shape (B, N, M) for reconstruction
+    g : numpy.ndarray
+        buffer of shape (B, N, M) for residual
+
+    Returns:
+    ----------
+    x2 : numpy.ndarray
+        reconstruction
+    '''
+    batch = f.shape[0]
+    rows = f.shape[1]
+    cols = f.shape[2]
+    for idx in prange(batch * rows):
+        k = idx // rows
+        r = idx % rows
+        for c in range(cols):
+            if r == 0:
+                fx = xi[0, k, 0, c]
+            elif r == rows - 1:
+                fx = -xi[0, k, rows - 2, c]
+            else:
+                fx = xi[0, k, r, c] - xi[0, k, r - 1, c]
+
+            if c == 0:
+                fy = xi[1, k, r, 0]
+            elif c == cols - 1:
+                fy = -xi[1, k, r, cols - 2]
+            else:
+                fy = xi[1, k, r, c] - xi[1, k, r, c - 1]
+
+            div = fx + fy
+            x2[k, r, c] = mi * div
+            g[k, r, c] = div - f[k, r, c] / mi
+
+    return x2
+
+@jit(nopython=True, parallel=True, cache=True)
+def updateDual(xi, g, tau):
+    '''
+    Function that makes semi-implicit Chambolle step of the dual field of every image of the stack in place.
+    Calculates `xi = (xi + tau * grad(g)) / (1 + tau * |grad(g)|)` without temporary arrays.
+    Boosted with Numba: works in C and with parallel computing.
+
+    Parameters
+    ----------
+    xi : numpy.ndarray
+        dual field of shape (2, B, N, M), updated in place
+    g : numpy.ndarray
+        residual of shape (B, N, M) calculated by `divergenceResidual`
+    tau : float
+        Chambolle projection step value of the dtype of `xi`
+
+    Returns:
+    ----------
+    xi : numpy.ndarray
+        updated dual field
+    '''
+    batch = g.shape[0]
+    rows = g.shape[1]
+    cols = g.shape[2]
+    # Constants of the dtype of the field, so float32 fields are not promoted to float64
+    zero = xi.dtype.type(0)
+    one = xi.dtype.type(1)
+    for idx in prange(batch * rows):
+        k = idx // rows
+        r = idx % rows
+        for c in range(cols):
+            gx = g[k, r + 1, c] - g[k, r, c] if r < rows - 1 else zero
+            gy = g[k, r, c + 1] - g[k, r, c] if c < cols - 1 else zero
+            d = np.sqrt(gx * gx + gy * gy)
+            xi[0, k, r, c] = (xi[0, k, r, c] + tau * gx) / (one + tau * d)
+            xi[1, k, r, c] = (xi[1, k, r, c] + tau * gy) / (one + tau * d)
+
+    return xi
+
+@jit(nopython=True, parallel=True, cache=True)
+def projectDual(q, g, step, p):
+    '''
+    Function that makes projected gradient step of the dual field of every image of the stack.
+    Calculates `p = P(q + step * grad(g))`, where `P` projects every vector onto the unit ball.
+    `p` can be the same array as `q`.
+    Boosted with Numba: works in C and with parallel computing.
+
+    Parameters
+    ----------
+    q : numpy.ndarray
+        dual field of shape (2, B, N, M) the step starts from
+    g : numpy.ndarray
+        stack of shape (B, N, M) whose gradient is the step direction
+    step : float
+        step size of the dtype of `p`
+    p : numpy.ndarray
+        buffer of shape (2, B, N, M) for the result
+
+    Returns:
+    ----------
+    p : numpy.ndarray
+        dual field after the step
+    '''
+    batch = g.shape[0]
+    rows = g.shape[1]
+    cols = g.shape[2]
+    zero = p.dtype.type(0)
+    one = p.dtype.type(1)
+    for idx in prange(batch * rows):
+        k = idx // rows
+        r = idx % rows
+        for c in range(cols):
+            gx = g[k, r + 1, c] - g[k, r, c] if r < rows - 1 else zero
+            gy = g[k, r, c + 1] - g[k, r, c] if c < cols - 1 else zero
+            px = q[0, k, r, c] + step * gx
+            py = q[1, k, r, c] + step * gy
+            norm = max(one, np.sqrt(px * px + py * py))
+            p[0, k, r, c] = px / norm
+            p[1, k, r, c] = py / norm
+
+    return p
+
+@jit(nopython=True, parallel=True, cache=True)
+def extrapolate(p, p_prev, c, q):
+    '''
+    Function that calculates momentum point `q = p + c * (p - p_prev)` of accelerated methods.
+    Boosted with Numba: works in C and with parallel computing.
+
+    Parameters
+    ----------
+    p : numpy.ndarray
+        current iterate
+    p_prev : numpy.ndarray
+        previous iterate of the same shape
+    c : float
+        momentum coefficient of the dtype of `q`
+    q : numpy.ndarray
+        buffer of the same shape for the result
+
+    Returns:
+    ----------
+    q : numpy.ndarray
+        momentum point
+    '''
+    p_flat = p.reshape(-1)
+    p_prev_flat = p_prev.reshape(-1)
+    q_flat = q.reshape(-1)
+    for i in prange(p_flat.shape[0]):
+        q_flat[i] = p_flat[i] + c * (p_flat[i] - p_prev_flat[i])
+
+    return q
+
+@jit(nopython=True, parallel=True, cache=True)
+def primalStep(u, p, f, tau, mi, theta, u_bar):
+    '''
+    Function that makes primal step of Chambolle-Pock algorithm for total variation denoising of every image of the stack.
+    Calculates `u = (u + tau * div(p) + tau / mi * f) / (1 + tau / mi)` in place and extrapolation
+    `u_bar = u + theta * (u - u_old)`.
+    Boosted with Numba: works in C and with parallel computing.
+
+    Parameters
+    ----------
+    u : numpy.ndarray
+        primal variable of shape (B, N, M), updated in place
+    p : numpy.ndarray
+        dual field of shape (2, B, N, M)
+    f : numpy.ndarray
+        stack of input images of shape (B, N, M)
+    tau : float
+        primal step size of the dtype of `u`
+    mi : float
+        regularization parameter of the dtype of `u`
+    theta : float
+        extrapolation parameter of the dtype of `u`
+    u_bar : numpy.ndarray
+        buffer of shape (B, N, M) for extrapolated primal variable
+
+    Returns:
+    ----------
+    u : numpy.ndarray
+        primal variable after the step
+    '''
+    batch = f.shape[0]
+    rows = f.shape[1]
+    cols = f.shape[2]
+    one = u.dtype.type(1)
+    for idx in prange(batch * rows):
+        k = idx // rows
+        r = idx % rows
+        for c in range(cols):
+            if r == 0:
+                fx = p[0, k, 0, c]
+            elif r == rows - 1:
+                fx = -p[0, k, rows - 2, c]
+            else:
+                fx = p[0, k, r, c] - p[0, k, r - 1, c]
+
+            if c == 0:
+                fy = p[1, k, r, 0]
+            elif c == cols - 1:
+                fy = -p[1, k, r, cols - 2]
+            else:
+                fy = p[1, k, r, c] - p[1, k, r, c - 1]
+
+            u_old = u[k, r, c]
+            u_new = (u_old + tau * (fx + fy) + tau / mi * f[k, r, c]) / (one + tau / mi)
+            u[k, r, c] = u_new
+            u_bar[k, r, c] = u_new + theta * (u_new - u_old)
+
+    return u
+
+# Kernels of tiles run in single thread, numpy error model drops checks of division by zero that keep loops from being vectorized.
+# Divisors are never zero, so results are the same as results of parallel kernels, which always use numpy error model.
+@jit(nopython=True, nogil=True, cache=True, error_model='numpy')
+def _tileResidual(xi, f, mi, x2, g):
+    '''
+    Calculates reconstruction and residual of single tile, see `divergenceResidual`
+    '''
+    rows = f.shape[0]
+    cols = f.shape[1]
+    for r in range(rows):
+        for c in range(cols):
+            if r == 0:
+                fx = xi[0, 0, c]
+            elif r == rows - 1:
+                fx = -xi[0, rows - 2, c]
+            else:
+                fx = xi[0, r, c] - xi[0, r - 1, c]
+
+            if c == 0:
+                fy = xi[1, r, 0]
+            elif c == cols - 1:
+                fy = -xi[1, r, cols - 2]
+            else:
+                fy = xi[1, r, c] - xi[1, r, c - 1]
+
+            div = fx + fy
+            x2[r, c] = mi * div
+            g[r, c] = div - f[r, c] / mi
+
+@jit(nopython=True, nogil=True, cache=True, error_model='numpy')
+def _tileDual(xi, g, tau):
+    '''
+    Makes semi-implicit Chambolle step of the dual field of single tile, see `updateDual`
+    '''
+    rows = g.shape[0]
+    cols = g.shape[1]
+    zero = xi.dtype.type(0)
+    one = xi.dtype.type(1)
+    for r in range(rows):
+        for c in range(cols):
+            gx = g[r + 1, c] - g[r, c] if r < rows - 1 else zero
+            gy = g[r, c + 1] - g[r, c] if c < cols - 1 else zero
+            d = np.sqrt(gx * gx + gy * gy)
+            xi[0, r, c] = (xi[0, r, c] + tau * gx) / (one + tau * d)
+            xi[1, r, c] = (xi[1, r, c] + tau * gy) / (one + tau * d)
+
+@jit(nopython=True, nogil=True, cache=True, error_model='numpy')
+def chambolleTile(xi, f, mi, tau, steps, start, x2, g):
+    '''
+    Function that makes `steps` iterations of Chambolle projection on single tile of the image in place,
+    every iteration is `updateDual` followed by `divergenceResidual`.
+    Edges of the tile are treated as edges of the image, so values near edges that are inside the image are wrong.
+    Wrong values spread by one pixel per iteration, with halo of `steps + 1` pixels the rest of the tile is exact.
+    Runs in single thread and releases GIL, so tiles are solved in parallel by threads.
+    Boosted with Numba: works in C.
+
+    Parameters
+    ----------
+    xi : numpy.ndarray
+        dual field of the tile of shape (2, N, M), updated in place
+    f : numpy.ndarray
+        tile of input image of shape (N, M)
+    mi : float
+        regularization parameter of the dtype of `xi`
+    tau : float
+        Chambolle projection step value of the dtype of `xi`
+    steps : int
+        number of iterations
+    start : bool
+        True to calculate reconstruction and residual of `xi` first, False if buffers hold them from the previous call
+    x2 : numpy.ndarray
+        buffer of shape (N, M) for reconstruction
+    g : numpy.ndarray
+        buffer of shape (N, M) for residual
+
+    Returns:
+    ----------
+    x2 : numpy.ndarray
+        reconstruction after the last iteration
+    '''
+    if start:
+        _tileResidual(xi, f, mi, x2, g)
+    for _ in range(steps):
+        _tileDual(xi, g, tau)
+        _tileResidual(xi, f, mi, x2, g)
+
+    return x2
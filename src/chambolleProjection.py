@@ -1,45 +1,46 @@
-import time
-import matplotlib.pyplot as plt
 import numpy as np
 
+from src.chambolleKernels import divergenceResidual, updateDual
+from src.convergenceMonitor import RmsMonitor, ChangeMonitor, rmsDifferenceStack
+
 def gradient2D(mat):
     '''
-    Function to calculate gradient of the 2D square matrix. Works on CPU.
+    Function to calculate gradient of the 2D square matrix or of every matrix of the stack. Works on CPU.
 
     Copyright (c) Gabriel Peyre
 
     Parameters
     ----------
     mat : numpy.ndarray
-        matrix to calculate gradient
+        matrix to calculate gradient, last two axes are differentiated
         
     Returns:
     ----------
     [fx, fy] : cupy.ndarray
         gradient of `mat`
     '''
-    x1 = mat[1:len(mat), :]
-    x2 = np.array([mat[-1, :]])
-    x = np.concatenate((x1, x2), axis = 0)
+    x1 = mat[..., 1:, :]
+    x2 = mat[..., -1:, :]
+    x = np.concatenate((x1, x2), axis = -2)
 
     fx = x - mat
-    y1 = mat[:, 1:len(mat)]
-    y2 = np.array([mat[:, -1]]).transpose()
-    y = np.concatenate((y1, y2), axis = 1)
+    y1 = mat[..., :, 1:]
+    y2 = mat[..., :, -1:]
+    y = np.concatenate((y1, y2), axis = -1)
 
     fy = y - mat
     return [fx, fy]
 
 def divergence2D(mat):
     '''
-    Function to calculate divergence of the 2D square matrix. Works on CPU.
+    Function to calculate divergence of the 2D square matrix or of every matrix of the stack. Works on CPU.
 
     Copyright (c) Gabriel Peyre
 
     Parameters
     ----------
     mat : numpy.ndarray
-        matrix to calculate divergence
+        pair of matrices to calculate divergence, first axis selects component
 
     Returns:
     ----------
@@ -49,17 +50,72 @@ def divergence2D(mat):
     Px = mat[0]
     Py = mat[1]
 
-    fx = Px - np.concatenate((np.array([Px[0, :]]), Px[0:len(Px)-1, :]), axis=0)
-    fx[0, :] = Px[0,:]
-    fx[-1, :] = -Px[-2,:]
+    fx = Px - np.concatenate((Px[..., :1, :], Px[..., :-1, :]), axis=-2)
+    fx[..., 0, :] = Px[..., 0, :]
+    fx[..., -1, :] = -Px[..., -2, :]
 
-    fy = Py - np.concatenate((np.array([Py[:, 0]]).transpose(), Py[:, 0:len(Py)-1]), axis=1)
-    fy[:, 0] = Py[:, 0]
-    fy[:, -1] = -Py[:, -2]
+    fy = Py - np.concatenate((Py[..., :, :1], Py[..., :, :-1]), axis=-1)
+    fy[..., :, 0] = Py[..., :, 0]
+    fy[..., :, -1] = -Py[..., :, -2]
 
     return fx + fy
 
-def chambolleProjection(f, f_ref, mi = 100, tau = 0.25, tol = 1e-5):
+def initialDual(xi0, shape, dtype = np.float64):
+    '''
+    Function that returns dual field of Chambolle projection for stack of images to start iterations from.
+
+    Parameters
+    ----------
+    xi0 : numpy.ndarray
+        initial dual field of shape (2,) + `shape` or (2,) + `shape[1:]` for single image, None to start from zeros
+    shape : tuple
+        shape of stack of images (B, N, N)
+    dtype : numpy.dtype
+        floating point type of the field (Default is float64)
+
+    Returns:
+    ----------
+    xi : numpy.ndarray
+        new array of shape (2,) + `shape`
+    '''
+    if xi0 is None:
+        return np.zeros((2,) + shape, dtype=dtype)
+    return np.array(xi0, dtype=dtype).reshape((2,) + shape)
+
+def coldChange(f, mi, tau, checkEvery = 1):
+    '''
+    Function that returns the first relative change of reconstruction evaluated by the stop criterion of solve
+    started from zero dual field, for every image of the stack. Solves started from given dual field divide
+    their changes by it, so they stop by the same rule as solves from zero. Costs `checkEvery` iterations.
+
+    Parameters
+    ----------
+    f : numpy.ndarray
+        stack of input images of shape (B, N, M)
+    mi : float
+        regularization parameter of the dtype of `f`
+    tau : float
+        Chambolle projection step value of the dtype of `f`
+    checkEvery : int
+        number of iterations between evaluations of the stop criterion (Default is 1)
+
+    Returns:
+    ----------
+    err : numpy.ndarray
+        relative change of every image of shape (B,)
+    '''
+    xi = np.zeros((2,) + f.shape, dtype=f.dtype)
+    x1 = np.empty(f.shape, dtype=f.dtype)
+    x2 = np.empty(f.shape, dtype=f.dtype)
+    g = np.empty(f.shape, dtype=f.dtype)
+    divergenceResidual(xi, f, mi, x2, g)
+    for _ in range(checkEvery):
+        x1, x2 = x2, x1
+        updateDual(xi, g, tau)
+        divergenceResidual(xi, f, mi, x2, g)
+    return np.linalg.norm(x2 - x1, 2, axis=(1, 2)) / np.linalg.norm(f, 2, axis=(1, 2))
+
+def chambolleProjection(f, f_ref, mi = 100, tau = 0.25, tol = 1e-5, window = 100, checkEvery = 1, xi0 = None, returnDual = False, monitor = None, dtype = np.float64):
     '''
     The 2D case of Chambolle projection algorithm. This version uses reference image.
 
@@ -80,6 +136,18 @@ def chambolleProjection(f, f_ref, mi = 100, tau = 0.25, tol = 1e-5):
         Chambolle projection step value
     tol : float
         error tolerance when algorithm should stop its work
+    window : int
+        number of iterations without improvement after which algorithm stops (Default is 100)
+    checkEvery : int
+        number of iterations between evaluations of the error (Default is 1)
+    xi0 : numpy.ndarray
+        initial dual field of shape (2, N, N), e.g. returned for similar image (Default is zeros)
+    returnDual : bool
+        set to True to return also the final dual field
+    monitor : RmsMonitor
+        monitor deciding when to stop, replaces the stop rule given by `tol`, `window` and `checkEvery` (Optional)
+    dtype : numpy.dtype
+        floating point type of iterations, float32 halves memory traffic at the cost of precision (Default is float64)
 
     Returns
     -------
@@ -89,55 +157,43 @@ def chambolleProjection(f, f_ref, mi = 100, tau = 0.25, tol = 1e-5):
         number of iterations that was needed to reach result image
     rms_min : float
         error of the result image
+    xi : numpy.ndarray
+        final dual field, returned only if `returnDual` is True
     '''
     n = 1
-    xi = np.array([np.zeros(f.shape), np.zeros(f.shape)])
-    x1 = np.zeros(f.shape)
-    x2 = np.zeros(f.shape)
-    x_best = np.zeros(f.shape)
-
-    rms_min_A = []
-    rms_min = 1.0
-    it_min = 0    
-
-    while n - it_min < 100:
-        gdv = np.array(gradient2D(divergence2D(xi) - f/mi))
-        d = np.sqrt(np.power(gdv[0], 2) + np.power(gdv[1], 2))
-        d = np.tile( d, [2, 1, 1] )
-        xi = np.divide(xi + tau * gdv, 1 + tau * d)
-
-        x2 = mi * divergence2D(xi)
-        
-        diff = x2 - f_ref
-        rms_n = np.sqrt(np.var(diff.flatten()))
-        
-        if len(rms_min_A) < 100:
-            rms_min_A.append(rms_min)
-        else:
-            rms_min_A.pop(0)
-            rms_min_A.append(rms_min)
-
-        if rms_n < rms_min:
-            rms_diff = rms_min_A[0] - rms_min_A[-1]
-            rms_local_diff = rms_min - rms_n
-
-            if (rms_diff < 10 * tol):
-                if (rms_local_diff < tol):
-                    rms_min = rms_n
-                    it_min = n
-                    break
-
-            rms_min = rms_n
-            it_min = n
-
-        x1 = x2
+    # Kernels work on stacks, single image is stack of one
+    f = np.asarray(f, dtype=dtype).reshape((1,) + f.shape)
+    f_ref = np.asarray(f_ref, dtype=dtype).reshape((1,) + f_ref.shape)
+    # Scalars of the dtype of images keep kernels in that precision
+    mi = f.dtype.type(mi)
+    tau = f.dtype.type(tau)
+    xi = initialDual(xi0, f.shape, dtype)
+    x2 = np.zeros(f.shape, dtype=dtype)
+    g = np.empty(f.shape, dtype=dtype)
+    rms = np.empty(1)
+    divergenceResidual(xi, f, mi, x2, g)
+    monitor = RmsMonitor(1, tol, window, checkEvery) if monitor is None else monitor
+
+    while True:
+        updateDual(xi, g, tau)
+        divergenceResidual(xi, f, mi, x2, g)
+
+        if monitor.due(n):
+            monitor.update(n, rmsDifferenceStack(x2, f_ref, rms))
+        if monitor.finished(n)[0]:
+            break
+
         n = n + 1
 
-    x_best = x2
+    x_best = x2[0]
+    it_min = int(monitor.itMin[0])
+    rms_min = monitor.rmsMin[0]
 
+    if returnDual:
+        return [x_best, it_min, rms_min, xi[:, 0]]
     return [x_best, it_min, rms_min]
 
-def chambolleProjectionStopCriterion(f, mi = 100, tau = 0.25, tol = 1e-5):
+def chambolleProjectionStopCriterion(f, mi = 100, tau = 0.25, tol = 1e-5, checkEvery = 1, xi0 = None, returnDual = False, dtype = np.float64):
     '''
     The 2D case of Chambolle projection algorithm. This version uses stop criterion.
 
@@ -156,6 +212,15 @@ def chambolleProjectionStopCriterion(f, mi = 100, tau = 0.25, tol = 1e-5):
         Chambolle projection step value
     tol : float
         error tolerance when algorithm should stop its work
+    checkEvery : int
+        number of iterations between evaluations of the stop criterion (Default is 1)
+    xi0 : numpy.ndarray
+        initial dual field of shape (2, N, N), e.g. returned for similar image, changes are still measured
+        against the first change of solve from zero, see `coldChange` (Default is zeros)
+    returnDual : bool
+        set to True to return also the final dual field
+    dtype : numpy.dtype
+        floating point type of iterations, float32 halves memory traffic at the cost of precision (Default is float64)
 
     Returns
     -------
@@ -165,41 +230,45 @@ def chambolleProjectionStopCriterion(f, mi = 100, tau = 0.25, tol = 1e-5):
         number of iterations that was needed to reach result image
     g_err : float
         error of the result image
+    xi : numpy.ndarray
+        final dual field, returned only if `returnDual` is True
     '''
     n = 1
-    xi = np.array([np.zeros(f.shape), np.zeros(f.shape)])
-    x1 = np.zeros(f.shape)
-    x2 = np.zeros(f.shape)
-    np.cuda.Stream.null.synchronize()
-
-    err_n = 0
-    err = []
-    pp = []
-    pr = 1
+    # Kernels work on stacks, single image is stack of one
+    f = np.asarray(f, dtype=dtype).reshape((1,) + f.shape)
+    mi = f.dtype.type(mi)
+    tau = f.dtype.type(tau)
+    xi = initialDual(xi0, f.shape, dtype)
+    x2 = np.zeros(f.shape, dtype=dtype)
+    g = np.empty(f.shape, dtype=dtype)
+    divergenceResidual(xi, f, mi, x2, g)
+    x1 = x2.copy()
+
+    errFirst = None if xi0 is None else coldChange(f, mi, tau, checkEvery)
+    monitor = ChangeMonitor(1, tol, checkEvery = checkEvery, errFirst = errFirst)
+    num2 = np.linalg.norm(f[0], 2)
+    diff = np.empty(f.shape[1:])
 
     for _ in iter(int, 1):
         
-        gdv = np.array(gradient2D(divergence2D(xi) - f/mi))
-        d = np.sqrt(np.power(gdv[0], 2) + np.power(gdv[1], 2))
-        d = np.tile( d, [2, 1, 1] )
-        xi = np.divide(xi + tau * gdv, 1 + tau * d)
+        updateDual(xi, g, tau)
 
         # Reconstruction
-        x2 = mi * divergence2D(xi)
+        divergenceResidual(xi, f, mi, x2, g)
         # Tolerance
-        num1 = np.linalg.norm(x2 - x1, 2)
-        num2 = np.linalg.norm(f, 2)
-        err.append(num1 / num2)
-        
-        g_err = np.abs((err_n - err[n-1])/2)
-        err_n = err[n-1]
-        pp.append(g_err/err[0])
-        pr = pp[n-1]
+        if monitor.due(n):
+            num1 = np.linalg.norm(np.subtract(x2[0], x1[0], out = diff), 2)
+            monitor.update(np.array([num1 / num2]))
         
-        x1 = x2
+        # Buffers are swapped, so the newest reconstruction is in `x1`
+        x1, x2 = x2, x1
         n = n + 1
         
-        if pr < tol:
+        if monitor.finished(n)[0]:
             break
 
-    return [x2, n, g_err]
\ No newline at end of file
+    g_err = monitor.gErr[0]
+
+    if returnDual:
+        return [x1[0], n, g_err, xi[:, 0]]
+    return [x1[0], n, g_err]
\ No newline at end of file
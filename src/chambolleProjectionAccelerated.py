@@ -0,0 +1,298 @@
+import math
+import numpy as np
+
+from src.chambolleKernels import divergenceResidual, projectDual, extrapolate, primalStep
+from src.chambolleProjection import initialDual
+from src.convergenceMonitor import RmsMonitor, ChangeMonitor, rmsDifferenceStack
+
+class _FGPSolver:
+    """
+    Fast gradient projection (FISTA) on the dual problem of total variation denoising
+
+    Source
+    -------
+    Beck, Amir, and Marc Teboulle. "Fast gradient-based algorithms for constrained total variation image denoising and deblurring problems."
+    IEEE Transactions on Image Processing 18.11 (2009): 2419-2434.
+    """
+
+    def __init__(self, f, mi, tau, xi0):
+        self.f = f
+        # Scalars passed to kernels have the dtype of images, so kernels keep its precision
+        self.mi = f.dtype.type(mi)
+        # Gradient of the dual problem is 8-Lipschitz, longer steps diverge
+        self.step = f.dtype.type(min(tau, 1 / 8))
+        self.dual = initialDual(xi0, f.shape, f.dtype)
+        self._previous = self.dual.copy()
+        self._momentum = self.dual.copy()
+        self._residual = np.empty(f.shape, dtype=f.dtype)
+        self._scratch = np.empty(f.shape, dtype=f.dtype)
+        self._t = 1.0
+
+    def iterate(self):
+        divergenceResidual(self._momentum, self.f, self.mi, self._scratch, self._residual)
+        self._previous, self.dual = self.dual, self._previous
+        projectDual(self._momentum, self._residual, self.step, self.dual)
+        t = (1 + math.sqrt(1 + 4 * self._t**2)) / 2
+        extrapolate(self.dual, self._previous, self.f.dtype.type((self._t - 1) / t), self._momentum)
+        self._t = t
+
+    def reconstruct(self, out):
+        divergenceResidual(self.dual, self.f, self.mi, out, self._scratch)
+
+class _PrimalDualSolver:
+    """
+    Accelerated primal-dual algorithm of Chambolle and Pock for total variation denoising,
+    result is the difference between the input and denoised image
+
+    Source
+    -------
+    Chambolle, Antonin, and Thomas Pock. "A first-order primal-dual algorithm for convex problems with applications to imaging."
+    Journal of Mathematical Imaging and Vision 40.1 (2011): 120-145.
+    """
+
+    def __init__(self, f, mi, tau, xi0):
+        self.f = f
+        self.mi = f.dtype.type(mi)
+        self.tau = tau
+        # Steps satisfy tau * sigma * ||grad||^2 <= 1
+        self.sigma = 1 / (8 * tau)
+        xi = initialDual(xi0, f.shape, f.dtype)
+        self._u = np.empty(f.shape, dtype=f.dtype)
+        divergenceResidual(xi, f, self.mi, self._u, np.empty(f.shape, dtype=f.dtype))
+        self._u = f - self._u
+        self._u_bar = self._u.copy()
+        # Dual variable of primal-dual formulation is the negative of Chambolle dual field
+        self._p = -xi
+
+    @property
+    def dual(self):
+        return -self._p
+
+    def iterate(self):
+        # Steps are updated in float64, kernels get them in the dtype of images
+        scalar = self.f.dtype.type
+        projectDual(self._p, self._u_bar, scalar(self.sigma), self._p)
+        # Fidelity term is 1 / mi strongly convex, so steps are accelerated
+        theta = 1 / math.sqrt(1 + 2 * self.tau / float(self.mi))
+        primalStep(self._u, self._p, self.f, scalar(self.tau), self.mi, scalar(theta), self._u_bar)
+        self.tau = theta * self.tau
+        self.sigma = self.sigma / theta
+
+    def reconstruct(self, out):
+        np.subtract(self.f, self._u, out = out)
+
+def _solveReference(solver, f_ref, tol, window, checkEvery, returnDual, monitor):
+    '''
+    Iterates solver until reference stop rule of `chambolleProjection` is met
+    '''
+    f_ref = np.asarray(f_ref, dtype=solver.f.dtype).reshape((1,) + f_ref.shape)
+    x2 = np.empty(f_ref.shape, dtype=solver.f.dtype)
+    rms = np.empty(1)
+    monitor = RmsMonitor(1, tol, window, checkEvery) if monitor is None else monitor
+    n = 1
+
+    while True:
+        solver.iterate()
+
+        if monitor.due(n):
+            solver.reconstruct(x2)
+            monitor.update(n, rmsDifferenceStack(x2, f_ref, rms))
+        if monitor.finished(n)[0]:
+            break
+
+        n = n + 1
+
+    solver.reconstruct(x2)
+    result = [x2[0], int(monitor.itMin[0]), monitor.rmsMin[0]]
+    if returnDual:
+        result.append(solver.dual[:, 0])
+    return result
+
+def _firstChange(solver, checkEvery):
+    '''
+    Iterates solver up to the first evaluation of stop criterion of `chambolleProjectionStopCriterion`, returns its relative change
+    '''
+    x1 = np.empty(solver.f.shape, dtype=solver.f.dtype)
+    x2 = np.empty(solver.f.shape, dtype=solver.f.dtype)
+    for _ in range(checkEvery - 1):
+        solver.iterate()
+    solver.reconstruct(x1)
+    solver.iterate()
+    solver.reconstruct(x2)
+    return np.linalg.norm(x2[0] - x1[0], 2) / np.linalg.norm(solver.f[0], 2)
+
+def _solveStopCriterion(solver, tol, checkEvery, returnDual, cold = None):
+    '''
+    Iterates solver until stop criterion of `chambolleProjectionStopCriterion` is met. Changes of warm-started solver
+    are measured against the first change of `cold`, the same solver started from zero, see `coldChange`.
+    '''
+    x1 = np.empty(solver.f.shape, dtype=solver.f.dtype)
+    x2 = np.empty(solver.f.shape, dtype=solver.f.dtype)
+    diff = np.empty(solver.f.shape[1:], dtype=solver.f.dtype)
+    solver.reconstruct(x1)
+    errFirst = None if cold is None else [_firstChange(cold, checkEvery)]
+    monitor = ChangeMonitor(1, tol, checkEvery = checkEvery, errFirst = errFirst)
+    num2 = np.linalg.norm(solver.f[0], 2)
+    n = 1
+
+    while True:
+        solver.iterate()
+        solver.reconstruct(x2)
+
+        if monitor.due(n):
+            num1 = np.linalg.norm(np.subtract(x2[0], x1[0], out = diff), 2)
+            monitor.update(np.array([num1 / num2]))
+
+        x1, x2 = x2, x1
+        n = n + 1
+
+        if monitor.finished(n)[0]:
+            break
+
+    result = [x1[0], n, monitor.gErr[0]]
+    if returnDual:
+        result.append(solver.dual[:, 0])
+    return result
+
+def chambolleProjectionFGP(f, f_ref, mi = 100, tau = 0.25, tol = 1e-5, window = 100, checkEvery = 1, xi0 = None, returnDual = False, monitor = None, dtype = np.float64):
+    '''
+    The 2D case of Chambolle projection solved with fast gradient projection (FISTA). This version uses reference image.
+    Arguments, stop rule and results are the same as of `chambolleProjection`, step is `min(tau, 1/8)`.
+
+    Source
+    -------
+    Beck, Amir, and Marc Teboulle. "Fast gradient-based algorithms for constrained total variation image denoising and deblurring problems."
+    IEEE Transactions on Image Processing 18.11 (2009): 2419-2434.
+
+    Parameters
+    ----------
+    f : numpy.ndarray
+        image which is input for Chambolle
+    f_ref : numpy.ndarray
+        image og input but perfectly without background function
+    mi : float
+        regularization parameter that defines the separation of the energy between the fringes and noise components
+    tau : float
+        step value, limited to 1/8
+    tol : float
+        error tolerance when algorithm should stop its work
+    window : int
+        number of iterations without improvement after which algorithm stops (Default is 100)
+    checkEvery : int
+        number of iterations between evaluations of the error (Default is 1)
+    xi0 : numpy.ndarray
+        initial dual field of shape (2, N, N) (Default is zeros)
+    returnDual : bool
+        set to True to return also the final dual field
+    monitor : RmsMonitor
+        monitor deciding when to stop, replaces the stop rule given by `tol`, `window` and `checkEvery` (Optional)
+    dtype : numpy.dtype
+        floating point type of iterations, float32 halves memory traffic at the cost of precision (Default is float64)
+
+    Returns
+    -------
+    x_best : numpy.ndarray
+        image with filtered background function
+    it_min : int
+        number of iterations that was needed to reach result image
+    rms_min : float
+        error of the result image
+    xi : numpy.ndarray
+        final dual field, returned only if `returnDual` is True
+    '''
+    f = np.asarray(f, dtype=dtype).reshape((1,) + f.shape)
+    return _solveReference(_FGPSolver(f, mi, tau, xi0), f_ref, tol, window, checkEvery, returnDual, monitor)
+
+def chambolleProjectionStopCriterionFGP(f, mi = 100, tau = 0.25, tol = 1e-5, checkEvery = 1, xi0 = None, returnDual = False, dtype = np.float64):
+    '''
+    The 2D case of Chambolle projection solved with fast gradient projection (FISTA). This version uses stop criterion.
+    Arguments, stop rule and results are the same as of `chambolleProjectionStopCriterion`, step is `min(tau, 1/8)`.
+
+    Source
+    -------
+    Beck, Amir, and Marc Teboulle. "Fast gradient-based algorithms for constrained total variation image denoising and deblurring problems."
+    IEEE Transactions on Image Processing 18.11 (2009): 2419-2434.
+
+    Parameters
+    ----------
+    f : numpy.ndarray
+        image which is input for Chambolle
+    mi : float
+        regularization parameter that defines the separation of the energy between the fringes and noise components
+    tau : float
+        step value, limited to 1/8
+    tol : float
+        error tolerance when algorithm should stop its work
+    checkEvery : int
+        number of iterations between evaluations of the stop criterion (Default is 1)
+    xi0 : numpy.ndarray
+        initial dual field of shape (2, N, N) (Default is zeros)
+    returnDual : bool
+        set to True to return also the final dual field
+    dtype : numpy.dtype
+        floating point type of iterations, float32 halves memory traffic at the cost of precision (Default is float64)
+
+    Returns
+    -------
+    x2 : numpy.ndarray
+        image with filtered background function
+    n : int
+        number of iterations that was needed to reach result image
+    g_err : float
+        error of the result image
+    xi : numpy.ndarray
+        final dual field, returned only if `returnDual` is True
+    '''
+    f = np.asarray(f, dtype=dtype).reshape((1,) + f.shape)
+    cold = None if xi0 is None else _FGPSolver(f, mi, tau, None)
+    return _solveStopCriterion(_FGPSolver(f, mi, tau, xi0), tol, checkEvery, returnDual, cold)
+
+def chambolleProjectionPrimalDual(f, f_ref, mi = 100, tau = 0.25, tol = 1e-5, window = 100, checkEvery = 1, xi0 = None, returnDual = False, monitor = None, dtype = np.float64):
+    '''
+    The 2D case of Chambolle projection solved with accelerated primal-dual algorithm of Chambolle and Pock.
+    This version uses reference image. Arguments, stop rule and results are the same as of `chambolleProjection`,
+    `tau` is the initial primal step and dual step is `1 / (8 * tau)`.
+
+    Source
+    -------
+    Chambolle, Antonin, and Thomas Pock. "A first-order primal-dual algorithm for convex problems with applications to imaging."
+    Journal of Mathematical Imaging and Vision 40.1 (2011): 120-145.
+
+    Parameters
+    ----------
+    f : numpy.ndarray
+        image which is input for Chambolle
+    f_ref : numpy.ndarray
+        image og input but perfectly without background function
+    mi : float
+        regularization parameter that defines the separation of the energy between the fringes and noise components
+    tau : float
+        initial primal step value
+    tol : float
+        error tolerance when algorithm should stop its work
+    window : int
+        number of iterations without improvement after which algorithm stops (Default is 100)
+    checkEvery : int
+        number of iterations between evaluations of the error (Default is 1)
+    xi0 : numpy.ndarray
+        initial dual field of shape (2, N, N) (Default is zeros)
+    returnDual : bool
+        set to True to return also the final dual field
+    monitor : RmsMonitor
+        monitor deciding when to stop, replaces the stop rule given by `tol`, `window` and `checkEvery` (Optional)
+    dtype : numpy.dtype
+        floating point type of iterations, float32 halves memory traffic at the cost of precision (Default is float64)
+
+    Returns
+    -------
+    x_best : numpy.ndarray
+        image with filtered background function
+    it_min : int
+        number of iterations that was needed to reach result image
+    rms_min : float
+        error of the result image
+    xi : numpy.ndarray
+        final dual field, returned only if `returnDual` is True
+    '''
+    f = np.asarray(f, dtype=dtype).reshape((1,) + f.shape)
+    return _solveReference(_PrimalDualSolver(f, mi, tau, xi0), f_ref, tol, window, checkEvery, returnDual, monitor)
@@ -0,0 +1,203 @@
+import numpy as np
+
+from src.chambolleKernels import divergenceResidual, updateDual
+from src.chambolleProjection import initialDual, coldChange
+from src.convergenceMonitor import RmsMonitor, ChangeMonitor, rmsDifferenceStack
+
+def chambolleProjectionBatch(f, f_ref, mi = 100, tau = 0.25, tol = 1e-5, window = 100, checkEvery = 1, xi0 = None, returnDual = False, dtype = np.float64):
+    '''
+    The 2D case of Chambolle projection algorithm run on stack of images at once. This version uses reference images.
+    Every image follows the same iterations and stop rule as `chambolleProjection`. Images that converged are
+    removed from the working stack, so the remaining ones keep iterating without extra cost.
+
+    Source
+    -------
+    Cywińska, Maria, Maciej Trusiak, and Krzysztof Patorski.
+    "Automatized fringe pattern preprocessing using unsupervised variational image decomposition." Optics express 27.16 (2019): 22542-22562.
+
+    Parameters
+    ----------
+    f : numpy.ndarray
+        stack of shape (B, N, N) of images which are input for Chambolle
+    f_ref : numpy.ndarray
+        stack of shape (B, N, N) of images of input but perfectly without background function
+    mi : float
+        regularization parameter that defines the separation of the energy between the fringes and noise components
+    tau : float
+        Chambolle projection step value
+    tol : float
+        error tolerance when algorithm should stop its work
+    window : int
+        number of iterations without improvement after which algorithm stops (Default is 100)
+    checkEvery : int
+        number of iterations between evaluations of the error (Default is 1)
+    xi0 : numpy.ndarray
+        initial dual field of shape (2, B, N, N), e.g. returned for similar image (Default is zeros)
+    returnDual : bool
+        set to True to return also the final dual field
+    dtype : numpy.dtype
+        floating point type of iterations and of the results, float32 halves memory traffic at the cost of precision (Default is float64)
+
+    Returns
+    -------
+    x_best : numpy.ndarray
+        stack of images with filtered background function
+    it_min : numpy.ndarray
+        number of iterations that was needed to reach every result image
+    rms_min : numpy.ndarray
+        error of every result image
+    xi : numpy.ndarray
+        final dual field of every image, returned only if `returnDual` is True
+    '''
+    f = np.asarray(f, dtype=dtype)
+    f_ref = np.asarray(f_ref, dtype=dtype)
+    # Scalars of the dtype of images keep kernels in that precision
+    mi = f.dtype.type(mi)
+    tau = f.dtype.type(tau)
+    batch = f.shape[0]
+    x_best = np.zeros(f.shape, dtype=dtype)
+    it_min = np.zeros(batch, dtype=np.int64)
+    rms_min = np.ones(batch)
+
+    # Working stacks hold only images that still iterate, `active` maps them back to the batch
+    active = np.arange(batch)
+    f_work = f
+    f_ref_work = f_ref
+    xi = initialDual(xi0, f.shape, dtype)
+    xi_out = np.zeros((2,) + f.shape, dtype=dtype) if returnDual else None
+    x2 = np.zeros(f.shape, dtype=dtype)
+    g = np.empty(f.shape, dtype=dtype)
+    rms = np.empty(batch)
+    divergenceResidual(xi, f_work, mi, x2, g)
+    monitor = RmsMonitor(batch, tol, window, checkEvery)
+    n = 1
+
+    while active.size > 0:
+        updateDual(xi, g, tau)
+        divergenceResidual(xi, f_work, mi, x2, g)
+
+        if monitor.due(n):
+            monitor.update(n, rmsDifferenceStack(x2, f_ref_work, rms))
+
+        done = monitor.finished(n)
+        if np.any(done):
+            x_best[active[done]] = x2[done]
+            if returnDual:
+                xi_out[:, active[done]] = xi[:, done]
+            it_min[active[done]] = monitor.itMin[done]
+            rms_min[active[done]] = monitor.rmsMin[done]
+            keep = ~done
+            active = active[keep]
+            f_work = f_work[keep]
+            f_ref_work = f_ref_work[keep]
+            xi = xi[:, keep]
+            x2 = x2[keep]
+            g = g[keep]
+            rms = rms[keep]
+            monitor.compact(keep)
+
+        n = n + 1
+
+    if returnDual:
+        return [x_best, it_min, rms_min, xi_out]
+    return [x_best, it_min, rms_min]
+
+def chambolleProjectionStopCriterionBatch(f, mi = 100, tau = 0.25, tol = 1e-5, checkEvery = 1, xi0 = None, returnDual = False, dtype = np.float64):
+    '''
+    The 2D case of Chambolle projection algorithm run on stack of images at once. This version uses stop criterion.
+    Every image follows the same iterations and stop rule as `chambolleProjectionStopCriterion`. Images that converged are
+    removed from the working stack, so the remaining ones keep iterating without extra cost.
+
+    Source
+    -------
+    Cywińska, Maria, Maciej Trusiak, and Krzysztof Patorski.
+    "Automatized fringe pattern preprocessing using unsupervised variational image decomposition." Optics express 27.16 (2019): 22542-22562.
+
+    Parameters
+    ----------
+    f : numpy.ndarray
+        stack of shape (B, N, N) of images which are input for Chambolle
+    mi : float
+        regularization parameter that defines the separation of the energy between the fringes and noise components
+    tau : float
+        Chambolle projection step value
+    tol : float
+        error tolerance when algorithm should stop its work
+    checkEvery : int
+        number of iterations between evaluations of the stop criterion (Default is 1)
+    xi0 : numpy.ndarray
+        initial dual field of shape (2, B, N, N), e.g. returned for similar image, changes are still measured
+        against the first change of solve from zero, see `coldChange` (Default is zeros)
+    returnDual : bool
+        set to True to return also the final dual field
+    dtype : numpy.dtype
+        floating point type of iterations and of the results, float32 halves memory traffic at the cost of precision (Default is float64)
+
+    Returns
+    -------
+    x2 : numpy.ndarray
+        stack of images with filtered background function
+    n : numpy.ndarray
+        number of iterations that was needed to reach every result image
+    g_err : numpy.ndarray
+        error of every result image
+    xi : numpy.ndarray
+        final dual field of every image, returned only if `returnDual` is True
+    '''
+    f = np.asarray(f, dtype=dtype)
+    mi = f.dtype.type(mi)
+    tau = f.dtype.type(tau)
+    batch = f.shape[0]
+    x_out = np.zeros(f.shape, dtype=dtype)
+    n_out = np.zeros(batch, dtype=np.int64)
+    g_err_out = np.zeros(batch)
+
+    active = np.arange(batch)
+    f_work = f
+    xi = initialDual(xi0, f.shape, dtype)
+    xi_out = np.zeros((2,) + f.shape, dtype=dtype) if returnDual else None
+    x2 = np.zeros(f.shape, dtype=dtype)
+    g = np.empty(f.shape, dtype=dtype)
+    divergenceResidual(xi, f_work, mi, x2, g)
+    x1 = x2.copy()
+    diff = np.empty(f.shape, dtype=dtype)
+    num2 = np.linalg.norm(f, 2, axis=(1, 2))
+    errFirst = None if xi0 is None else coldChange(f, mi, tau, checkEvery)
+    monitor = ChangeMonitor(batch, tol, checkEvery = checkEvery, errFirst = errFirst)
+    n = 1
+
+    while active.size > 0:
+        updateDual(xi, g, tau)
+
+        # Reconstruction
+        divergenceResidual(xi, f_work, mi, x2, g)
+        # Tolerance
+        if monitor.due(n):
+            num1 = np.linalg.norm(np.subtract(x2, x1, out = diff), 2, axis=(1, 2))
+            monitor.update(num1 / num2)
+
+        # Buffers are swapped, so the newest reconstruction is in `x1`
+        x1, x2 = x2, x1
+        n = n + 1
+
+        done = monitor.finished(n)
+        if np.any(done):
+            x_out[active[done]] = x1[done]
+            if returnDual:
+                xi_out[:, active[done]] = xi[:, done]
+            n_out[active[done]] = n
+            g_err_out[active[done]] = monitor.gErr[done]
+            keep = ~done
+            active = active[keep]
+            f_work = f_work[keep]
+            xi = xi[:, keep]
+            x1 = x1[keep]
+            x2 = x2[keep]
+            g = g[keep]
+            diff = diff[keep]
+            num2 = num2[keep]
+            monitor.compact(keep)
+
+    if returnDual:
+        return [x_out, n_out, g_err_out, xi_out]
+    return [x_out, n_out, g_err_out]
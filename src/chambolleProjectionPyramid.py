@@ -0,0 +1,192 @@
+import numpy as np
+
+from src.chambolleProjection import chambolleProjection, chambolleProjectionStopCriterion
+
+def downsample2D(mat):
+    '''
+    Function that halves size of the image by averaging blocks of 2x2 pixels. Odd last row and column are dropped.
+
+    Parameters
+    ----------
+    mat : numpy.ndarray
+        image to be downsampled
+
+    Returns:
+    ----------
+    res : numpy.ndarray
+        image of shape (N // 2, M // 2)
+    '''
+    rows = mat.shape[0] // 2
+    cols = mat.shape[1] // 2
+    return mat[:2*rows, :2*cols].reshape(rows, 2, cols, 2).mean(axis=(1, 3))
+
+def prolongDual(xi, shape):
+    '''
+    Function that prolongs dual field of Chambolle projection to twice finer grid by nearest neighbour.
+    Components normal to the last row and column are zero, like in the fields calculated by Chambolle iterations.
+
+    Parameters
+    ----------
+    xi : numpy.ndarray
+        dual field of shape (2, N, M)
+    shape : tuple
+        shape of the finer image, (2N, 2M) or one pixel larger in any axis
+
+    Returns:
+    ----------
+    res : numpy.ndarray
+        dual field of shape (2,) + `shape`
+    '''
+    res = np.repeat(np.repeat(xi, 2, axis=1), 2, axis=2)
+    res = np.pad(res, ((0, 0), (0, shape[0] - res.shape[1]), (0, shape[1] - res.shape[2])), mode='edge')
+    res[0, -1, :] = 0
+    res[1, :, -1] = 0
+    return res
+
+def pyramidLevels(shape, minSize = 64):
+    '''
+    Function that returns number of coarser levels of the pyramid, so the coarsest image is not smaller than `minSize`.
+
+    Parameters
+    ----------
+    shape : tuple
+        shape of the image
+    minSize : int
+        minimal size of the coarsest image
+
+    Returns:
+    ----------
+    levels : int
+        number of coarser levels
+    '''
+    levels = 0
+    while min(shape) // 2**(levels + 1) >= minSize:
+        levels = levels + 1
+    return levels
+
+def _solvePyramid(solve, images, mi, levels, minSize, xi0, returnDual, metrics):
+    '''
+    Runs `solve(images, mi, xi)` from the coarsest level to the finest one, every level starts from prolonged dual field.
+    Regularization at level `l` is `mi / 2**l`, so total variation and fidelity keep the same balance on the coarser grid.
+    Returns result of the finest level, iterations of all levels are counted by `metrics`.
+    '''
+    if xi0 is not None:
+        levels = 0
+    elif levels is None:
+        levels = pyramidLevels(images[0].shape, minSize)
+
+    pyramid = [images]
+    for _ in range(levels):
+        pyramid.append([downsample2D(image) for image in pyramid[-1]])
+
+    xi = xi0
+    total = 0
+    for level in range(levels, -1, -1):
+        result = solve(pyramid[level], mi / 2**level, xi)
+        total = total + result[1]
+        if level > 0:
+            xi = prolongDual(result[3], pyramid[level - 1][0].shape)
+
+    if metrics is not None:
+        metrics.count("pyramidIterations", int(total))
+    return result if returnDual else result[:3]
+
+def chambolleProjectionPyramid(f, f_ref, mi = 100, tau = 0.25, tol = 1e-5, levels = None, minSize = 64, xi0 = None, returnDual = False, metrics = None, dtype = np.float64):
+    '''
+    The 2D case of Chambolle projection algorithm solved coarse to fine. This version uses reference image.
+    Images are downsampled `levels` times, every level is solved with `chambolleProjection` starting from dual field
+    of the coarser level, so full resolution iterations only refine the solution.
+    Results are the same as results of `chambolleProjection`, iterations of coarser levels are counted only by `metrics`.
+
+    Source
+    -------
+    Cywińska, Maria, Maciej Trusiak, and Krzysztof Patorski.
+    "Automatized fringe pattern preprocessing using unsupervised variational image decomposition." Optics express 27.16 (2019): 22542-22562.
+
+    Parameters
+    ----------
+    f : numpy.ndarray
+        image which is input for Chambolle
+    f_ref : numpy.ndarray
+        image og input but perfectly without background function
+    mi : float
+        regularization parameter that defines the separation of the energy between the fringes and noise components
+    tau : float
+        Chambolle projection step value
+    tol : float
+        error tolerance when algorithm should stop its work, used on every level
+    levels : int
+        number of coarser levels (Default is chosen so the coarsest image is not smaller than `minSize`)
+    minSize : int
+        minimal size of the coarsest image (Default is 64)
+    xi0 : numpy.ndarray
+        initial dual field of the full resolution level, coarser levels are skipped if it is given
+    returnDual : bool
+        set to True to return also the final dual field
+    metrics : Metrics
+        metrics that receive number of iterations of all levels as counter `pyramidIterations` (Optional)
+    dtype : numpy.dtype
+        floating point type of iterations of all levels (Default is float64)
+
+    Returns
+    -------
+    x_best : numpy.ndarray
+        image with filtered background function
+    it_min : int
+        number of full resolution iterations that was needed to reach result image
+    rms_min : float
+        error of the result image
+    xi : numpy.ndarray
+        final dual field, returned only if `returnDual` is True
+    '''
+    solve = lambda images, mi_l, xi: chambolleProjection(images[0], images[1], mi_l, tau, tol, xi0 = xi, returnDual = True, dtype = dtype)
+    return _solvePyramid(solve, [f, f_ref], mi, levels, minSize, xi0, returnDual, metrics)
+
+def chambolleProjectionStopCriterionPyramid(f, mi = 100, tau = 0.25, tol = 1e-5, levels = None, minSize = 64, xi0 = None, returnDual = False, metrics = None, dtype = np.float64):
+    '''
+    The 2D case of Chambolle projection algorithm solved coarse to fine. This version uses stop criterion.
+    Images are downsampled `levels` times, every level is solved with `chambolleProjectionStopCriterion` starting
+    from dual field of the coarser level, so full resolution iterations only refine the solution.
+    Results are the same as results of `chambolleProjectionStopCriterion`, iterations of coarser levels are counted only by `metrics`.
+
+    Source
+    -------
+    Cywińska, Maria, Maciej Trusiak, and Krzysztof Patorski.
+    "Automatized fringe pattern preprocessing using unsupervised variational image decomposition." Optics express 27.16 (2019): 22542-22562.
+
+    Parameters
+    ----------
+    f : numpy.ndarray
+        image which is input for Chambolle
+    mi : float
+        regularization parameter that defines the separation of the energy between the fringes and noise components
+    tau : float
+        Chambolle projection step value
+    tol : float
+        error tolerance when algorithm should stop its work, used on every level
+    levels : int
+        number of coarser levels (Default is chosen so the coarsest image is not smaller than `minSize`)
+    minSize : int
+        minimal size of the coarsest image (Default is 64)
+    xi0 : numpy.ndarray
+        initial dual field of the full resolution level, coarser levels are skipped if it is given
+    returnDual : bool
+        set to True to return also the final dual field
+    metrics : Metrics
+        metrics that receive number of iterations of all levels as counter `pyramidIterations` (Optional)
+    dtype : numpy.dtype
+        floating point type of iterations of all levels (Default is float64)
+
+    Returns
+    -------
+    x2 : numpy.ndarray
+        image with filtered background function
+    n : int
+        number of full resolution iterations that was needed to reach result image
+    g_err : float
+        error of the result image
+    xi : numpy.ndarray
+        final dual field, returned only if `returnDual` is True
+    '''
+    solve = lambda images, mi_l, xi: chambolleProjectionStopCriterion(images[0], mi_l, tau, tol, xi0 = xi, returnDual = True, dtype = dtype)
+    return _solvePyramid(solve, [f], mi, levels, minSize, xi0, returnDual, metrics)
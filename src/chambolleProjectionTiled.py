@@ -0,0 +1,419 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import tempfile
+import numpy as np
+
+from src.chambolleKernels import chambolleTile
+from src.convergenceMonitor import RmsMonitor, ChangeMonitor, differenceMoments
+
+# Buffers of single tile per pixel: dual field (2), image, reference image or previous reconstruction,
+# reconstruction, residual and temporaries of the error
+TILE_ARRAYS = 8
+
+def tileLayout(shape, halo, workers, memoryBudget, itemsize = 8):
+    '''
+    Function that splits image into rectangular tiles, so every worker solves tile with halo within its part of `memoryBudget`.
+    There are at least `workers` tiles, so all workers have work.
+
+    Parameters
+    ----------
+    shape : tuple
+        shape of the image
+    halo : int
+        width of the halo around every tile in pixels
+    workers : int
+        number of tiles solved at once
+    memoryBudget : int
+        memory for buffers of all tiles solved at once in bytes
+    itemsize : int
+        size of floating point number of iterations in bytes (Default is 8)
+
+    Returns:
+    ----------
+    tiles : list
+        tuples (first row, end row, first column, end column) of tiles without halo
+    '''
+    side = int(np.sqrt(memoryBudget / (workers * TILE_ARRAYS * itemsize))) - 2 * halo
+    if side < halo:
+        raise ValueError("Memory budget of {} bytes is too small for {} tiles with halo of {} pixels".format(memoryBudget, workers, halo))
+
+    parts = [-(-shape[0] // side), -(-shape[1] // side)]
+    while parts[0] * parts[1] < workers and (parts[0] < shape[0] or parts[1] < shape[1]):
+        axis = 0 if shape[0] / parts[0] >= shape[1] / parts[1] else 1
+        parts[axis] += 1
+    rows = np.linspace(0, shape[0], parts[0] + 1).astype(int)
+    cols = np.linspace(0, shape[1], parts[1] + 1).astype(int)
+    return [(rows[i], rows[i + 1], cols[j], cols[j + 1]) for i in range(parts[0]) for j in range(parts[1])]
+
+def _normalProduct(matrix, v, rowsPerBlock):
+    '''
+    Returns `matrix.T @ matrix @ v`, matrix is read in blocks of rows
+    '''
+    w = np.zeros(matrix.shape[1])
+    for r in range(0, matrix.shape[0], rowsPerBlock):
+        block = np.asarray(matrix[r:r + rowsPerBlock], dtype=np.float64)
+        w += block.T @ (block @ v)
+    return w
+
+def spectralNorm(matrix, v = None, tol = 1e-9, maxIterations = 100, rowsPerBlock = None):
+    '''
+    Function that calculates the largest singular value of matrix, e.g. memory-mapped, by Lanczos iterations on `matrix.T @ matrix`.
+    Matrix is read in blocks of rows once per iteration, so it never has to fit in memory. Vector returned by the previous call
+    for similar matrix makes the iteration converge in fewer steps.
+
+    Parameters
+    ----------
+    matrix : numpy.ndarray
+        matrix of shape (N, M)
+    v : numpy.ndarray
+        approximate right singular vector of length M, e.g. returned for similar matrix (Optional)
+    tol : float
+        relative residual of the square of the singular value that stops iterations (Default is 1e-9)
+    maxIterations : int
+        maximal number of iterations (Default is 100)
+    rowsPerBlock : int
+        number of rows read at once (Default is all rows)
+
+    Returns:
+    ----------
+    norm : float
+        the largest singular value, equal to `numpy.linalg.norm(matrix, 2)` within `tol`
+    v : numpy.ndarray
+        right singular vector
+    '''
+    rows, cols = matrix.shape
+    rowsPerBlock = rows if rowsPerBlock is None else max(1, rowsPerBlock)
+    start = np.random.default_rng(0).standard_normal(cols)
+    start = start / np.linalg.norm(start)
+    if v is not None:
+        # Random part keeps all singular vectors in the start, so the largest one is found even if it is not the previous one
+        start = start + v / np.linalg.norm(v)
+
+    basis = [start / np.linalg.norm(start)]
+    alphas = []
+    betas = []
+    for _ in range(min(maxIterations, cols)):
+        w = _normalProduct(matrix, basis[-1], rowsPerBlock)
+        alphas.append(basis[-1] @ w)
+        # Full reorthogonalization, done twice, keeps basis orthogonal in floating point
+        Q = np.array(basis)
+        w -= Q.T @ (Q @ w)
+        w -= Q.T @ (Q @ w)
+        beta = np.linalg.norm(w)
+
+        values, vectors = np.linalg.eigh(np.diag(alphas) + np.diag(betas, 1) + np.diag(betas, -1))
+        theta = values[-1]
+        if beta <= tol * abs(theta) or beta * abs(vectors[-1, -1]) <= tol * abs(theta):
+            break
+        betas.append(beta)
+        basis.append(w / beta)
+
+    return np.sqrt(max(theta, 0.0)), Q.T @ vectors[:, -1]
+
+def _solveTile(tile, shape, halo, xiIn, xiOut, f, mi, tau, steps, x, dtype, f_ref = None, due = None, d = None):
+    '''
+    Solves `steps` iterations of single tile with halo read from `xiIn`, writes dual field and reconstruction without halo
+    to `xiOut` and `x`. Returns errors against `f_ref` of iterations marked by `due` as tuples (mean, sum of squared deviations)
+    or writes change of reconstruction in the last iteration to `d`.
+    '''
+    r0, r1, c0, c1 = tile
+    h0, h1, w0, w1 = max(0, r0 - halo), min(shape[0], r1 + halo), max(0, c0 - halo), min(shape[1], c1 + halo)
+    core = (slice(r0 - h0, r1 - h0), slice(c0 - w0, c1 - w0))
+
+    xi = np.array(xiIn[:, h0:h1, w0:w1], dtype=dtype)
+    image = np.ascontiguousarray(f[h0:h1, w0:w1], dtype=dtype)
+    x2 = np.empty(image.shape, dtype=dtype)
+    g = np.empty(image.shape, dtype=dtype)
+
+    errors = []
+    if f_ref is not None:
+        reference = np.ascontiguousarray(f_ref[r0:r1, c0:c1], dtype=dtype)
+        chambolleTile(xi, image, mi, tau, 0, True, x2, g)
+        for k in range(steps):
+            chambolleTile(xi, image, mi, tau, 1, False, x2, g)
+            if due[k]:
+                errors.append(differenceMoments(x2[core], reference))
+    elif d is not None:
+        chambolleTile(xi, image, mi, tau, steps - 1, True, x2, g)
+        previous = x2[core].copy()
+        chambolleTile(xi, image, mi, tau, 1, False, x2, g)
+        d[r0:r1, c0:c1] = x2[core] - previous
+    else:
+        chambolleTile(xi, image, mi, tau, steps, True, x2, g)
+
+    xiOut[:, r0:r1, c0:c1] = xi[(slice(None),) + core]
+    x[r0:r1, c0:c1] = x2[core]
+    return errors
+
+def _sweep(executor, tiles, shape, halo, xiIn, xiOut, f, mi, tau, steps, x, dtype, f_ref = None, due = None, d = None):
+    '''
+    Solves `steps` iterations of all tiles in parallel, returns errors of every tile, see `_solveTile`
+    '''
+    futures = [executor.submit(_solveTile, tile, shape, halo, xiIn, xiOut, f, mi, tau, steps, x, dtype, f_ref, due, d) for tile in tiles]
+    return [future.result() for future in futures]
+
+def _rms(errors, size):
+    '''
+    Combines means and sums of squared deviations of tiles into standard deviation of the whole image
+    '''
+    count, mean, squares = 0, 0.0, 0.0
+    for tileSize, (tileMean, tileSquares) in zip(size, errors):
+        total = count + tileSize
+        delta = tileMean - mean
+        mean = mean + delta * tileSize / total
+        squares = squares + tileSquares + delta * delta * count * tileSize / total
+        count = total
+    return np.sqrt(squares / count)
+
+def _buffers(folder, shape, dtype, names):
+    '''
+    Creates memory-mapped buffers filled with zeros in `folder`
+    '''
+    return [np.lib.format.open_memmap(os.path.join(folder, name + ".npy"), mode="w+", dtype=dtype, shape=shape[name]) for name in names]
+
+def _outputBuffer(folder, outputFile, shape, dtype):
+    '''
+    Creates memory-mapped buffer of filtered image in `outputFile` or in `folder`
+    '''
+    if outputFile is not None:
+        return np.lib.format.open_memmap(outputFile, mode="w+", dtype=dtype, shape=shape)
+    return _buffers(folder, {"x": shape}, dtype, ["x"])[0]
+
+def _run(solve, folder, returnDual, returnOutput):
+    '''
+    Runs `solve(folder)` in `folder` or in temporary folder and keeps only results that are returned.
+    Results in temporary folder are copied to memory, other memory-mapped results are returned as they are.
+    '''
+    def returned(result):
+        result = result if returnDual else result[:3]
+        return result if returnOutput else [None] + result[1:]
+
+    if folder is not None:
+        os.makedirs(folder, exist_ok = True)
+        return returned(solve(folder))
+    with tempfile.TemporaryDirectory() as temporary:
+        # Dual field and filtered image are dropped before anything is copied, so they never have to fit in memory
+        result = returned(solve(temporary))
+        inside = lambda value: os.path.dirname(os.path.abspath(value.filename)) == os.path.abspath(temporary)
+        # Memory maps are closed before the folder is removed
+        return [np.array(value) if isinstance(value, np.memmap) and inside(value) else value for value in result]
+
+def chambolleProjectionTiled(f, f_ref, mi = 100, tau = 0.25, tol = 1e-5, window = 100, checkEvery = 1, halo = 8, memoryBudget = 2**28, workers = None, folder = None, outputFile = None, returnOutput = True, xi0 = None, returnDual = False, monitor = None, dtype = np.float64):
+    '''
+    The 2D case of Chambolle projection algorithm for images larger than memory. This version uses reference image.
+    Image is split into tiles with halo of `halo` pixels. Every tile makes `halo - 1` iterations on its own,
+    then dual fields of tiles are exchanged through double-buffered memory-mapped arrays in `folder`.
+    Only tiles solved at once are kept in memory, together they fit in `memoryBudget`. Tiles are solved in parallel by threads.
+    Result is the same as result of `chambolleProjection`.
+
+    Source
+    -------
+    Cywińska, Maria, Maciej Trusiak, and Krzysztof Patorski.
+    "Automatized fringe pattern preprocessing using unsupervised variational image decomposition." Optics express 27.16 (2019): 22542-22562.
+
+    Parameters
+    ----------
+    f : numpy.ndarray
+        image which is input for Chambolle, e.g. memory-mapped
+    f_ref : numpy.ndarray
+        image og input but perfectly without background function
+    mi : float
+        regularization parameter that defines the separation of the energy between the fringes and noise components
+    tau : float
+        Chambolle projection step value
+    tol : float
+        error tolerance when algorithm should stop its work
+    window : int
+        number of iterations without improvement after which algorithm stops (Default is 100)
+    checkEvery : int
+        number of iterations between evaluations of the error (Default is 1)
+    halo : int
+        width of the halo around every tile in pixels, at least 2 (Default is 8)
+    memoryBudget : int
+        memory for buffers of tiles solved at once in bytes (Default is 256 MiB)
+    workers : int
+        number of threads solving tiles (Default is number of cores)
+    folder : str
+        folder for memory-mapped dual fields and result, they are returned memory-mapped (Default is temporary folder and results are copied to memory)
+    outputFile : str
+        path of .npy file for filtered image, it is returned memory-mapped and is never copied to memory (Optional)
+    returnOutput : bool
+        set to False to return None instead of filtered image, e.g. when only number of iterations is needed (Default is True)
+    xi0 : numpy.ndarray
+        initial dual field of shape (2, N, M), e.g. returned for similar image (Default is zeros)
+    returnDual : bool
+        set to True to return also the final dual field
+    monitor : RmsMonitor
+        monitor deciding when to stop, replaces the stop rule given by `tol`, `window` and `checkEvery` (Optional)
+    dtype : numpy.dtype
+        floating point type of iterations, float32 halves memory traffic at the cost of precision (Default is float64)
+
+    Returns
+    -------
+    x_best : numpy.ndarray
+        image with filtered background function, memory-mapped if `folder` or `outputFile` is given, None if `returnOutput` is False
+    it_min : int
+        number of iterations that was needed to reach result image
+    rms_min : float
+        error of the result image
+    xi : numpy.ndarray
+        final dual field, returned only if `returnDual` is True
+    '''
+    if halo < 2:
+        raise ValueError("Halo must be at least 2 pixels")
+    workers = os.cpu_count() if workers is None else workers
+    shape = f.shape
+    tiles = tileLayout(shape, halo, workers, memoryBudget, np.dtype(dtype).itemsize)
+    size = [(r1 - r0) * (c1 - c0) for r0, r1, c0, c1 in tiles]
+    mi = np.dtype(dtype).type(mi)
+    tau = np.dtype(dtype).type(tau)
+    monitor = RmsMonitor(1, tol, window, checkEvery) if monitor is None else monitor
+
+    def solve(folder):
+        xiIn, xiOut = _buffers(folder, {"xi0": (2,) + shape, "xi1": (2,) + shape}, dtype, ["xi0", "xi1"])
+        x = _outputBuffer(folder, outputFile, shape, dtype)
+        if xi0 is not None:
+            xiIn[:] = np.asarray(xi0).reshape((2,) + shape)
+
+        n = 0
+        with ThreadPoolExecutor(max_workers = workers) as executor:
+            while True:
+                steps = halo - 1
+                due = [monitor.due(n + k + 1) for k in range(steps)]
+                errors = _sweep(executor, tiles, shape, halo, xiIn, xiOut, f, mi, tau, steps, x, dtype, f_ref, due)
+
+                stop = None
+                checks = iter(zip(*errors))
+                for k in range(steps):
+                    if due[k]:
+                        monitor.update(n + k + 1, np.array([_rms(next(checks), size)]))
+                    if monitor.finished(n + k + 1)[0]:
+                        stop = k + 1
+                        break
+
+                if stop is not None and stop < steps:
+                    # Input buffer still holds dual field before the sweep, so the sweep is repeated up to the last iteration
+                    _sweep(executor, tiles, shape, halo, xiIn, xiOut, f, mi, tau, stop, x, dtype)
+                xiIn, xiOut = xiOut, xiIn
+                n = n + steps if stop is None else n + stop
+                if stop is not None:
+                    break
+
+        x.flush()
+        return [x, int(monitor.itMin[0]), monitor.rmsMin[0], xiIn]
+
+    return _run(solve, folder, returnDual, returnOutput)
+
+def chambolleProjectionStopCriterionTiled(f, mi = 100, tau = 0.25, tol = 1e-5, checkEvery = None, halo = 8, memoryBudget = 2**28, workers = None, folder = None, outputFile = None, returnOutput = True, xi0 = None, returnDual = False, normTol = 1e-9, dtype = np.float64):
+    '''
+    The 2D case of Chambolle projection algorithm for images larger than memory. This version uses stop criterion.
+    Image is split into tiles like in `chambolleProjectionTiled`, tiles exchange dual fields after `halo - 1` iterations
+    or when the stop criterion is evaluated. Norms of the criterion are calculated by `spectralNorm` from memory-mapped
+    change of the reconstruction, so every evaluation reads the whole change once per Lanczos iteration, usually 10 to 30 times
+    and at most 100 times. Criterion is therefore evaluated every `halo - 1` iterations by default, while
+    `chambolleProjectionStopCriterion` evaluates it every iteration, so numbers of iterations are comparable only for the same `checkEvery`.
+
+    Source
+    -------
+    Cywińska, Maria, Maciej Trusiak, and Krzysztof Patorski.
+    "Automatized fringe pattern preprocessing using unsupervised variational image decomposition." Optics express 27.16 (2019): 22542-22562.
+
+    Parameters
+    ----------
+    f : numpy.ndarray
+        image which is input for Chambolle, e.g. memory-mapped
+    mi : float
+        regularization parameter that defines the separation of the energy between the fringes and noise components
+    tau : float
+        Chambolle projection step value
+    tol : float
+        error tolerance when algorithm should stop its work
+    checkEvery : int
+        number of iterations between evaluations of the stop criterion, every evaluation costs many passes over the image (Default is `halo - 1`)
+    halo : int
+        width of the halo around every tile in pixels, at least 2 (Default is 8)
+    memoryBudget : int
+        memory for buffers of tiles solved at once in bytes (Default is 256 MiB)
+    workers : int
+        number of threads solving tiles (Default is number of cores)
+    folder : str
+        folder for memory-mapped dual fields and result, they are returned memory-mapped (Default is temporary folder and results are copied to memory)
+    outputFile : str
+        path of .npy file for filtered image, it is returned memory-mapped and is never copied to memory (Optional)
+    returnOutput : bool
+        set to False to return None instead of filtered image, e.g. when only number of iterations is needed (Default is True)
+    xi0 : numpy.ndarray
+        initial dual field of shape (2, N, M), e.g. returned for similar image, changes are still measured
+        against the first change of solve from zero, see `coldChange` (Default is zeros)
+    returnDual : bool
+        set to True to return also the final dual field
+    normTol : float
+        relative tolerance of norms of the stop criterion, see `spectralNorm` (Default is 1e-9)
+    dtype : numpy.dtype
+        floating point type of iterations, float32 halves memory traffic at the cost of precision (Default is float64)
+
+    Returns
+    -------
+    x2 : numpy.ndarray
+        image with filtered background function, memory-mapped if `folder` or `outputFile` is given, None if `returnOutput` is False
+    n : int
+        number of iterations that was needed to reach result image
+    g_err : float
+        error of the result image
+    xi : numpy.ndarray
+        final dual field, returned only if `returnDual` is True
+    '''
+    if halo < 2:
+        raise ValueError("Halo must be at least 2 pixels")
+    workers = os.cpu_count() if workers is None else workers
+    checkEvery = halo - 1 if checkEvery is None else checkEvery
+    shape = f.shape
+    itemsize = np.dtype(dtype).itemsize
+    tiles = tileLayout(shape, halo, workers, memoryBudget, itemsize)
+    mi = np.dtype(dtype).type(mi)
+    tau = np.dtype(dtype).type(tau)
+    # Rows are read as float64, so block of rows takes at most half of the budget
+    rowsPerBlock = memoryBudget // (2 * 8 * shape[1])
+    num2, _ = spectralNorm(f, tol = normTol, rowsPerBlock = rowsPerBlock)
+    # Monitor is created when its first error is known, evaluations are scheduled the same way before
+    due = ChangeMonitor(1, tol, checkEvery = checkEvery).due
+
+    def solve(folder):
+        xiIn, xiOut = _buffers(folder, {"xi0": (2,) + shape, "xi1": (2,) + shape}, dtype, ["xi0", "xi1"])
+        d = _buffers(folder, {"d": shape}, dtype, ["d"])[0]
+        x = _outputBuffer(folder, outputFile, shape, dtype)
+
+        def advance(executor, n, xiIn, xiOut):
+            # Sweep ends at evaluation of the criterion, which needs the change of the last iteration
+            steps = 1
+            while steps < halo - 1 and not due(n + steps):
+                steps = steps + 1
+            check = due(n + steps)
+            _sweep(executor, tiles, shape, halo, xiIn, xiOut, f, mi, tau, steps, x, dtype, d = d if check else None)
+            return n + steps, check, xiOut, xiIn
+
+        with ThreadPoolExecutor(max_workers = workers) as executor:
+            errFirst = None
+            if xi0 is not None:
+                # Solve from zero runs up to its first evaluation, its change measures changes of the warm-started solve, see `coldChange`
+                n, check = 0, False
+                while not check:
+                    n, check, xiIn, xiOut = advance(executor, n, xiIn, xiOut)
+                errFirst = [spectralNorm(d, tol = normTol, rowsPerBlock = rowsPerBlock)[0] / num2]
+                xiIn[:] = np.asarray(xi0).reshape((2,) + shape)
+            monitor = ChangeMonitor(1, tol, checkEvery = checkEvery, errFirst = errFirst)
+
+            n = 0
+            v = None
+            while True:
+                n, check, xiIn, xiOut = advance(executor, n, xiIn, xiOut)
+                if check:
+                    num1, v = spectralNorm(d, v, normTol, rowsPerBlock = rowsPerBlock)
+                    monitor.update(np.array([num1 / num2]))
+                if monitor.finished(n + 1)[0]:
+                    break
+
+        x.flush()
+        return [x, n + 1, monitor.gErr[0], xiIn]
+
+    return _run(solve, folder, returnDual, returnOutput)
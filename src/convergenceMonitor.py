@@ -0,0 +1,300 @@
+from numba import jit, prange
+import numpy as np
+
+@jit(nopython=True, parallel=True, cache=True)
+def rmsDifferenceStack(x, ref, out):
+    '''
+    Function that calculates standard deviation of difference of every pair of images of two stacks.
+    Difference is never stored, mean and variance are accumulated in two passes over the images.
+    Boosted with Numba: works in C and with parallel computing.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        stack of images of shape (B, N, M)
+    ref : numpy.ndarray
+        stack of reference images of shape (B, N, M)
+    out : numpy.ndarray
+        buffer of shape (B,) for the results
+
+    Returns:
+    ----------
+    out : numpy.ndarray
+        standard deviation of `x - ref` of every image
+    '''
+    rows = x.shape[1]
+    cols = x.shape[2]
+    size = rows * cols
+    for k in range(x.shape[0]):
+        total = 0.0
+        for r in prange(rows):
+            for c in range(cols):
+                total += x[k, r, c] - ref[k, r, c]
+        mean = total / size
+
+        squares = 0.0
+        for r in prange(rows):
+            for c in range(cols):
+                d = x[k, r, c] - ref[k, r, c] - mean
+                squares += d * d
+        out[k] = np.sqrt(squares / size)
+
+    return out
+
+@jit(nopython=True, nogil=True, cache=True)
+def differenceMoments(x, ref):
+    '''
+    Function that calculates mean of difference of two images and sum of squared deviations of the difference from the mean,
+    in the same two passes as `rmsDifferenceStack`. Moments of parts of the image are combined into its standard deviation.
+    Runs in single thread and releases GIL, so parts of the image are processed in parallel by threads.
+    Boosted with Numba: works in C.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        image of shape (N, M)
+    ref : numpy.ndarray
+        reference image of shape (N, M)
+
+    Returns:
+    ----------
+    mean : float
+        mean of `x - ref`
+    squares : float
+        sum of squared deviations of `x - ref` from the mean
+    '''
+    rows = x.shape[0]
+    cols = x.shape[1]
+    total = 0.0
+    for r in range(rows):
+        for c in range(cols):
+            total += x[r, c] - ref[r, c]
+    mean = total / (rows * cols)
+
+    squares = 0.0
+    for r in range(rows):
+        for c in range(cols):
+            d = x[r, c] - ref[r, c] - mean
+            squares += d * d
+    return mean, squares
+
+class ConvergenceMonitor:
+    """
+    A base class used to decide when iterations of Chambolle projection should stop
+
+    ...
+
+    Monitor tracks every image of the stack, single image is tracked as stack of one.
+    Errors are evaluated only every `checkEvery` iteration, see `due`.
+
+    Attributes
+    ----------
+    tol : float
+        error tolerance when algorithm should stop its work
+    window : int
+        number of iterations that are taken into account by the stop rule
+    checkEvery : int
+        number of iterations between evaluations of the error
+    _stopped : numpy.ndarray
+        True for images that met the stop rule
+
+    Methods
+    -------
+    due(n)
+        Returns True if error should be evaluated in iteration `n`
+    finished(n)
+        Returns mask of images that should stop after iteration `n`
+    compact(keep)
+        Keeps only state of images selected by mask `keep`
+    """
+
+    def __init__(self, batch = 1, tol = 1e-5, window = 100, checkEvery = 1):
+        """
+        Parameters
+        ----------
+        batch : int
+            Number of tracked images
+        tol : float
+            Error tolerance when algorithm should stop its work
+        window : int
+            Number of iterations that are taken into account by the stop rule
+        checkEvery : int
+            Number of iterations between evaluations of the error
+        """
+        self.tol = tol
+        self.window = window
+        self.checkEvery = checkEvery
+        self._stopped = np.zeros(batch, dtype=bool)
+
+    def due(self, n):
+        '''
+        Returns True if error should be evaluated in iteration `n`
+        '''
+        return n % self.checkEvery == 0
+
+    def finished(self, n):
+        '''
+        Returns mask of images that should stop after iteration `n`
+        '''
+        return self._stopped.copy()
+
+    def compact(self, keep):
+        '''
+        Keeps only state of images selected by mask `keep`
+        '''
+        self._stopped = self._stopped[keep]
+
+class RmsMonitor(ConvergenceMonitor):
+    """
+    A class used to track error of Chambolle projection against reference images
+
+    ...
+
+    The best error of the last `window` iterations is kept in ring buffer. Image stops when its error improves
+    by less than `tol` while the best error did not improve by `10 * tol` over the window, or when the best error
+    did not improve for `window` iterations.
+
+    Attributes
+    ----------
+    rmsMin : numpy.ndarray
+        the best error of every image
+    itMin : numpy.ndarray
+        iteration of the best error of every image
+    _history : numpy.ndarray
+        ring buffer of the best errors of shape (B, number of checks in window)
+    _checks : int
+        number of evaluations written to the ring buffer
+
+    Methods
+    -------
+    update(n, rms)
+        Takes errors of iteration `n`
+    """
+
+    def __init__(self, batch = 1, tol = 1e-5, window = 100, checkEvery = 1):
+        super().__init__(batch, tol, window, checkEvery)
+        self.rmsMin = np.ones(batch)
+        self.itMin = np.zeros(batch, dtype=np.int64)
+        self._history = np.zeros((batch, -(-window // checkEvery)))
+        self._checks = 0
+
+    def update(self, n, rms):
+        '''
+        Takes errors of iteration `n`
+
+        Parameters
+        ----------
+        n : int
+            number of iteration
+        rms : numpy.ndarray
+            error of every tracked image
+        '''
+        length = self._history.shape[1]
+        self._history[:, self._checks % length] = self.rmsMin
+        self._checks += 1
+        oldest = self._history[:, 0] if self._checks <= length else self._history[:, self._checks % length]
+
+        improved = rms < self.rmsMin
+        self._stopped |= improved & (oldest - self.rmsMin < 10 * self.tol) & (self.rmsMin - rms < self.tol)
+        self.rmsMin = np.where(improved, rms, self.rmsMin)
+        self.itMin = np.where(improved, n, self.itMin)
+
+    def finished(self, n):
+        return self._stopped | (n + 1 - self.itMin >= self.window)
+
+    def compact(self, keep):
+        super().compact(keep)
+        self.rmsMin = self.rmsMin[keep]
+        self.itMin = self.itMin[keep]
+        self._history = self._history[keep]
+
+class ChangeMonitor(ConvergenceMonitor):
+    """
+    A class used to track relative change of the result of Chambolle projection between iterations
+
+    ...
+
+    Image stops when the change of relative error per iteration, divided by the first relative error,
+    is smaller than `tol`. Only the first and the last error are kept. Solve started from given dual field
+    changes little in its first iterations, so it passes the first relative error of solve from zero as `errFirst`
+    and stops by the same rule as solve from zero, see `coldChange`.
+
+    Attributes
+    ----------
+    gErr : numpy.ndarray
+        the last change of error of every image
+    _errFirst : numpy.ndarray
+        the first relative error of every image
+    _errLast : numpy.ndarray
+        the last relative error of every image
+
+    Methods
+    -------
+    update(err)
+        Takes relative errors of the current iteration
+    """
+
+    def __init__(self, batch = 1, tol = 1e-5, window = 100, checkEvery = 1, errFirst = None):
+        """
+        Parameters
+        ----------
+        errFirst : numpy.ndarray
+            The first relative error of every image, taken from the first update if it is not given (Optional)
+        """
+        super().__init__(batch, tol, window, checkEvery)
+        self.gErr = np.zeros(batch)
+        self._errFirst = None if errFirst is None else np.asarray(errFirst, dtype=np.float64)
+        self._errLast = np.zeros(batch)
+
+    def update(self, err):
+        '''
+        Takes relative errors of the current iteration
+
+        Parameters
+        ----------
+        err : numpy.ndarray
+            relative error of every tracked image
+        '''
+        if self._errFirst is None:
+            self._errFirst = err
+        # Change is averaged over iterations between evaluations
+        self.gErr = np.abs((self._errLast - err) / 2) / self.checkEvery
+        self._errLast = err
+        self._stopped |= self.gErr / self._errFirst < self.tol
+
+    def compact(self, keep):
+        super().compact(keep)
+        self.gErr = self.gErr[keep]
+        self._errLast = self._errLast[keep]
+        if self._errFirst is not None:
+            self._errFirst = self._errFirst[keep]
+
+class TargetMonitor(RmsMonitor):
+    """
+    A class used to stop Chambolle projection when error against reference image reaches given value
+
+    ...
+
+    Used to compare solvers by number of iterations and time they need to reach the same error.
+
+    Attributes
+    ----------
+    target : float
+        error that stops the iterations
+    maxIterations : int
+        number of iterations after which algorithm stops even if target was not reached
+    """
+
+    def __init__(self, target, maxIterations = 100000, batch = 1, checkEvery = 1):
+        super().__init__(batch, 0.0, maxIterations, checkEvery)
+        self.target = target
+        self.maxIterations = maxIterations
+
+    def update(self, n, rms):
+        improved = rms < self.rmsMin
+        self.rmsMin = np.where(improved, rms, self.rmsMin)
+        self.itMin = np.where(improved, n, self.itMin)
+        self._stopped |= self.rmsMin <= self.target
+
+    def finished(self, n):
+        return self._stopped | (n >= self.maxIterations)
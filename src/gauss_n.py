@@ -1,7 +1,7 @@
-from numba import jit
+from numba import jit, prange
 import numpy as np
 
-@jit(nopython=True, parallel=True)
+@jit(nopython=True, parallel=True, cache=True)
 def gauss_n(X, Y, mu_x = 0.0, mu_y = 0.0, amp = 1.0, sigma = 3.0):
     '''
     Function that generates 2D discrete gaussian distribution.
@@ -25,9 +25,51 @@ def gauss_n(X, Y, mu_x = 0.0, mu_y = 0.0, amp = 1.0, sigma = 3.0):
     Returns:
     ----------
     val : numpy.ndarray
-        matrix of 2D gaussian distribution
+        matrix of 2D gaussian distribution of dtype of `X`
     '''
-    exponent = ((X - mu_x)**2 + (Y - mu_y)**2) / 2*sigma
-    val = (amp*np.exp(-exponent))
+    # Parameters are cast to dtype of the grids, so float32 grids give float32 result
+    scalar = X.dtype.type
+    exponent = ((X - scalar(mu_x))**2 + (Y - scalar(mu_y))**2) / 2*scalar(sigma)
+    val = (scalar(amp)*np.exp(-exponent))
     
-    return val
\ No newline at end of file
+    return val
+
+@jit(nopython=True, parallel=True, cache=True)
+def separableGauss(x, y, mu_x, mu_y, amp, sigma, out):
+    '''
+    Function that generates the same 2D discrete gaussian distribution as `gauss_n` on grid meshgrided from axes `x` and `y`.
+    Gaussian is product of 1D gaussians of both axes, so only 2N exponentials are evaluated and the image is their outer product.
+    Values differ from `gauss_n` only by rounding.
+    Boosted with Numba: works in C and with parallel computing.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        values in X axis, that is columns of the image
+    y : numpy.ndarray
+        values in Y axis, that is rows of the image
+    mu_x : float
+        Displacement in X axis
+    mu_y : float
+        Displacement in Y axis
+    amp : float
+        Amplitude of gaussian distribution
+    sigma : float
+        Std dev of gaussian distribution
+    out : numpy.ndarray
+        preallocated matrix of shape (len(y), len(x)) that result is written to
+
+    Returns:
+    ----------
+    out : numpy.ndarray
+        matrix of 2D gaussian distribution
+    '''
+    scalar = out.dtype.type
+    # Exponent is scaled like in `gauss_n`
+    columns = np.exp(-((x - scalar(mu_x))**2 / 2*scalar(sigma)))
+    rows = scalar(amp)*np.exp(-((y - scalar(mu_y))**2 / 2*scalar(sigma)))
+    for r in prange(rows.shape[0]):
+        for c in range(columns.shape[0]):
+            out[r, c] = rows[r] * columns[c]
+
+    return out
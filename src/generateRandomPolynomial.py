@@ -1,11 +1,10 @@
-from numba import jit
+from numba import jit, prange
 import numpy as np
 
-@jit(nopython=True, parallel=True)
-def generateRandomPolynomial(X, Y, n):
+def generateRandomPolynomial(X, Y, n, rng = None):
     '''
     Function that generetes 2D discrete polynomial function distribution of specific order.
-    Boosted with Numba: works in C and with parallel computing.
+    Coefficients are drawn from `rng` and polynomial is evaluated with Numba.
 
     Parameters
     ----------
@@ -15,13 +14,57 @@ def generateRandomPolynomial(X, Y, n):
         meshgrided values in Y axis
     n : int
         order of polynomial
-        
+    rng : numpy.random.Generator
+        random generator to draw coefficients from (Default is global `numpy.random` state)
+
     Returns:
     ----------
     res : numpy.ndarray
         matrix of 2D polynomial function distribution
     '''
-    a = (2 * np.random.random_sample((3*n,)) - 1) * np.eye(n*3)
+    return evaluatePolynomial(X, Y, drawPolynomialCoefficients(n, rng))
+
+def drawPolynomialCoefficients(n, rng = None):
+    '''
+    Function that draws coefficients of random polynomial of specific order uniformly from range [-1, 1).
+
+    Parameters
+    ----------
+    n : int
+        order of polynomial
+    rng : numpy.random.Generator
+        random generator to draw coefficients from (Default is global `numpy.random` state)
+
+    Returns:
+    ----------
+    a : numpy.ndarray
+        vector of 3*n coefficients
+    '''
+    if rng is None:
+        return 2 * np.random.random_sample((3*n,)) - 1
+    return 2 * rng.random((3*n,)) - 1
+
+@jit(nopython=True, parallel=True, cache=True)
+def evaluatePolynomial(X, Y, a):
+    '''
+    Function that evaluates 2D discrete polynomial function distribution with given coefficients.
+    Boosted with Numba: works in C and with parallel computing.
+
+    Parameters
+    ----------
+    X : numpy.ndarray
+        meshgrided values in X axis
+    Y : numpy.ndarray
+        meshgrided values in Y axis
+    a : numpy.ndarray
+        vector of 3*n coefficients of polynomial of order n
+
+    Returns:
+    ----------
+    res : numpy.ndarray
+        matrix of 2D polynomial function distribution of dtype of `X`
+    '''
+    n = a.shape[0] // 3
 
     XY = []
 
@@ -35,8 +78,117 @@ def generateRandomPolynomial(X, Y, n):
         XY.append(Y)
         XY.append(X**(0)*Y**(0))
 
-    res = np.zeros(X.shape)
+    res = np.zeros(X.shape, X.dtype)
     for i in range(3*n):
-        res = res + a[i, i] * XY[i]
+        res = res + X.dtype.type(a[i]) * XY[i]
+
+    return res
+
+@jit(nopython=True, parallel=True, cache=True)
+def polynomialBasis(X, Y, n):
+    '''
+    Function that calculates stack of monomials of 2D polynomial of specific order.
+    Monomials are ordered like coefficients of `evaluatePolynomial`, so the polynomial is `contractBasis(basis, a)`.
+    Boosted with Numba: works in C and with parallel computing.
+
+    Parameters
+    ----------
+    X : numpy.ndarray
+        meshgrided values in X axis
+    Y : numpy.ndarray
+        meshgrided values in Y axis
+    n : int
+        order of polynomial
+
+    Returns:
+    ----------
+    basis : numpy.ndarray
+        stack of 3*n monomials of shape (3*n, N, N) of dtype of `X`
+    '''
+    basis = np.empty((3*n,) + X.shape, X.dtype)
+    for k in prange(n):
+        i = n - k
+        basis[3*k] = X**i
+        basis[3*k + 1] = Y**i
+        basis[3*k + 2] = X**(i-1)*Y**(i-1)
+
+    return basis
+
+@jit(nopython=True, parallel=True, cache=True)
+def contractBasis(basis, a):
+    '''
+    Function that evaluates 2D discrete polynomial function distribution as weighted sum of precomputed monomials.
+    Gives the same values as `evaluatePolynomial` without calculating powers of the grids.
+    Boosted with Numba: works in C and with parallel computing.
+
+    Parameters
+    ----------
+    basis : numpy.ndarray
+        stack of monomials of shape (3*n, N, N) calculated by `polynomialBasis`
+    a : numpy.ndarray
+        vector of 3*n coefficients of polynomial of order n
+
+    Returns:
+    ----------
+    res : numpy.ndarray
+        matrix of 2D polynomial function distribution of dtype of `basis`, sums are accumulated in float64
+    '''
+    rows = basis.shape[1]
+    cols = basis.shape[2]
+    res = np.zeros((rows, cols), basis.dtype)
+    for r in prange(rows):
+        for c in range(cols):
+            value = 0.0
+            for i in range(a.shape[0]):
+                value = value + a[i] * basis[i, r, c]
+            res[r, c] = value
+
+    return res
+
+@jit(nopython=True, parallel=True, cache=True)
+def separablePolynomial(x, y, a, out):
+    '''
+    Function that evaluates the same 2D discrete polynomial function distribution as `evaluatePolynomial` on grid meshgrided from axes `x` and `y`.
+    Every monomial is product of powers of both axes, so only powers of the axes are calculated and no stack of monomials is stored.
+    Sums are accumulated in float64 like in `contractBasis`, values differ from it only by rounding.
+    Boosted with Numba: works in C and with parallel computing.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        values in X axis, that is columns of the image
+    y : numpy.ndarray
+        values in Y axis, that is rows of the image
+    a : numpy.ndarray
+        vector of 3*n coefficients of polynomial of order n
+    out : numpy.ndarray
+        preallocated matrix of shape (len(y), len(x)) that result is written to
+
+    Returns:
+    ----------
+    out : numpy.ndarray
+        matrix of 2D polynomial function distribution
+    '''
+    n = a.shape[0] // 3
+    px = np.empty((n + 1, x.shape[0]))
+    py = np.empty((n + 1, y.shape[0]))
+    for i in range(n + 1):
+        px[i] = x.astype(np.float64)**i
+        py[i] = y.astype(np.float64)**i
+
+    # Monomials of order i are x**i, y**i and x**(i-1) * y**(i-1), in order of coefficients of `evaluatePolynomial`
+    columns = np.zeros(x.shape[0])
+    rows = np.zeros(y.shape[0])
+    for k in range(n):
+        i = n - k
+        columns += a[3*k] * px[i]
+        rows += a[3*k + 1] * py[i]
+
+    for r in prange(y.shape[0]):
+        for c in range(x.shape[0]):
+            value = rows[r] + columns[c]
+            for k in range(n):
+                value = value + a[3*k + 2] * py[n - k - 1, r] * px[n - k - 1, c]
+            out[r, c] = value
 
-    return res
\ No newline at end of file
+    return out
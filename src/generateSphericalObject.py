@@ -1,7 +1,7 @@
 from numba import jit
 import numpy as np
 
-@jit(nopython=True, parallel=True)
+@jit(nopython=True, parallel=True, cache=True)
 def generateSphericalObject(X, Y, x0 = 0, y0 = 0, f = 1, h = 0):
     '''
     Function that generetes 2D discrete spherical function distribution.
@@ -23,6 +23,7 @@ def generateSphericalObject(X, Y, x0 = 0, y0 = 0, f = 1, h = 0):
     Returns:
     ----------
     res : numpy.ndarray
-        matrix of 2D spherical function distribution
+        matrix of 2D spherical function distribution of dtype of `X`
     '''
-    return f*(np.power(X - x0,2) + np.power(Y - y0,2)) + h
\ No newline at end of file
+    scalar = X.dtype.type
+    return scalar(f)*(np.power(X - scalar(x0),2) + np.power(Y - scalar(y0),2)) + scalar(h)
\ No newline at end of file
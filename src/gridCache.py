@@ -0,0 +1,157 @@
+from collections import OrderedDict
+import threading
+import numpy as np
+
+from src.generateRandomPolynomial import polynomialBasis
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_budget = 256 * 2**20
+_used = 0
+
+def setGridCacheBudget(nbytes):
+    '''
+    Function that sets maximal memory used by cached grids and monomial stacks.
+    The least recently used entries are dropped when the budget is exceeded.
+
+    Parameters
+    ----------
+    nbytes : int
+        budget in bytes (Default of the package is 256 MiB)
+    '''
+    global _budget
+    with _lock:
+        _budget = nbytes
+        _evict()
+
+def clearGridCache():
+    '''
+    Function that drops all cached grids and monomial stacks.
+    '''
+    global _used
+    with _lock:
+        _cache.clear()
+        _used = 0
+
+def _evict():
+    '''
+    Drops the least recently used entries until cache fits the budget, lock must be held
+    '''
+    global _used
+    while _used > _budget and len(_cache) > 0:
+        _, value = _cache.popitem(last = False)
+        _used -= _nbytes(value)
+
+def _nbytes(value):
+    '''
+    Returns memory used by cached value, that is array or tuple of arrays
+    '''
+    if isinstance(value, tuple):
+        return sum(array.nbytes for array in value)
+    return value.nbytes
+
+def _cached(key, compute):
+    '''
+    Returns value stored under `key`, calculates it with `compute` if it is missing.
+    Returned arrays are read-only, because they are shared by all callers.
+    '''
+    global _used
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    value = compute()
+    for array in value if isinstance(value, tuple) else (value,):
+        array.setflags(write = False)
+
+    with _lock:
+        if key not in _cache and _nbytes(value) <= _budget:
+            _cache[key] = value
+            _used += _nbytes(value)
+            _evict()
+    return value
+
+def coordinateAxis(N, dtype = np.float64):
+    '''
+    Function that returns values from -1 to 1 along one axis of square image, the same as rows and columns of `coordinateGrid`.
+
+    Parameters
+    ----------
+    N : int
+        size of the image
+    dtype : numpy.dtype
+        floating point type of the values (Default is float64)
+
+    Returns:
+    ----------
+    axis : numpy.ndarray
+        read-only vector of N values
+    '''
+    dtype = np.dtype(dtype)
+    # Values are calculated in float64 and rounded, so axes of all types hold the same points
+    return _cached(('axis', N, dtype.str), lambda: np.linspace(-1, 1, N).astype(dtype, copy = False))
+
+def coordinateGrid(N, dtype = np.float64):
+    '''
+    Function that returns meshgrided values from -1 to 1 of square image, grids are shared by all callers.
+
+    Parameters
+    ----------
+    N : int
+        size of the image
+    dtype : numpy.dtype
+        floating point type of the grids (Default is float64)
+
+    Returns:
+    ----------
+    X, Y : numpy.ndarray
+        read-only meshgrided values in X and Y axis
+    '''
+    axis = coordinateAxis(N, dtype)
+    return _cached(('grid', N, np.dtype(dtype).str), lambda: tuple(np.meshgrid(axis, axis)))
+
+def monomialBasisFits(N, n, dtype = np.float64):
+    '''
+    Function that checks if stack of monomials returned by `monomialBasis` fits the budget of the cache.
+    Stack that does not fit is calculated again on every call, so polynomials are cheaper to evaluate by `separablePolynomial`.
+
+    Parameters
+    ----------
+    N : int
+        size of the image
+    n : int
+        order of polynomial
+    dtype : numpy.dtype
+        floating point type of the monomials (Default is float64)
+
+    Returns:
+    ----------
+    result : bool
+        True if the stack is kept in the cache
+    '''
+    with _lock:
+        return 3 * n * N * N * np.dtype(dtype).itemsize <= _budget
+
+def monomialBasis(N, n, dtype = np.float64):
+    '''
+    Function that returns stack of monomials of 2D polynomial of order `n` on grid of size `N`, see `polynomialBasis`.
+    Stacks are shared by all callers, so random polynomial is evaluated by `contractBasis` without calculating powers.
+    Stacks larger than the budget are not cached, see `monomialBasisFits`.
+
+    Parameters
+    ----------
+    N : int
+        size of the image
+    n : int
+        order of polynomial
+    dtype : numpy.dtype
+        floating point type of the monomials (Default is float64)
+
+    Returns:
+    ----------
+    basis : numpy.ndarray
+        read-only stack of 3*n monomials of shape (3*n, N, N)
+    '''
+    X, Y = coordinateGrid(N, dtype)
+    return _cached(('basis', N, n, np.dtype(dtype).str), lambda: polynomialBasis(X, Y, n))
@@ -0,0 +1,89 @@
+import numpy as np
+from PIL import Image
+
+from src.memmapDataset import MemmapDataset, isMemmapDataset
+from src.shardStore import ShardReader, isShardStore
+
+def normalizeMinMax(image):
+    '''
+    Function that rescales image to range [0, 1].
+
+    Parameters
+    ----------
+    image : numpy.ndarray
+        image to be rescaled
+
+    Returns
+    ----------
+    image : numpy.ndarray
+        rescaled image
+    '''
+    return np.divide(image - np.min(image), np.max(image) - np.min(image))
+
+def imageName(i):
+    '''
+    Function that returns name of the image written to labels file, the same for every format of the dataset.
+    Names are names of files of BMP dataset, so labels of the same images in other formats can be joined with them.
+
+    Parameters
+    ----------
+    i : int
+        number of the image
+
+    Returns
+    ----------
+    name : str
+        name of the image, e.g. `12.bmp`
+    '''
+    return str(i) + ".bmp"
+
+def imagePairLoader(images_folder):
+    '''
+    Function that returns loader of pairs of interferogram and reference fringes from dataset.
+    Dataset is folder with `Interferogram` and `Fringes` subfolders of BMP images, folder of array shards
+    or memory-mapped dataset. Images of memory-mapped dataset are returned as read-only views without copying.
+
+    Parameters
+    ----------
+    images_folder : str
+        folder of the dataset
+
+    Returns
+    ----------
+    load : function
+        function that takes number of the image and returns tuple (name, f, f_ref) of images rescaled to range [0, 1],
+        name is given by `imageName` for every format
+    '''
+    if isMemmapDataset(images_folder):
+        dataset = MemmapDataset(images_folder)
+
+        def load(i):
+            f, f_ref = dataset[i]
+            return imageName(i), f, f_ref
+
+        return load
+
+    if isShardStore(images_folder):
+        reader = ShardReader(images_folder)
+
+        def load(i):
+            f, f_ref, _ = reader[i]
+            return imageName(i), normalizeMinMax(f.astype(np.float64)), normalizeMinMax(f_ref.astype(np.float64))
+
+        return load
+
+    INTERFEROGRAM_PATH = images_folder + "Interferogram\\"
+    FRINGES_PATH = images_folder + "Fringes\\"
+
+    def load(i):
+        filename = imageName(i)
+
+        f_path = INTERFEROGRAM_PATH + filename
+        f = normalizeMinMax(np.array(Image.open(f_path).convert('L')))
+
+        f_ref_path = FRINGES_PATH + filename
+        f_ref = normalizeMinMax(np.array(Image.open(f_ref_path).convert('L')))
+
+        return filename, f, f_ref
+
+    return load
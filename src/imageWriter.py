@@ -0,0 +1,220 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import numpy as np
+from PIL import Image
+
+from src.metrics import timer
+from src.normalizeImage import normalizeImage
+
+def encodeImage(image, grayscale = False):
+    '''
+    Function that rescales image to range [0, 255] and wraps it in PIL image.
+
+    Parameters
+    ----------
+    image : numpy.ndarray
+        image to be encoded
+    grayscale : bool
+        set to True to encode native 8-bit single-channel image instead of RGB
+
+    Returns:
+    ----------
+    img : PIL.Image.Image
+        image ready to be saved
+    '''
+    return encodeRescaled(normalizeImage(image, normFactor=255), grayscale)
+
+def encodeRescaled(rescaled, grayscale = False):
+    '''
+    Function that wraps image already rescaled to range [0, 255] in PIL image.
+
+    Parameters
+    ----------
+    rescaled : numpy.ndarray
+        image rescaled to range [0, 255]
+    grayscale : bool
+        set to True to encode native 8-bit single-channel image instead of RGB
+
+    Returns:
+    ----------
+    img : PIL.Image.Image
+        image ready to be saved
+    '''
+    if grayscale:
+        # Truncation gives the same pixel values as conversion of float image to RGB
+        return Image.fromarray(np.clip(rescaled, 0, 255).astype(np.uint8), 'L')
+    # PIL keeps floating point images in float32, so float32 images are encoded without copying
+    return Image.fromarray(rescaled.astype(np.float32, copy = False)).convert('RGB')
+
+class ImageWriter:
+    """
+    A class used to encode and save images in background threads
+
+    ...
+
+    Images are rescaled to range [0, 255] in the calling thread, so buffers can be reused right after `submit` returns.
+    Encoding and disk writes run in pool of threads. Number of images waiting for the pool is bounded and
+    `submit` blocks when the bound is reached, so generation can not run ahead of the disk.
+
+    Attributes
+    ----------
+    _threads : int
+        number of threads that encode and save images
+    _maxPending : int
+        maximal number of images waiting to be saved
+    _grayscale : bool
+        True if images are saved as 8-bit single-channel images instead of RGB
+    _metrics : Metrics
+        metrics that receive time of normalization, encoding, writes and waiting for free slot, None if they are not collected
+
+    Methods
+    -------
+    setMetrics(metrics)
+        Sets metrics that receive time of stages of saving
+    submit(image, filename)
+        Queues image to be saved under `filename`
+    submitRescaled(rescaled, filename)
+        Queues image already rescaled to range [0, 255] to be saved under `filename`
+    flush()
+        Waits until all queued images are saved
+    close()
+        Saves queued images and stops threads
+    """
+
+    def __init__(self, threads = 4, maxPending = 64, grayscale = False):
+        """
+        Parameters
+        ----------
+        threads : int
+            Number of threads that encode and save images
+        maxPending : int
+            Maximal number of images waiting to be saved
+        grayscale : bool
+            Set to True to save 8-bit single-channel images instead of RGB
+        """
+        self._threads = threads
+        self._maxPending = maxPending
+        self._grayscale = grayscale
+        self._metrics = None
+        self._start()
+
+    def _start(self):
+        '''
+        Creates pool of threads and bookkeeping of pending writes
+        '''
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self._maxPending)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._error = None
+
+    def __getstate__(self):
+        '''
+        Only settings are copied, so writer can be sent to worker processes and starts its own threads there
+        '''
+        return {'_threads': self._threads, '_maxPending': self._maxPending, '_grayscale': self._grayscale, '_metrics': self._metrics}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._start()
+
+    def setMetrics(self, metrics):
+        '''
+        Sets metrics that receive time of stages of saving
+
+        Parameters
+        ----------
+        metrics : Metrics
+            metrics of the run, None to stop collecting them
+        '''
+        self._metrics = metrics
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def submit(self, image, filename):
+        '''
+        Queues image to be saved under `filename`, blocks if too many images are waiting
+
+        Parameters
+        ----------
+        image : numpy.ndarray
+            image to be saved
+        filename : str
+            path of the saved file
+        '''
+        with timer(self._metrics, "normalization"):
+            rescaled = normalizeImage(image, normFactor=255)
+        self.submitRescaled(rescaled, filename)
+
+    def submitRescaled(self, rescaled, filename):
+        '''
+        Queues image already rescaled to range [0, 255] to be saved under `filename`, blocks if too many images are waiting.
+        Writer keeps reference to `rescaled`, so it must not be modified afterwards.
+
+        Parameters
+        ----------
+        rescaled : numpy.ndarray
+            image to be saved
+        filename : str
+            path of the saved file
+        '''
+        self._raiseError()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers = self._threads)
+
+        with timer(self._metrics, "writerWait"):
+            self._slots.acquire()
+        future = self._executor.submit(self._write, rescaled, filename)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+
+    def _write(self, rescaled, filename):
+        '''
+        Encodes and saves image that is already rescaled to range [0, 255]
+        '''
+        with timer(self._metrics, "encoding"):
+            img = encodeRescaled(rescaled, self._grayscale)
+        with timer(self._metrics, "write"):
+            img.save(filename)
+
+    def _done(self, future):
+        '''
+        Releases slot of finished write and remembers its error
+        '''
+        with self._lock:
+            self._pending.discard(future)
+            if future.exception() is not None and self._error is None:
+                self._error = future.exception()
+        self._slots.release()
+
+    def _raiseError(self):
+        '''
+        Raises first error of background writes
+        '''
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def flush(self):
+        '''
+        Waits until all queued images are saved
+        '''
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            future.exception()
+        self._raiseError()
+
+    def close(self):
+        '''
+        Saves queued images and stops threads
+        '''
+        if self._executor is not None:
+            self._executor.shutdown(wait = True)
+            self._executor = None
+        self._raiseError()
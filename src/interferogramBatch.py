@@ -0,0 +1,254 @@
+from numba import jit, prange
+import numpy as np
+import math
+
+@jit(nopython=True, parallel=True, cache=True)
+def interferogramBatch(X, Y, phaseObject, angles, frequencies, a, b, n, out):
+    '''
+    Function that generates stack of interferograms with linear carrier in single pass.
+    Boosted with Numba: works in C and with parallel computing.
+
+    Parameters
+    ----------
+    X : numpy.ndarray
+        meshgrided values in X axis
+    Y : numpy.ndarray
+        meshgrided values in Y axis
+    phaseObject : numpy.ndarray
+        object to be coded in the phase of the interferograms
+    angles : numpy.ndarray
+        orientation angle of fringe pattern for every image in the stack
+    frequencies : numpy.ndarray
+        spatial frequency of fringe pattern for every image in the stack
+    a : numpy.ndarray
+        background function for every image in the stack
+    b : float
+        amplitude of fringe pattern
+    n : numpy.ndarray
+        noise function shared by all images in the stack
+    out : numpy.ndarray
+        preallocated stack of shape (batch, N, N) that results are written to, arrays of the same dtype keep it in whole computation
+
+    Returns:
+    ----------
+    out : numpy.ndarray
+        stack of interferograms
+    '''
+    batch = out.shape[0]
+    rows = out.shape[1]
+    cols = out.shape[2]
+    # Scalars have dtype of `out`, so float32 stacks are computed in float32
+    scalar = out.dtype.type
+    halfPi = scalar(math.pi / 2)
+    amplitude = scalar(b)
+    for idx in prange(batch * rows):
+        k = idx // rows
+        r = idx % rows
+        cosA = scalar(math.cos(angles[k]))
+        sinA = scalar(math.sin(angles[k]))
+        freq = scalar(frequencies[k])
+        for c in range(cols):
+            phi = halfPi * (cosA * X[r, c] + sinA * Y[r, c]) + phaseObject[r, c]
+            out[k, r, c] = a[k, r, c] + amplitude * math.cos(freq * phi) + n[r, c]
+
+    return out
+
+@jit(nopython=True, parallel=True, cache=True)
+def separableInterferogramBatch(x, y, phaseObject, angles, frequencies, a, b, n, out):
+    '''
+    Function that generates the same stack of interferograms as `interferogramBatch` on grid meshgrided from axes `x` and `y`.
+    Linear carrier is sum of terms of rows and columns, so it is calculated from the axes instead of reading two full grids.
+    Results are identical to `interferogramBatch`.
+    Boosted with Numba: works in C and with parallel computing.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        values in X axis, that is columns of the images
+    y : numpy.ndarray
+        values in Y axis, that is rows of the images
+    phaseObject : numpy.ndarray
+        object to be coded in the phase of the interferograms
+    angles : numpy.ndarray
+        orientation angle of fringe pattern for every image in the stack
+    frequencies : numpy.ndarray
+        spatial frequency of fringe pattern for every image in the stack
+    a : numpy.ndarray
+        background function for every image in the stack
+    b : float
+        amplitude of fringe pattern
+    n : numpy.ndarray
+        noise function shared by all images in the stack
+    out : numpy.ndarray
+        preallocated stack of shape (batch, N, N) that results are written to, arrays of the same dtype keep it in whole computation
+
+    Returns:
+    ----------
+    out : numpy.ndarray
+        stack of interferograms
+    '''
+    batch = out.shape[0]
+    rows = out.shape[1]
+    cols = out.shape[2]
+    scalar = out.dtype.type
+    halfPi = scalar(math.pi / 2)
+    amplitude = scalar(b)
+    for idx in prange(batch * rows):
+        k = idx // rows
+        r = idx % rows
+        cosA = scalar(math.cos(angles[k]))
+        rowCarrier = scalar(math.sin(angles[k])) * y[r]
+        freq = scalar(frequencies[k])
+        for c in range(cols):
+            phi = halfPi * (cosA * x[c] + rowCarrier) + phaseObject[r, c]
+            out[k, r, c] = a[k, r, c] + amplitude * math.cos(freq * phi) + n[r, c]
+
+    return out
+
+@jit(nopython=True, parallel=True, cache=True)
+def phaseShiftedInterferograms(x, y, phaseObject, angle, frequency, shifts, a, b, n, out):
+    '''
+    Function that generates sequence of phase shifted interferograms of single object with linear carrier.
+    Frame `k` is `a + b * cos(phi + shifts[k]) + n`, it is calculated as `a + b * (cos(phi) * cos(shifts[k]) - sin(phi) * sin(shifts[k])) + n`,
+    so cosine and sine of the phase are evaluated once for all frames. Phase `phi` is the same as in `separableInterferogramBatch`.
+    Boosted with Numba: works in C and with parallel computing.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        values in X axis, that is columns of the images
+    y : numpy.ndarray
+        values in Y axis, that is rows of the images
+    phaseObject : numpy.ndarray
+        object to be coded in the phase of the interferograms
+    angle : float
+        orientation angle of fringe pattern
+    frequency : float
+        spatial frequency of fringe pattern
+    shifts : numpy.ndarray
+        phase shift of every frame
+    a : numpy.ndarray
+        background function shared by all frames
+    b : float
+        amplitude of fringe pattern
+    n : numpy.ndarray
+        noise function shared by all frames
+    out : numpy.ndarray
+        preallocated stack of shape (K, N, N) that frames are written to, arrays of the same dtype keep it in whole computation
+
+    Returns:
+    ----------
+    out : numpy.ndarray
+        stack of phase shifted interferograms
+    '''
+    frames = out.shape[0]
+    rows = out.shape[1]
+    cols = out.shape[2]
+    scalar = out.dtype.type
+    halfPi = scalar(math.pi / 2)
+    amplitude = scalar(b)
+    cosA = scalar(math.cos(angle))
+    sinA = scalar(math.sin(angle))
+    freq = scalar(frequency)
+    cosShifts = np.cos(shifts).astype(out.dtype)
+    sinShifts = np.sin(shifts).astype(out.dtype)
+    for r in prange(rows):
+        rowCarrier = sinA * y[r]
+        for c in range(cols):
+            phi = freq * (halfPi * (cosA * x[c] + rowCarrier) + phaseObject[r, c])
+            cosPhi = amplitude * math.cos(phi)
+            sinPhi = amplitude * math.sin(phi)
+            for k in range(frames):
+                out[k, r, c] = a[r, c] + (cosPhi * cosShifts[k] - sinPhi * sinShifts[k]) + n[r, c]
+
+    return out
+
+@jit(nopython=True, parallel=True, cache=True)
+def chebyshevSweepBatch(theta, orders, slots, a, b, n, out):
+    '''
+    Function that generates interferograms whose phases are integer multiples of the same phase `theta`.
+    Image `slots[i]` of `out` is `a + b * cos(orders[i] * theta) + n`, cosines of multiples follow from Chebyshev recurrence
+    `cos((j + 1) * theta) = 2 * cos(theta) * cos(j * theta) - cos((j - 1) * theta)`, so single cosine is evaluated for all images.
+    Boosted with Numba: works in C and with parallel computing.
+
+    Parameters
+    ----------
+    theta : numpy.ndarray
+        base phase of shape (N, N)
+    orders : numpy.ndarray
+        positive integer multiples of the base phase, sorted ascending
+    slots : numpy.ndarray
+        index of the image in `out` for every order
+    a : numpy.ndarray
+        background function for every image in `out`
+    b : float
+        amplitude of fringe pattern
+    n : numpy.ndarray
+        noise function shared by all images
+    out : numpy.ndarray
+        preallocated stack of shape (batch, N, N), only images listed in `slots` are written
+
+    Returns:
+    ----------
+    out : numpy.ndarray
+        stack of interferograms
+    '''
+    rows = theta.shape[0]
+    cols = theta.shape[1]
+    count = orders.shape[0]
+    scalar = out.dtype.type
+    amplitude = scalar(b)
+    two = scalar(2)
+    for r in prange(rows):
+        for c in range(cols):
+            cosTheta = scalar(math.cos(theta[r, c]))
+            previous = scalar(1)
+            current = cosTheta
+            j = 1
+            for i in range(count):
+                while j < orders[i]:
+                    previous, current = current, two * cosTheta * current - previous
+                    j = j + 1
+                out[slots[i], r, c] = a[slots[i], r, c] + amplitude * current + n[r, c]
+
+    return out
+
+@jit(nopython=True, parallel=True, cache=True)
+def sphericalInterferogramBatch(obj, frequencies, a, b, n, out):
+    '''
+    Function that generates stack of interferograms of spherical fringes in single pass.
+    Boosted with Numba: works in C and with parallel computing.
+
+    Parameters
+    ----------
+    obj : numpy.ndarray
+        spherical object coded in the phase of the interferograms
+    frequencies : numpy.ndarray
+        spatial frequency of fringe pattern for every image in the stack
+    a : numpy.ndarray
+        background function for every image in the stack
+    b : float
+        amplitude of fringe pattern
+    n : numpy.ndarray
+        noise function shared by all images in the stack
+    out : numpy.ndarray
+        preallocated stack of shape (batch, N, N) that results are written to, arrays of the same dtype keep it in whole computation
+
+    Returns:
+    ----------
+    out : numpy.ndarray
+        stack of interferograms
+    '''
+    batch = out.shape[0]
+    rows = out.shape[1]
+    cols = out.shape[2]
+    scalar = out.dtype.type
+    amplitude = scalar(b)
+    for idx in prange(batch * rows):
+        k = idx // rows
+        r = idx % rows
+        freq = scalar(frequencies[k])
+        for c in range(cols):
+            out[k, r, c] = a[k, r, c] + amplitude * math.cos(freq * obj[r, c]) + n[r, c]
+
+    return out
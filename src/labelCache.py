@@ -0,0 +1,229 @@
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import time
+import numpy as np
+
+CACHE_FILE = "labels.sqlite"
+
+# Every entry costs this many bytes on top of its stored output, so cache of labels alone is bounded too
+ENTRY_OVERHEAD = 128
+
+def labelKey(f, f_ref, variant, mi, tau, tol, dtype = np.float64):
+    '''
+    Function that returns key of Chambolle labelling result, that is hash of input images and parameters of the solver.
+    Images with the same values, shape and type give the same key, regardless of their file names.
+
+    Parameters
+    ----------
+    f : numpy.ndarray
+        image which is input for Chambolle
+    f_ref : numpy.ndarray
+        reference image, None if solver does not use it
+    variant : str
+        name of the solver
+    mi : float
+        regularization parameter
+    tau : float
+        Chambolle projection step value
+    tol : float
+        error tolerance
+    dtype : numpy.dtype
+        floating point type of iterations (Default is float64)
+
+    Returns:
+    ----------
+    key : str
+        hexadecimal digest
+    '''
+    digest = hashlib.blake2b(digest_size = 20)
+    params = {'variant': variant, 'mi': float(mi), 'tau': float(tau), 'tol': float(tol), 'dtype': np.dtype(dtype).str}
+    digest.update(json.dumps(params, sort_keys = True).encode())
+    for image in (f, f_ref):
+        if image is None:
+            digest.update(b'none')
+            continue
+        image = np.ascontiguousarray(image)
+        digest.update("{}{}".format(image.dtype.str, image.shape).encode())
+        digest.update(image.data)
+    return digest.hexdigest()
+
+class LabelCache:
+    """
+    A class used to store results of Chambolle labelling on disk, so unchanged images are not labelled again
+
+    ...
+
+    Results are kept in SQLite database in `folder` under keys returned by `labelKey`. The least recently used entries
+    are removed when size of the cache exceeds `maxBytes`. Database can be shared by worker processes,
+    cache sent to worker process opens its own connection.
+
+    Attributes
+    ----------
+    folder : str
+        folder of the cache, it is created if it does not exist
+    maxBytes : int
+        maximal size of stored entries in bytes
+    storeOutputs : bool
+        True if filtered images are stored together with numbers of iterations
+
+    Methods
+    -------
+    get(key)
+        Returns stored result or None
+    put(key, iterations, error, output = None)
+        Stores result
+    evict()
+        Removes the least recently used entries until cache fits its size
+    size()
+        Returns number of entries and their size in bytes
+    clear()
+        Removes all entries
+    """
+
+    def __init__(self, folder, maxBytes = 2**30, storeOutputs = False):
+        """
+        Parameters
+        ----------
+        folder : str
+            Folder of the cache, it is created if it does not exist
+        maxBytes : int
+            Maximal size of stored entries in bytes (Default is 1 GiB)
+        storeOutputs : bool
+            Set to True to store filtered images as well (Default is False)
+        """
+        self.folder = folder
+        self.maxBytes = maxBytes
+        self.storeOutputs = storeOutputs
+        self._connection = None
+
+    def __getstate__(self):
+        '''
+        Connection is not copied, copy in worker process opens its own
+        '''
+        return {'folder': self.folder, 'maxBytes': self.maxBytes, 'storeOutputs': self.storeOutputs}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._connection = None
+
+    def _connect(self):
+        '''
+        Returns connection to the database, creates database on the first use
+        '''
+        if self._connection is None:
+            os.makedirs(self.folder, exist_ok = True)
+            # Workers wait for each other's writes instead of failing
+            self._connection = sqlite3.connect(os.path.join(self.folder, CACHE_FILE), timeout = 60)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            # Rows replaced by INSERT OR REPLACE fire delete trigger only with recursive triggers
+            self._connection.execute("PRAGMA recursive_triggers=ON")
+            with self._connection:
+                self._connection.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, iterations INTEGER, error REAL, output BLOB, size INTEGER, used REAL)")
+                self._connection.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+                # Total size is kept by triggers, so it is right for all processes and never needs scan of the table
+                self._connection.execute("CREATE TABLE IF NOT EXISTS total (id INTEGER PRIMARY KEY CHECK (id = 0), size INTEGER)")
+                self._connection.execute("INSERT OR IGNORE INTO total SELECT 0, COALESCE(SUM(size), 0) FROM entries")
+                self._connection.execute("CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN UPDATE total SET size = size + NEW.size; END")
+                self._connection.execute("CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN UPDATE total SET size = size - OLD.size; END")
+        return self._connection
+
+    def get(self, key):
+        '''
+        Returns stored result and marks it as recently used
+
+        Parameters
+        ----------
+        key : str
+            key returned by `labelKey`
+
+        Returns
+        -------
+        result : tuple
+            number of iterations, error and filtered image or None if it was not stored, None if key is missing
+        '''
+        connection = self._connect()
+        row = connection.execute("SELECT iterations, error, output FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with connection:
+            connection.execute("UPDATE entries SET used = ? WHERE key = ?", (time.time(), key))
+        output = None if row[2] is None else np.load(io.BytesIO(row[2]))
+        return row[0], row[1], output
+
+    def put(self, key, iterations, error, output = None):
+        '''
+        Stores result, replaces previous result of the same key and evicts old entries if cache is too large
+
+        Parameters
+        ----------
+        key : str
+            key returned by `labelKey`
+        iterations : int
+            number of iterations
+        error : float
+            error of the result
+        output : numpy.ndarray
+            filtered image, stored only if `storeOutputs` is True (Optional)
+        '''
+        blob = None
+        if self.storeOutputs and output is not None:
+            buffer = io.BytesIO()
+            np.save(buffer, output)
+            blob = buffer.getvalue()
+        size = ENTRY_OVERHEAD + (0 if blob is None else len(blob))
+
+        connection = self._connect()
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", (key, int(iterations), float(error), blob, size, time.time()))
+        self.evict()
+
+    def evict(self):
+        '''
+        Removes the least recently used entries until size of the cache is not larger than `maxBytes`
+        '''
+        connection = self._connect()
+        excess = connection.execute("SELECT size FROM total").fetchone()[0] - self.maxBytes
+        if excess <= 0:
+            return
+        # Cursor reads entries one by one, only the evicted ones are read
+        keys = []
+        for key, size in connection.execute("SELECT key, size FROM entries ORDER BY used"):
+            if excess <= 0:
+                break
+            keys.append((key,))
+            excess -= size
+        with connection:
+            connection.executemany("DELETE FROM entries WHERE key = ?", keys)
+
+    def size(self):
+        '''
+        Returns number of entries and their size
+
+        Returns
+        -------
+        count : int
+            number of entries
+        nbytes : int
+            size of entries in bytes
+        '''
+        connection = self._connect()
+        return connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0], connection.execute("SELECT size FROM total").fetchone()[0]
+
+    def clear(self):
+        '''
+        Removes all entries
+        '''
+        connection = self._connect()
+        with connection:
+            connection.execute("DELETE FROM entries")
+
+    def close(self):
+        '''
+        Closes connection to the database, it is opened again on the next use
+        '''
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
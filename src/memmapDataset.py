@@ -0,0 +1,142 @@
+import os
+import numpy as np
+
+INTERFEROGRAMS_FILE = "interferograms.npy"
+FRINGES_FILE = "fringes.npy"
+INDICES_FILE = "indices.npy"
+
+def isMemmapDataset(folder):
+    '''
+    Function that checks if folder contains dataset written by `packMemmapDataset`.
+
+    Parameters
+    ----------
+    folder : str
+        path to folder
+
+    Returns:
+    ----------
+    result : bool
+        True if folder contains all files of the dataset
+    '''
+    return all(os.path.isfile(os.path.join(folder, name)) for name in (INTERFEROGRAMS_FILE, FRINGES_FILE, INDICES_FILE))
+
+def packMemmapDataset(load, indices, folder, dtype = np.float32):
+    '''
+    Function that writes pairs of interferogram and reference fringes into contiguous arrays on disk.
+    Images are stored already rescaled to range [0, 1], so they can be used without decoding and normalization.
+
+    Parameters
+    ----------
+    load : function
+        function that takes number of the image and returns tuple (name, f, f_ref) of rescaled images, see `imagePairLoader`
+    indices : list
+        numbers of images to be packed
+    folder : str
+        path to folder of the dataset, it is created if it does not exist
+    dtype : numpy.dtype
+        type of stored values (Default is float32)
+    '''
+    os.makedirs(folder, exist_ok = True)
+    indices = np.asarray(indices, dtype=np.int64)
+
+    _, f, _ = load(int(indices[0]))
+    shape = (len(indices),) + f.shape
+    interferograms = np.lib.format.open_memmap(os.path.join(folder, INTERFEROGRAMS_FILE + ".tmp"), mode='w+', dtype=dtype, shape=shape)
+    fringes = np.lib.format.open_memmap(os.path.join(folder, FRINGES_FILE + ".tmp"), mode='w+', dtype=dtype, shape=shape)
+
+    for position, index in enumerate(indices):
+        _, interferograms[position], fringes[position] = load(int(index))
+
+    interferograms.flush()
+    fringes.flush()
+    del interferograms, fringes
+    np.save(os.path.join(folder, INDICES_FILE), indices)
+    os.replace(os.path.join(folder, INTERFEROGRAMS_FILE + ".tmp"), os.path.join(folder, INTERFEROGRAMS_FILE))
+    os.replace(os.path.join(folder, FRINGES_FILE + ".tmp"), os.path.join(folder, FRINGES_FILE))
+
+class MemmapDataset:
+    """
+    A class used to read pairs of interferogram and reference fringes from memory-mapped arrays
+
+    ...
+
+    Returned images are read-only views of the mapped files, so no data is copied or decoded until it is used.
+
+    Attributes
+    ----------
+    interferograms : numpy.memmap
+        stack of interferograms rescaled to range [0, 1]
+    fringes : numpy.memmap
+        stack of reference fringes rescaled to range [0, 1]
+    indices : numpy.ndarray
+        numbers of stored images
+    _position : dict
+        maps number of image to its position in stacks
+
+    Methods
+    -------
+    slice(start, stop)
+        Returns views of images with numbers from range `[start, stop)`
+    """
+
+    def __init__(self, folder):
+        """
+        Parameters
+        ----------
+        folder : str
+            Path to folder of the dataset
+        """
+        self.interferograms = np.load(os.path.join(folder, INTERFEROGRAMS_FILE), mmap_mode='r')
+        self.fringes = np.load(os.path.join(folder, FRINGES_FILE), mmap_mode='r')
+        self.indices = np.load(os.path.join(folder, INDICES_FILE))
+        self._position = {int(index): position for position, index in enumerate(self.indices)}
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __contains__(self, index):
+        return index in self._position
+
+    def __getitem__(self, index):
+        '''
+        Returns views of single pair of images
+
+        Parameters
+        ----------
+        index : int
+            number of the image
+
+        Returns
+        -------
+        f : numpy.ndarray
+            interferogram
+        f_ref : numpy.ndarray
+            reference fringes
+        '''
+        position = self._position[index]
+        return self.interferograms[position], self.fringes[position]
+
+    def slice(self, start, stop):
+        '''
+        Returns views of images with numbers from range `[start, stop)`, numbers must be stored consecutively
+
+        Parameters
+        ----------
+        start : int
+            number of the first image
+        stop : int
+            number after the last image
+
+        Returns
+        -------
+        f : numpy.ndarray
+            stack of interferograms
+        f_ref : numpy.ndarray
+            stack of reference fringes
+        '''
+        first = self._position[start]
+        last = self._position[stop - 1] + 1
+        if last - first != stop - start:
+            raise ValueError("Images from {} to {} are not stored consecutively".format(start, stop))
+        return self.interferograms[first:last], self.fringes[first:last]
@@ -0,0 +1,404 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+from src.progressBar import progressBar
+
+PROGRESS_INTERVAL = 0.5
+
+_lastProgress = {}
+
+def throttledProgress(done, total, prefix = '', interval = PROGRESS_INTERVAL):
+    '''
+    Function that redraws progress bar at most once per `interval` seconds, the first and the last state are always drawn.
+
+    Parameters
+    ----------
+    done : int
+        number of finished items
+    total : int
+        number of all items
+    prefix : str
+        prefix of the progress bar, bars with different prefixes are throttled separately
+    interval : float
+        minimal time between redraws in seconds (Default is 0.5)
+    '''
+    now = time.monotonic()
+    if done >= total or now - _lastProgress.get(prefix, -float('inf')) >= interval:
+        _lastProgress[prefix] = now
+        progressBar(done, total, prefix)
+
+def reportProgress(metrics, done, total, prefix = ''):
+    '''
+    Function that reports progress through `metrics` if they are given, otherwise draws throttled progress bar.
+
+    Parameters
+    ----------
+    metrics : Metrics
+        metrics of the run or None
+    done : int
+        number of finished items
+    total : int
+        number of all items
+    prefix : str
+        prefix of the progress bar
+    '''
+    if metrics is not None:
+        metrics.progress(done, total, prefix)
+    else:
+        throttledProgress(done, total, prefix)
+
+class _Stopwatch:
+    """
+    Measures consecutive sections of code, every call adds time since the previous call to given stage
+    """
+
+    def __init__(self, metrics):
+        self._metrics = metrics
+        self._last = time.perf_counter()
+
+    def __call__(self, stage):
+        now = time.perf_counter()
+        self._metrics.addTime(stage, now - self._last)
+        self._last = now
+
+class _NullStopwatch:
+    """
+    Stopwatch used when metrics are not collected
+    """
+
+    def __call__(self, stage):
+        pass
+
+NULL_STOPWATCH = _NullStopwatch()
+NULL_TIMER = contextlib.nullcontext()
+
+def stopwatch(metrics):
+    '''
+    Function that returns stopwatch of `metrics`, or stopwatch that does nothing if metrics are None.
+    Stopwatch is called with name of the stage after every section of code, see `Metrics.stopwatch`.
+
+    Parameters
+    ----------
+    metrics : Metrics
+        metrics of the run or None
+
+    Returns:
+    ----------
+    lap : function
+        function that takes name of the stage
+    '''
+    return NULL_STOPWATCH if metrics is None else metrics.stopwatch()
+
+def timer(metrics, stage):
+    '''
+    Function that returns context measuring time of `stage`, or context that does nothing if metrics are None.
+
+    Parameters
+    ----------
+    metrics : Metrics
+        metrics of the run or None
+    stage : str
+        name of the stage
+
+    Returns:
+    ----------
+    context : contextlib.AbstractContextManager
+        context that adds time of its body to the stage
+    '''
+    return NULL_TIMER if metrics is None else metrics.timer(stage)
+
+class Metrics:
+    """
+    A class used to collect time spent in stages of generation and labelling together with counters of events
+
+    ...
+
+    Stages used by the package are `rng` (random draws), `object` (object synthesis), `background` (background synthesis),
+    `interferogram` (fringes synthesis), `normalization`, `encoding`, `write` (disk writes), `writerWait`
+    (waiting for background writer), `chambolle` and `cache` (lookups of cached labels). Counters are `images`, `chambolleIterations`, `cacheHits` and `pyramidIterations` (iterations of all levels of pyramid solves).
+    Time of stages measured in threads of background writer is summed over threads, so it can be longer than wall time.
+
+    Metrics are exported as JSON lines or Prometheus text file, at most once per `exportInterval` seconds
+    when progress is reported and always when the run is finished. Metrics can be sent to worker processes,
+    workers collect their own values without exporting them and parent process merges them, see `drain` and `merge`.
+
+    Attributes
+    ----------
+    progressInterval : float
+        minimal time between redraws of progress bar in seconds, None to hide progress bar
+    exportInterval : float
+        minimal time between exports in seconds
+    jsonLinesFile : str
+        path to file that every export appends JSON line to (Optional)
+    prometheusFile : str
+        path to Prometheus text file that every export replaces (Optional)
+
+    Methods
+    -------
+    timer(stage)
+        Returns context that adds time of its body to `stage`
+    stopwatch()
+        Returns function that adds time since its previous call to given stage
+    addTime(stage, seconds, calls = 1)
+        Adds time to stage
+    count(counter, value = 1)
+        Increases counter
+    progress(done, total, prefix = '')
+        Reports progress of the run
+    snapshot()
+        Returns collected values
+    drain()
+        Returns collected values and resets them
+    merge(snapshot)
+        Adds values collected elsewhere
+    export()
+        Writes collected values to files
+    summary()
+        Returns table of stages sorted by time
+    """
+
+    def __init__(self, progressInterval = PROGRESS_INTERVAL, exportInterval = 10.0, jsonLinesFile = None, prometheusFile = None):
+        """
+        Parameters
+        ----------
+        progressInterval : float
+            Minimal time between redraws of progress bar in seconds, None to hide progress bar
+        exportInterval : float
+            Minimal time between exports in seconds
+        jsonLinesFile : str
+            Path to file that every export appends JSON line to (Optional)
+        prometheusFile : str
+            Path to Prometheus text file that every export replaces (Optional)
+        """
+        self.progressInterval = progressInterval
+        self.exportInterval = exportInterval
+        self.jsonLinesFile = jsonLinesFile
+        self.prometheusFile = prometheusFile
+        self._start()
+
+    def _start(self):
+        '''
+        Creates empty values and lock
+        '''
+        self._lock = threading.Lock()
+        self._seconds = {}
+        self._calls = {}
+        self._counters = {}
+        self._done = 0
+        self._total = 0
+        self._startTime = time.time()
+        self._lastProgress = -float('inf')
+        self._lastExport = time.monotonic()
+
+    def __getstate__(self):
+        '''
+        Only settings are copied, copy in worker process does not draw progress nor export files
+        '''
+        return {'progressInterval': None, 'exportInterval': self.exportInterval, 'jsonLinesFile': None, 'prometheusFile': None}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._start()
+
+    def timer(self, stage):
+        '''
+        Returns context that adds time of its body to `stage`
+        '''
+        return _Timer(self, stage)
+
+    def stopwatch(self):
+        '''
+        Returns function that adds time since its previous call, or since creation of the stopwatch, to given stage
+        '''
+        return _Stopwatch(self)
+
+    def addTime(self, stage, seconds, calls = 1):
+        '''
+        Adds time to stage
+
+        Parameters
+        ----------
+        stage : str
+            name of the stage
+        seconds : float
+            measured time
+        calls : int
+            number of measured calls (Default is 1)
+        '''
+        with self._lock:
+            self._seconds[stage] = self._seconds.get(stage, 0.0) + seconds
+            self._calls[stage] = self._calls.get(stage, 0) + calls
+
+    def count(self, counter, value = 1):
+        '''
+        Increases counter
+
+        Parameters
+        ----------
+        counter : str
+            name of the counter
+        value : int
+            increase of the counter (Default is 1)
+        '''
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + value
+
+    def progress(self, done, total, prefix = ''):
+        '''
+        Reports progress of the run, redraws progress bar and exports values if their intervals passed.
+        Values are always exported when `done` reaches `total`.
+
+        Parameters
+        ----------
+        done : int
+            number of finished items
+        total : int
+            number of all items
+        prefix : str
+            prefix of the progress bar
+        '''
+        self._done = done
+        self._total = total
+        now = time.monotonic()
+        finished = done >= total
+
+        if self.progressInterval is not None and (finished or now - self._lastProgress >= self.progressInterval):
+            self._lastProgress = now
+            progressBar(done, total, prefix)
+        if finished or now - self._lastExport >= self.exportInterval:
+            self._lastExport = now
+            self.export()
+
+    def snapshot(self):
+        '''
+        Returns collected values
+
+        Returns
+        -------
+        snapshot : dict
+            `stages` maps name of stage to dict with `seconds` and `calls`, `counters` maps name of counter to its value,
+            `done` and `total` are the last reported progress and `elapsed` is time since creation in seconds
+        '''
+        with self._lock:
+            return {
+                'elapsed': time.time() - self._startTime,
+                'done': self._done,
+                'total': self._total,
+                'stages': {stage: {'seconds': self._seconds[stage], 'calls': self._calls[stage]} for stage in self._seconds},
+                'counters': dict(self._counters),
+            }
+
+    def drain(self):
+        '''
+        Returns collected stages and counters and resets them, used to send values of worker process to the parent
+
+        Returns
+        -------
+        snapshot : dict
+            see `snapshot`
+        '''
+        snapshot = self.snapshot()
+        with self._lock:
+            self._seconds = {}
+            self._calls = {}
+            self._counters = {}
+        return snapshot
+
+    def merge(self, snapshot):
+        '''
+        Adds stages and counters collected elsewhere, e.g. in worker process
+
+        Parameters
+        ----------
+        snapshot : dict
+            values returned by `snapshot` or `drain`, None is ignored
+        '''
+        if snapshot is None:
+            return
+        for stage, values in snapshot['stages'].items():
+            self.addTime(stage, values['seconds'], values['calls'])
+        for counter, value in snapshot['counters'].items():
+            self.count(counter, value)
+
+    def export(self):
+        '''
+        Writes collected values as JSON line and Prometheus text file, if their paths are set
+        '''
+        snapshot = self.snapshot()
+        if self.jsonLinesFile is not None:
+            with open(self.jsonLinesFile, 'a') as file:
+                file.write(json.dumps(dict(snapshot, time = time.time())) + '\n')
+        if self.prometheusFile is not None:
+            # File is replaced atomically, so collector never reads half written file
+            temporary = self.prometheusFile + '.tmp'
+            with open(temporary, 'w') as file:
+                file.write(_prometheusText(snapshot))
+            os.replace(temporary, self.prometheusFile)
+
+    def summary(self):
+        '''
+        Returns table of stages sorted by time and values of counters
+
+        Returns
+        -------
+        text : str
+            lines `stage: seconds (share of all stages), calls` followed by lines `counter: value`
+        '''
+        snapshot = self.snapshot()
+        stages = snapshot['stages']
+        total = sum(values['seconds'] for values in stages.values()) or 1.0
+        lines = ["{}: {:.3f} sec ({:.1%}), {} calls".format(stage, values['seconds'], values['seconds'] / total, values['calls'])
+            for stage, values in sorted(stages.items(), key = lambda item: item[1]['seconds'], reverse = True)]
+        lines += ["{}: {}".format(counter, value) for counter, value in sorted(snapshot['counters'].items())]
+        return '\n'.join(lines)
+
+class _Timer:
+    """
+    Context that adds time of its body to stage of metrics
+    """
+
+    def __init__(self, metrics, stage):
+        self._metrics = metrics
+        self._stage = stage
+
+    def __enter__(self):
+        self._begin = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self._metrics.addTime(self._stage, time.perf_counter() - self._begin)
+
+def _prometheusText(snapshot):
+    '''
+    Formats snapshot of metrics in Prometheus text exposition format
+    '''
+    lines = [
+        '# HELP intergen_stage_seconds_total Time spent in stage.',
+        '# TYPE intergen_stage_seconds_total counter',
+    ]
+    lines += ['intergen_stage_seconds_total{{stage="{}"}} {}'.format(stage, values['seconds']) for stage, values in sorted(snapshot['stages'].items())]
+    lines += [
+        '# HELP intergen_stage_calls_total Number of measured calls of stage.',
+        '# TYPE intergen_stage_calls_total counter',
+    ]
+    lines += ['intergen_stage_calls_total{{stage="{}"}} {}'.format(stage, values['calls']) for stage, values in sorted(snapshot['stages'].items())]
+    lines += [
+        '# HELP intergen_events_total Number of counted events.',
+        '# TYPE intergen_events_total counter',
+    ]
+    lines += ['intergen_events_total{{counter="{}"}} {}'.format(counter, value) for counter, value in sorted(snapshot['counters'].items())]
+    lines += [
+        '# HELP intergen_progress_done Number of finished items of the run.',
+        '# TYPE intergen_progress_done gauge',
+        'intergen_progress_done {}'.format(snapshot['done']),
+        '# HELP intergen_progress_total Number of all items of the run.',
+        '# TYPE intergen_progress_total gauge',
+        'intergen_progress_total {}'.format(snapshot['total']),
+        '# HELP intergen_elapsed_seconds Time since start of the run.',
+        '# TYPE intergen_elapsed_seconds gauge',
+        'intergen_elapsed_seconds {}'.format(snapshot['elapsed']),
+    ]
+    return '\n'.join(lines) + '\n'
@@ -1,8 +1,7 @@
-from numba import jit
+from numba import jit, prange
 import numpy as np
-import matplotlib.pyplot as plt
 
-@jit(nopython=True, parallel=True)
+@jit(nopython=True, parallel=True, cache=True)
 def normalizeImage(I, normFactor = 255.0):
     '''
     Function that normalize matrix to a range of values defined by user.
@@ -18,7 +17,32 @@ def normalizeImage(I, normFactor = 255.0):
     Returns:
     ----------
     normI : numpy.ndarray
-        matrix of normalized values
+        matrix of normalized values of dtype of `I`
     '''
-    normI = (I * (normFactor / np.max(np.abs(I))) + normFactor) / 2
-    return normI
\ No newline at end of file
+    scalar = I.dtype.type
+    normI = (I * scalar(normFactor / np.max(np.abs(I))) + scalar(normFactor)) / 2
+    return normI
+
+@jit(nopython=True, parallel=True, cache=True)
+def normalizeImageStack(I, normFactor = 255.0):
+    '''
+    Function that normalize every matrix of the stack in place to a range of values defined by user.
+    Boosted with Numba: works in C and with parallel computing.
+
+    Parameters
+    ----------
+    I : numpy.ndarray
+        stack of matrices of shape (batch, N, N) to be normalized
+    normFactor : float
+        max value
+        
+    Returns:
+    ----------
+    I : numpy.ndarray
+        stack of normalized matrices
+    '''
+    scalar = I.dtype.type
+    for k in prange(I.shape[0]):
+        scale = scalar(normFactor / np.max(np.abs(I[k])))
+        I[k] = (I[k] * scale + scalar(normFactor)) / 2
+    return I
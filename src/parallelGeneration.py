@@ -0,0 +1,160 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import itertools
+import multiprocessing
+
+from src.metrics import reportProgress
+from src.warmup import warmupGeneration
+
+_workerGenerator = None
+
+def _initWorker(generator):
+    '''
+    Stores copy of the generator in the worker process and loads compiled kernels
+    '''
+    global _workerGenerator
+    _workerGenerator = generator
+    warmupGeneration()
+
+def _generateChunk(methodName, start, stop, args):
+    '''
+    Runs single shard of the generation in the worker process
+
+    Returns
+    -------
+    count : int
+        number of images generated by the shard
+    snapshot : dict
+        metrics collected by the shard, None if generator does not collect them
+    '''
+    count = getattr(_workerGenerator, methodName)(start, stop, *args)
+    metrics = _workerGenerator._metrics
+    return count, None if metrics is None else metrics.drain()
+
+def runSharded(generator, methodName, numOfUnits, args, workers, imagesPerUnit = 1, chunkSize = None, prefix = "Interferogram generation progress: "):
+    '''
+    Shards range of generated units across pool of processes and reports progress on single bar.
+
+    Every shard calls `generator.methodName(start, stop, *args)` in the worker process, so shards write disjoint file indices.
+    Random streams are derived by the method from root seed in `args` and unit index, so they do not depend on sharding.
+    Metrics collected by workers are merged into metrics of `generator`.
+
+    Parameters
+    ----------
+    generator : InterferogramGenerator
+        generator that is copied to every worker process
+    methodName : str
+        name of the method generating units from range `[start, stop)`, it must return number of generated images
+    numOfUnits : int
+        number of units (samples or objects) to generate
+    args : tuple
+        additional arguments of the method
+    workers : int
+        number of worker processes
+    imagesPerUnit : int
+        number of images generated for single unit, used for progress reporting (Default is 1)
+    chunkSize : int
+        number of units in single shard (Default is chosen to give 16 shards per worker)
+    prefix : str
+        prefix of the progress bar
+    '''
+    if chunkSize is None:
+        chunkSize = max(1, numOfUnits // (16 * workers))
+
+    total = numOfUnits * imagesPerUnit
+    done = 0
+
+    # Kernels are compiled once here, workers load them from the disk cache
+    warmupGeneration()
+
+    # Numba threading layer does not survive fork, so workers are always spawned
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers = workers, mp_context = context, initializer = _initWorker, initargs = (generator,)) as executor:
+        futures = []
+        for start in range(0, numOfUnits, chunkSize):
+            stop = min(start + chunkSize, numOfUnits)
+            futures.append(executor.submit(_generateChunk, methodName, start, stop, args))
+
+        for future in as_completed(futures):
+            count, snapshot = future.result()
+            done += count
+            if generator._metrics is not None:
+                generator._metrics.merge(snapshot)
+            reportProgress(generator._metrics, done, total, prefix)
+
+def _renderChunk(methodName, start, stop, args):
+    '''
+    Renders single chunk of streamed samples in the worker process
+
+    Returns
+    -------
+    samples : list
+        samples returned by the method
+    snapshot : dict
+        metrics collected by the chunk, None if generator does not collect them
+    '''
+    samples = getattr(_workerGenerator, methodName)(start, stop, *args)
+    metrics = _workerGenerator._metrics
+    return samples, None if metrics is None else metrics.drain()
+
+def streamSharded(generator, methodName, start, stop, args, workers, prefetch = None, chunkSize = 8):
+    '''
+    Renders range of units on pool of processes and yields their samples in order of units.
+
+    Every chunk calls `generator.methodName(chunkStart, chunkStop, *args)` in the worker process, the method returns list of samples.
+    At most `prefetch` chunks are rendered ahead of the consumer, so memory stays bounded for endless streams.
+    Metrics collected by workers are merged into metrics of `generator`.
+
+    Parameters
+    ----------
+    generator : InterferogramGenerator
+        generator that is copied to every worker process
+    methodName : str
+        name of the method rendering units from range `[chunkStart, chunkStop)`
+    start : int
+        number of the first unit
+    stop : int
+        number after the last unit, None for endless stream
+    args : tuple
+        additional arguments of the method
+    workers : int
+        number of worker processes
+    prefetch : int
+        number of chunks rendered ahead of the consumer (Default is twice the number of workers)
+    chunkSize : int
+        number of units in single chunk (Default is 8)
+
+    Yields
+    ------
+    sample : tuple
+        samples of consecutive units
+    '''
+    if prefetch is None:
+        prefetch = 2 * workers
+    starts = itertools.count(start, chunkSize) if stop is None else iter(range(start, stop, chunkSize))
+
+    # Kernels are compiled once here, workers load them from the disk cache
+    warmupGeneration()
+
+    # Numba threading layer does not survive fork, so workers are always spawned
+    context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(max_workers = workers, mp_context = context, initializer = _initWorker, initargs = (generator,))
+    pending = deque()
+
+    def submitNext(count):
+        for chunkStart in itertools.islice(starts, count):
+            chunkStop = chunkStart + chunkSize if stop is None else min(chunkStart + chunkSize, stop)
+            pending.append(executor.submit(_renderChunk, methodName, chunkStart, chunkStop, args))
+
+    try:
+        submitNext(max(1, prefetch))
+        while len(pending) > 0:
+            samples, snapshot = pending.popleft().result()
+            # Next chunk is queued before samples are consumed, so workers keep rendering
+            submitNext(1)
+            if generator._metrics is not None:
+                generator._metrics.merge(snapshot)
+            yield from samples
+    finally:
+        # Consumer can stop early, chunks that did not start are dropped
+        executor.shutdown(wait = True, cancel_futures = True)
@@ -0,0 +1,390 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import glob
+import multiprocessing
+import os
+import tempfile
+import numpy as np
+
+from src.chambolleProjection import chambolleProjection, chambolleProjectionStopCriterion
+from src.chambolleProjectionBatch import chambolleProjectionBatch, chambolleProjectionStopCriterionBatch
+from src.chambolleProjectionTiled import chambolleProjectionTiled, chambolleProjectionStopCriterionTiled
+from src.imagePairLoader import imagePairLoader
+from src.labelCache import labelKey
+from src.metrics import reportProgress, timer
+from src.warmup import warmupChambolle
+
+PART_PATTERN = "part_*.csv"
+
+# Parameters of Chambolle projection used for labels, they are part of keys of cached results
+SOLVER_PARAMETERS = {'mi': 100, 'tau': 0.25, 'tol': 1e-5}
+VARIANTS = {0: "reference", 1: "stopCriterion"}
+
+_workerLoad = None
+
+def _initLabeller(images_folder):
+    '''
+    Creates loader of the dataset in the worker process and loads compiled kernels
+    '''
+    global _workerLoad
+    _workerLoad = imagePairLoader(images_folder)
+    warmupChambolle()
+
+def labelIndex(name):
+    '''
+    Function that returns number of the image from its name in labels file, e.g. `12.bmp` or `12`.
+
+    Parameters
+    ----------
+    name : str
+        name of the image
+
+    Returns:
+    ----------
+    index : int
+        number of the image
+    '''
+    return int(os.path.splitext(os.path.basename(name))[0])
+
+def readLabels(filename):
+    '''
+    Function that reads labels file written by Chambolle labelling.
+
+    Parameters
+    ----------
+    filename : str
+        path to csv file with lines `name,iterations`
+
+    Returns:
+    ----------
+    labels : dict
+        maps number of the image to its line of the file, empty if file does not exist
+    '''
+    labels = {}
+    if not os.path.isfile(filename):
+        return labels
+    with open(filename, "r") as file:
+        for line in file:
+            if line.strip() == "":
+                continue
+            labels[labelIndex(line.split(",")[0])] = line if line.endswith("\n") else line + "\n"
+    return labels
+
+def groupImages(indices, groupSize = None):
+    '''
+    Function that splits numbers of images into runs of consecutive images of the same object.
+    Images `k * groupSize + 1, ..., (k + 1) * groupSize` show the same object, as written by `generateALODI2`.
+
+    Parameters
+    ----------
+    indices : list
+        sorted numbers of images
+    groupSize : int
+        number of images of single object, None to put every image in its own group
+
+    Returns:
+    ----------
+    groups : list
+        lists of numbers of images
+    '''
+    groups = []
+    for i in indices:
+        if groupSize is not None and len(groups) > 0 and groups[-1][-1] == i - 1 and (i - 1) // groupSize == (i - 2) // groupSize:
+            groups[-1].append(i)
+        else:
+            groups.append([i])
+    return groups
+
+def _solveTiled(version, f, f_ref, xi0, returnDual, dtype, tileMemory, outputs, scratch):
+    '''
+    Runs tiled Chambolle projection on every image of the stack, returns the same values as `_solve`.
+    Filtered images are returned only if `outputs` is True. Final dual fields are returned as list of arrays memory-mapped
+    in subfolders of `scratch`, so they are never loaded to memory.
+    '''
+    results = []
+    for k in range(len(f)):
+        xi0_k = None if xi0 is None else xi0[k]
+        folder = os.path.join(scratch, str(k)) if returnDual else None
+        if version == 0:
+            results.append(chambolleProjectionTiled(f[k], f_ref[k], xi0 = xi0_k, returnDual = returnDual, memoryBudget = tileMemory, folder = folder, returnOutput = outputs, dtype = dtype, **SOLVER_PARAMETERS))
+        elif version == 1:
+            # Criterion is evaluated every iteration as in memory, so labels do not depend on `tileMemory`
+            results.append(chambolleProjectionStopCriterionTiled(f[k], checkEvery = 1, xi0 = xi0_k, returnDual = returnDual, memoryBudget = tileMemory, folder = folder, returnOutput = outputs, dtype = dtype, **SOLVER_PARAMETERS))
+    xi = [result[3] for result in results] if returnDual else None
+    return [result[1] for result in results], [result[2] for result in results], [result[0] for result in results], xi
+
+def _firstDuals(xi, count):
+    '''
+    Returns final dual fields of the first `count` images, dual fields of tiled solves are list
+    '''
+    if xi is None:
+        return None
+    return xi[:count] if isinstance(xi, list) else xi[:, :count]
+
+def _solve(version, f, f_ref, batched, xi0, returnDual, dtype, tileMemory = None, outputs = True, scratch = None):
+    '''
+    Runs Chambolle projection on stack of images, returns numbers of iterations, errors, filtered images and final dual fields or None.
+    Tiled solves return filtered images only if `outputs` is True and keep dual fields in `scratch`, see `_solveTiled`.
+    '''
+    if tileMemory is not None:
+        return _solveTiled(version, f, f_ref, xi0, returnDual, dtype, tileMemory, outputs, scratch)
+    xi = None
+    if batched:
+        if version == 0:
+            result = chambolleProjectionBatch(np.array(f, dtype=dtype), np.array(f_ref, dtype=dtype), xi0 = xi0, returnDual = returnDual, dtype = dtype, **SOLVER_PARAMETERS)
+        elif version == 1:
+            result = chambolleProjectionStopCriterionBatch(np.array(f, dtype=dtype), xi0 = xi0, returnDual = returnDual, dtype = dtype, **SOLVER_PARAMETERS)
+        x, its, errors = result[0], result[1], result[2]
+        if returnDual:
+            xi = result[3]
+    else:
+        xi0 = None if xi0 is None else xi0[:, 0]
+        if version == 0:
+            result = chambolleProjection(f[0], f_ref[0], xi0 = xi0, returnDual = returnDual, dtype = dtype, **SOLVER_PARAMETERS)
+        elif version == 1:
+            result = chambolleProjectionStopCriterion(f[0], xi0 = xi0, returnDual = returnDual, dtype = dtype, **SOLVER_PARAMETERS)
+        x, its, errors = [result[0]], [result[1]], [result[2]]
+        if returnDual:
+            xi = result[3][:, np.newaxis]
+    return its, errors, x, xi
+
+def _cacheKey(version, f, f_ref, dtype, tiled = False):
+    '''
+    Returns key of cached label of the image, reference image is not part of the key if the solver does not use it.
+    Tiled stop criterion estimates norms, so its labels are cached separately.
+    '''
+    variant = VARIANTS[version] + ("Tiled" if tiled and version == 1 else "")
+    return labelKey(f, f_ref if version == 0 else None, variant, dtype = dtype, **SOLVER_PARAMETERS)
+
+def labelImages(load, indices, version = 1, batch_size = 1, groupSize = None, metrics = None, dtype = np.float64, cache = None, tileMemory = None):
+    '''
+    Function that finds number of iterations of Chambolle projection algorithm for images. Works on CPU.
+    If `groupSize` is given, images of the same object are solved one after another and every solve starts
+    from the final dual field of the previous image of the object. Then batch holds images of different objects.
+    Numbers of iterations of warm started images count from the warm start, so they differ from labels of solves from zero.
+    If `cache` is given, images whose content and parameters were already labelled are not solved again.
+    If `tileMemory` is given, every image is solved in tiles by threads, see `chambolleProjectionTiled`.
+
+    Parameters
+    ----------
+    load : function
+        function that takes number of the image and returns tuple (name, f, f_ref), see `imagePairLoader`
+    indices : list
+        sorted numbers of images to be labelled
+    version : int
+        version of Chambolle algorithm to use, 0 for Reference image, 1 for Stop Criterion
+    batch_size : int
+        number of images labelled at once (Default is 1)
+    groupSize : int
+        number of images of single object to chain warm starts over, see `groupImages` (Default is None, no warm starts)
+    metrics : Metrics
+        metrics that receive time of loading and Chambolle projection and number of iterations (Optional)
+    dtype : numpy.dtype
+        floating point type of Chambolle iterations, float32 is faster but labels can differ by few iterations (Default is float64)
+    cache : LabelCache
+        cache of results of earlier runs, it can not be used with warm starts (Optional)
+    tileMemory : int
+        memory for tiles of single image in bytes, images are solved whole if it is None (Default is None)
+
+    Returns:
+    ----------
+    lines : list
+        lines `name,iterations` of labels file in order of `indices`
+    '''
+    warm = groupSize is not None
+    if warm and cache is not None:
+        raise ValueError("Labels of warm started images depend on previous images, they can not be cached")
+    groups = groupImages(indices, groupSize)
+    # Filtered images of tiled solves are large, they are kept only if cache stores them
+    outputs = cache is not None and cache.storeOutputs
+    # Dual fields of consecutive tiled solves alternate between two folders, so the next solve never overwrites its input
+    scratch = tempfile.TemporaryDirectory() if warm and tileMemory is not None else None
+    try:
+        lines = _labelBatches(load, groups, version, batch_size, warm, metrics, dtype, cache, tileMemory, outputs, scratch)
+    finally:
+        if scratch is not None:
+            scratch.cleanup()
+    return [lines[i] for i in indices]
+
+def _labelBatches(load, groups, version, batch_size, warm, metrics, dtype, cache, tileMemory, outputs, scratch):
+    '''
+    Labels groups of images in batches, returns dict that maps number of the image to its line of labels file
+    '''
+    lines = {}
+    for position in range(0, len(groups), batch_size):
+        # Longer groups first, so groups that still have images are always at the front of the batch
+        batch = sorted(groups[position:position + batch_size], key = len, reverse = True)
+        xi = None
+        for k in range(len(batch[0])):
+            members = [group[k] for group in batch if len(group) > k]
+            with timer(metrics, "load"):
+                filenames, f, f_ref = zip(*[load(i) for i in members])
+
+            its = [None] * len(members)
+            missing = list(range(len(members)))
+            if cache is not None:
+                with timer(metrics, "cache"):
+                    keys = [_cacheKey(version, f[j], f_ref[j], dtype, tileMemory is not None) for j in missing]
+                    for j, key in enumerate(keys):
+                        entry = cache.get(key)
+                        if entry is not None:
+                            its[j] = entry[0]
+                    missing = [j for j in missing if its[j] is None]
+                if metrics is not None:
+                    metrics.count("cacheHits", len(members) - len(missing))
+
+            if len(missing) > 0:
+                with timer(metrics, "chambolle"):
+                    solved, errors, x, xi = _solve(version, [f[j] for j in missing], [f_ref[j] for j in missing], batch_size > 1, _firstDuals(xi, len(members)), warm, dtype,
+                        tileMemory, outputs, None if scratch is None else os.path.join(scratch.name, str(k % 2)))
+                if cache is not None:
+                    with timer(metrics, "cache"):
+                        for j, it, error, output in zip(missing, solved, errors, x):
+                            cache.put(keys[j], it, error, output)
+                for j, it in zip(missing, solved):
+                    its[j] = it
+                if metrics is not None:
+                    metrics.count("chambolleIterations", int(sum(solved)))
+
+            for i, filename, it in zip(members, filenames, its):
+                lines[i] = "{},{}\n".format(filename, it)
+            if metrics is not None:
+                metrics.count("images", len(members))
+
+    return lines
+
+def _writeAtomic(filename, lines):
+    '''
+    Writes lines to temporary file and renames it, so file is either complete or missing
+    '''
+    temporary = filename + ".tmp"
+    with open(temporary, "w") as file:
+        file.writelines(lines)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, filename)
+
+def _labelChunk(indices, version, batch_size, groupSize, partFile, metrics, dtype, cache, tileMemory):
+    '''
+    Labels single chunk in the worker process and saves it as part file
+
+    Returns
+    -------
+    count : int
+        number of labelled images
+    snapshot : dict
+        metrics collected by the chunk, None if they are not collected
+    '''
+    lines = labelImages(_workerLoad, indices, version, batch_size, groupSize, metrics, dtype, cache, tileMemory)
+    with timer(metrics, "write"):
+        _writeAtomic(partFile, lines)
+    return len(indices), None if metrics is None else metrics.drain()
+
+def runLabelling(images_folder, outputFile, version = 1, number_of_images = 1, starting_image = 0, workers = 1, batch_size = 1, chunkSize = None, groupSize = None, metrics = None, dtype = np.float64, cache = None, tileMemory = None):
+    '''
+    Function to find number of iterations for Chambolle projection algorithm for range of images on pool of processes.
+    Results of every chunk of images are saved atomically as part file in folder `outputFile + ".parts"`.
+    When all chunks are done, parts are merged into csv file `outputFile`.
+    Images that already are in `outputFile` or in saved parts are skipped, so interrupted job is resumed by running it again.
+    Images labelled by earlier runs with other output files are taken from `cache`, if it is given.
+
+    Source:
+    Cywińska, Maria, Maciej Trusiak, and Krzysztof Patorski. "Automatized fringe pattern preprocessing using unsupervised variational image decomposition." Optics express 27.16 (2019): 22542-22562.
+
+    Parameters
+    ----------
+    images_folder : str
+        folder with images for Chambole input, BMP dataset, folder of array shards or memory-mapped dataset
+    outputFile : str
+        path to the csv file to put results
+    version : int
+        version of Chambolle algorithm to use, 0 for Reference image, 1 for Stop Criterion
+    number_of_images : int
+        number of consecutive images to be processed
+    starting_image : int
+        id of the image from which algorithm should start
+    workers : int
+        number of worker processes, 1 labels in the current process (Default is 1)
+    batch_size : int
+        number of images labelled at once by single worker (Default is 1)
+    chunkSize : int
+        number of images in single part file (Default is chosen to give 16 chunks per worker)
+    groupSize : int
+        number of images of single object to chain warm starts over, chunks never split objects, see `labelImages` (Default is None)
+    metrics : Metrics
+        metrics that receive time of stages of labelling from all workers and report its progress instead of progress bar (Optional)
+    dtype : numpy.dtype
+        floating point type of Chambolle iterations, see `labelImages` (Default is float64)
+    cache : LabelCache
+        cache of results shared by all workers, see `labelImages` (Optional)
+    tileMemory : int
+        memory for tiles of single image in bytes for images larger than memory, see `labelImages` (Default is None)
+    '''
+    partsFolder = outputFile + ".parts"
+    os.makedirs(partsFolder, exist_ok = True)
+
+    labels = readLabels(outputFile)
+    for partFile in glob.glob(os.path.join(partsFolder, PART_PATTERN)):
+        labels.update(readLabels(partFile))
+
+    pending = [i for i in range(starting_image, starting_image + number_of_images) if i not in labels]
+    if chunkSize is None:
+        chunkSize = max(batch_size, len(pending) // (16 * workers))
+    chunks = []
+    for group in groupImages(pending, groupSize):
+        if len(chunks) == 0 or len(chunks[-1]) >= chunkSize:
+            chunks.append([])
+        chunks[-1].extend(group)
+    partFiles = [os.path.join(partsFolder, "part_{:010d}.csv".format(chunk[0])) for chunk in chunks]
+
+    total = number_of_images
+    done = number_of_images - len(pending)
+    if len(pending) > 0:
+        reportProgress(metrics, done, total, "Chambolle labelling progress: ")
+
+    if workers > 1 and len(chunks) > 0:
+        # Kernels are compiled once here, workers load them from the disk cache
+        warmupChambolle()
+        # Numba threading layer does not survive fork, so workers are always spawned
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers = workers, mp_context = context, initializer = _initLabeller, initargs = (images_folder,)) as executor:
+            futures = [executor.submit(_labelChunk, chunk, version, batch_size, groupSize, partFile, metrics, dtype, cache, tileMemory) for chunk, partFile in zip(chunks, partFiles)]
+            for future in as_completed(futures):
+                count, snapshot = future.result()
+                done += count
+                if metrics is not None:
+                    metrics.merge(snapshot)
+                reportProgress(metrics, done, total, "Chambolle labelling progress: ")
+    elif len(chunks) > 0:
+        _initLabeller(images_folder)
+        for chunk, partFile in zip(chunks, partFiles):
+            count, snapshot = _labelChunk(chunk, version, batch_size, groupSize, partFile, metrics, dtype, cache, tileMemory)
+            done += count
+            # Chunk drains metrics it was given, in this process they are put back
+            if metrics is not None:
+                metrics.merge(snapshot)
+            reportProgress(metrics, done, total, "Chambolle labelling progress: ")
+
+    mergeLabels(outputFile)
+
+def mergeLabels(outputFile):
+    '''
+    Function that merges part files of `runLabelling` into csv file `outputFile` and removes them.
+    Lines are sorted by number of the image and every image is written once.
+
+    Parameters
+    ----------
+    outputFile : str
+        path to the csv file with results
+    '''
+    partsFolder = outputFile + ".parts"
+    partFiles = glob.glob(os.path.join(partsFolder, PART_PATTERN))
+
+    labels = readLabels(outputFile)
+    for partFile in partFiles:
+        labels.update(readLabels(partFile))
+    _writeAtomic(outputFile, [labels[i] for i in sorted(labels)])
+
+    for partFile in partFiles:
+        os.remove(partFile)
+    if os.path.isdir(partsFolder) and len(os.listdir(partsFolder)) == 0:
+        os.rmdir(partsFolder)
@@ -0,0 +1,40 @@
+import numpy as np
+
+def resolveSeed(seed = None):
+    '''
+    Function that turns seed given by user into integer root seed of the generation run.
+
+    Parameters
+    ----------
+    seed : None, int or numpy.random.Generator
+        seed of the run, if None fresh entropy is drawn from the OS and if Generator root seed is drawn from it
+
+    Returns:
+    ----------
+    rootSeed : int
+        integer root seed from which all per-sample random streams are derived
+    '''
+    if seed is None:
+        return np.random.SeedSequence().entropy
+    if isinstance(seed, np.random.Generator):
+        return int(seed.integers(2**63))
+    return int(seed)
+
+def sampleGenerator(rootSeed, index):
+    '''
+    Function that returns random generator of single sample.
+    Stream depends only on root seed and sample index, so any sample can be regenerated without replaying the run.
+
+    Parameters
+    ----------
+    rootSeed : int
+        root seed of the generation run
+    index : int
+        number of the sample
+
+    Returns:
+    ----------
+    rng : numpy.random.Generator
+        random generator of the sample
+    '''
+    return np.random.Generator(np.random.PCG64(np.random.SeedSequence(rootSeed, spawn_key = (index,))))
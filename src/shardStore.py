@@ -0,0 +1,318 @@
+import glob
+import json
+import os
+import numpy as np
+
+SHARD_PATTERN = "shard_*.npz"
+METADATA_FILE = "metadata.json"
+
+def isShardStore(folder):
+    '''
+    Function that checks if folder contains shards written by `ShardWriter`.
+
+    Parameters
+    ----------
+    folder : str
+        path to folder
+
+    Returns:
+    ----------
+    result : bool
+        True if there is at least one shard in the folder
+    '''
+    return len(glob.glob(os.path.join(folder, SHARD_PATTERN))) > 0
+
+class ShardWriter:
+    """
+    A class used to stream generated samples into chunked array shards
+
+    ...
+
+    Samples are buffered and written as `shard_<first index>.npz` files that hold float32 arrays
+    `interferogram_<position>` and `fringes_<position>` of every sample, vector `index` of sample numbers
+    and JSON encoded `params` of every sample. Every sample is separate member of the archive, compressed on its own,
+    so single sample is read without reading the rest of the shard.
+    Metadata of the whole run, e.g. its root seed, is written to `metadata.json` next to the shards.
+    Shards are written to temporary file and renamed, so a shard is either complete or missing.
+    Writer can be sent to worker processes, every copy buffers and writes its own shards.
+
+    Attributes
+    ----------
+    _folder : str
+        path to folder with shards
+    _shardSize : int
+        maximal number of samples in single shard
+    _compressed : bool
+        True if shards are compressed
+
+    Methods
+    -------
+    append(index, interferogram, fringes = None, params = None)
+        Adds sample to the current shard
+    writeMetadata(metadata)
+        Writes metadata of the run
+    flush()
+        Writes buffered samples as shard
+    close()
+        Writes buffered samples, writer can not be used afterwards
+    """
+
+    def __init__(self, folder, shardSize = 256, compressed = False):
+        """
+        Parameters
+        ----------
+        folder : str
+            Path to folder with shards, it is created if it does not exist
+        shardSize : int
+            Maximal number of samples in single shard
+        compressed : bool
+            Set to True to compress shards
+        """
+        self._folder = folder
+        self._shardSize = shardSize
+        self._compressed = compressed
+        self._clear()
+        os.makedirs(folder, exist_ok = True)
+
+    def _clear(self):
+        '''
+        Empties buffer of samples
+        '''
+        self._indices = []
+        self._interferograms = []
+        self._fringes = []
+        self._params = []
+
+    def __getstate__(self):
+        '''
+        Only settings are copied, buffered samples stay in the process that generated them
+        '''
+        return {'_folder': self._folder, '_shardSize': self._shardSize, '_compressed': self._compressed}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def append(self, index, interferogram, fringes = None, params = None):
+        '''
+        Adds sample to the current shard, shard is written when it is full
+
+        Parameters
+        ----------
+        index : int
+            number of the sample
+        interferogram : numpy.ndarray
+            interferogram, it is copied as float32
+        fringes : numpy.ndarray
+            reference fringes without background function (Optional)
+        params : dict
+            JSON serializable parameters of the sample (Optional)
+        '''
+        self._indices.append(index)
+        self._interferograms.append(np.array(interferogram, dtype=np.float32))
+        self._fringes.append(None if fringes is None else np.array(fringes, dtype=np.float32))
+        self._params.append(json.dumps(params))
+
+        if len(self._indices) >= self._shardSize:
+            self.flush()
+
+    def writeMetadata(self, metadata):
+        '''
+        Writes metadata of the run, replaces metadata written before
+
+        Parameters
+        ----------
+        metadata : dict
+            JSON serializable metadata, e.g. root seed of the run
+        '''
+        filename = os.path.join(self._folder, METADATA_FILE)
+        temporary = filename + ".tmp"
+        with open(temporary, 'w') as file:
+            json.dump(metadata, file)
+        os.replace(temporary, filename)
+
+    def flush(self):
+        '''
+        Writes buffered samples as shard
+        '''
+        if len(self._indices) == 0:
+            return
+
+        arrays = {
+            'index': np.array(self._indices, dtype=np.int64),
+            'params': np.array(self._params),
+        }
+        withFringes = all(fringes is not None for fringes in self._fringes)
+        for position, (interferogram, fringes) in enumerate(zip(self._interferograms, self._fringes)):
+            arrays['interferogram_{}'.format(position)] = interferogram
+            if withFringes:
+                arrays['fringes_{}'.format(position)] = fringes
+
+        filename = os.path.join(self._folder, "shard_{:010d}.npz".format(self._indices[0]))
+        temporary = filename + ".tmp"
+        with open(temporary, 'wb') as file:
+            if self._compressed:
+                np.savez_compressed(file, **arrays)
+            else:
+                np.savez(file, **arrays)
+        os.replace(temporary, filename)
+        self._clear()
+
+    def close(self):
+        '''
+        Writes buffered samples, writer can not be used afterwards
+        '''
+        self.flush()
+
+class ShardReader:
+    """
+    A class used to read samples written by `ShardWriter`
+
+    ...
+
+    Only vectors of sample numbers are read when reader is created. The last used shard is kept open
+    and only arrays of requested sample are read from it, so random access does not read whole shards.
+    Shards of earlier versions hold stacks of all samples, they are loaded whole and the last used one is kept in memory.
+
+    Attributes
+    ----------
+    _folder : str
+        path to folder with shards
+    _files : list
+        paths of shards
+    _location : dict
+        maps number of sample to pair (number of shard, position in shard)
+
+    Methods
+    -------
+    indices()
+        Returns sorted numbers of stored samples
+    metadata()
+        Returns metadata of the run
+    shards()
+        Iterates over whole shards
+    close()
+        Closes the last used shard
+    """
+
+    def __init__(self, folder):
+        """
+        Parameters
+        ----------
+        folder : str
+            Path to folder with shards
+        """
+        self._folder = folder
+        self._files = sorted(glob.glob(os.path.join(folder, SHARD_PATTERN)))
+        self._location = {}
+        for shardNum, filename in enumerate(self._files):
+            with np.load(filename) as shard:
+                for position, index in enumerate(shard['index']):
+                    self._location[int(index)] = (shardNum, position)
+        self._openNum = None
+        self._shard = None
+        self._names = None
+        self._params = None
+
+    def __len__(self):
+        return len(self._location)
+
+    def __contains__(self, index):
+        return index in self._location
+
+    def indices(self):
+        '''
+        Returns sorted numbers of stored samples
+        '''
+        return sorted(self._location)
+
+    def metadata(self):
+        '''
+        Returns metadata of the run written by `ShardWriter.writeMetadata`, empty dict if there is none
+        '''
+        filename = os.path.join(self._folder, METADATA_FILE)
+        if not os.path.exists(filename):
+            return {}
+        with open(filename) as file:
+            return json.load(file)
+
+    def _open(self, shardNum):
+        '''
+        Opens shard and reads parameters of its samples, keeps the last used shard open
+        '''
+        if self._openNum != shardNum:
+            self.close()
+            shard = np.load(self._files[shardNum])
+            self._names = set(shard.files)
+            self._params = [json.loads(str(p)) for p in shard['params']]
+            if 'interferogram' in self._names:
+                # Stacks of shards of earlier versions can not be read by samples
+                self._shard = {key: shard[key] for key in shard.files}
+                shard.close()
+            else:
+                self._shard = shard
+            self._openNum = shardNum
+
+    def _array(self, name, position):
+        '''
+        Returns array `name` of sample at `position` of the open shard, None if it was not stored
+        '''
+        if name in self._names:
+            return self._shard[name][position]
+        key = '{}_{}'.format(name, position)
+        return self._shard[key] if key in self._names else None
+
+    def __getitem__(self, index):
+        '''
+        Returns single sample
+
+        Parameters
+        ----------
+        index : int
+            number of the sample
+
+        Returns
+        -------
+        interferogram : numpy.ndarray
+            interferogram
+        fringes : numpy.ndarray
+            reference fringes, None if they were not stored
+        params : dict
+            parameters of the sample
+        '''
+        shardNum, position = self._location[index]
+        self._open(shardNum)
+        return self._array('interferogram', position), self._array('fringes', position), self._params[position]
+
+    def shards(self):
+        '''
+        Iterates over whole shards
+
+        Returns
+        -------
+        iterator : iterator
+            yields tuples (indices, interferograms, fringes, params) of every shard,
+            fringes are None if they were not stored
+        '''
+        for shardNum in range(len(self._files)):
+            self._open(shardNum)
+            indices = self._shard['index']
+            interferograms = np.stack([self._array('interferogram', position) for position in range(len(indices))])
+            fringes = [self._array('fringes', position) for position in range(len(indices))]
+            fringes = None if fringes[0] is None else np.stack(fringes)
+            yield indices, interferograms, fringes, self._params
+
+    def close(self):
+        '''
+        Closes the last used shard, it is opened again on the next use
+        '''
+        if self._shard is not None and not isinstance(self._shard, dict):
+            self._shard.close()
+        self._openNum = None
+        self._shard = None
@@ -0,0 +1,95 @@
+import time
+import numpy as np
+
+from src.chambolleProjection import chambolleProjection
+from src.chambolleProjectionAccelerated import chambolleProjectionFGP, chambolleProjectionPrimalDual
+from src.convergenceMonitor import TargetMonitor
+from src.warmup import warmupChambolle
+
+SOLVERS = {
+    "chambolle": chambolleProjection,
+    "fgp": chambolleProjectionFGP,
+    "primalDual": chambolleProjectionPrimalDual,
+}
+
+def solverBenchmark(load, indices, solvers = None, mi = 100, tau = 0.25, tol = 1e-5, maxIterations = 20000):
+    '''
+    Function that compares solvers of Chambolle projection by number of iterations and time they need to reach the same error.
+    For every image the target error is the error of result of `chambolleProjection` against reference image,
+    then every solver runs until its error against reference image is not larger than the target.
+    Error of the reference version is not monotonic, so solver that converges along different path may never reach the target,
+    then it stops after `maxIterations` and result is marked as not reached.
+
+    Parameters
+    ----------
+    load : function
+        function that takes number of the image and returns tuple (name, f, f_ref), see `imagePairLoader`
+    indices : list
+        numbers of images to be used
+    solvers : list
+        names of solvers from `SOLVERS` to compare (Default is all of them)
+    mi : float
+        regularization parameter that defines the separation of the energy between the fringes and noise components
+    tau : float
+        step value passed to every solver
+    tol : float
+        error tolerance of `chambolleProjection` which gives the target error
+    maxIterations : int
+        number of iterations after which solver gives up reaching the target (Default is 20000)
+
+    Returns:
+    ----------
+    results : list
+        dicts with keys `image`, `solver`, `target`, `rms`, `iterations`, `time` and `reached`, one for every image and solver
+    '''
+    if solvers is None:
+        solvers = list(SOLVERS)
+    # Compilation is not counted to the time of the first solve
+    warmupChambolle()
+
+    results = []
+    for i in indices:
+        name, f, f_ref = load(i)
+        target = chambolleProjection(f, f_ref, mi, tau, tol)[2]
+        for solver in solvers:
+            monitor = TargetMonitor(target, maxIterations)
+            start_time = time.perf_counter()
+            [_, iterations, rms] = SOLVERS[solver](f, f_ref, mi, tau, monitor = monitor)
+            stop_time = time.perf_counter()
+            results.append({
+                "image": name,
+                "solver": solver,
+                "target": float(target),
+                "rms": float(rms),
+                "iterations": int(iterations),
+                "time": stop_time - start_time,
+                "reached": bool(rms <= target),
+            })
+    return results
+
+def summarizeSolverBenchmark(results):
+    '''
+    Function that sums results of `solverBenchmark` over images for every solver.
+
+    Parameters
+    ----------
+    results : list
+        results of `solverBenchmark`
+
+    Returns:
+    ----------
+    summary : dict
+        maps name of solver to dict with keys `images`, `reached`, `iterations` and `time`,
+        iterations and time are medians over images where the target was reached
+    '''
+    summary = {}
+    for solver in dict.fromkeys(result["solver"] for result in results):
+        rows = [result for result in results if result["solver"] == solver]
+        reached = [result for result in rows if result["reached"]]
+        summary[solver] = {
+            "images": len(rows),
+            "reached": len(reached),
+            "iterations": float(np.median([result["iterations"] for result in reached])) if len(reached) > 0 else None,
+            "time": float(np.median([result["time"] for result in reached])) if len(reached) > 0 else None,
+        }
+    return summary
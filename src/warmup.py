@@ -0,0 +1,101 @@
+import numpy as np
+
+def warmupGeneration(size = 8):
+    '''
+    Function that compiles numba kernels used by interferogram generation by running them on tiny images.
+    Kernels are compiled with `cache=True`, so after the first run they are loaded from disk cache
+    and warm-up only makes sure that the loading happens before the generation starts. Both float64 and float32 generation is compiled.
+
+    Parameters
+    ----------
+    size : int
+        size of images used for warm-up (Default is 8)
+    '''
+    from src.InterferogramGenerator import InterferogramFromRandomPolynomials
+    from src.generateRandomPolynomial import drawPolynomialCoefficients, separablePolynomial
+    from src.generateSphericalObject import generateSphericalObject
+    from src.gauss_n import separableGauss
+    from src.imageWriter import encodeImage
+    from src.normalizeImage import normalizeImageStack
+
+    for dtype in (np.float64, np.float32):
+        generator = InterferogramFromRandomPolynomials(size, seed = 0, dtype = dtype)
+        X, Y = generator._X, generator._Y
+        rng = np.random.default_rng(0)
+
+        obj = generator._polynomial(drawPolynomialCoefficients(3, rng))
+        spObj = generateSphericalObject(X, Y, 0.0, 0.0, rng.integers(1, 2), rng.integers(1, 2))
+        backgrounds = np.empty((2, size, size), dtype = dtype)
+        separableGauss(generator._axis, generator._axis, 0.0, 0.0, 1.0, 3.0, backgrounds[0])
+        backgrounds[1] = generator._polynomial(drawPolynomialCoefficients(4, rng)) * generator._gauss
+        # Large images evaluate polynomials from the axes, see `monomialBasisFits`
+        separablePolynomial(generator._axis, generator._axis, drawPolynomialCoefficients(4, rng), backgrounds[1])
+        angles = np.zeros(2)
+        frequencies = np.ones(2)
+
+        generator.createInterferogram(0.0, 1, obj, normalized = True)
+        generator.createSphericalInterferogram(spObj, normalized = True)
+        images = generator.createInterferograms(angles, frequencies, obj, backgrounds, out = np.empty((2, size, size), dtype = dtype))
+        generator.createInterferograms(angles, frequencies, obj, normalized = True)
+        generator.createSphericalInterferograms(spObj, frequencies, backgrounds)
+        generator.createSphericalInterferograms(spObj, frequencies, normalized = True)
+        generator.createPhaseShiftedInterferograms(0.0, 1, obj, 2, normalized = True)
+        generator.createFrequencySweep(obj, 1.0, np.arange(1, 3), angles, backgrounds)
+        generator.createFrequencySweep(spObj, 1.0, np.arange(1, 3), normalized = True)
+
+        # Reference fringes are computed without background and noise
+        generator.setNoiseFunction(np.broadcast_to(dtype(0), X.shape))
+        generator.createInterferograms(angles, frequencies, obj, np.broadcast_to(dtype(0), images.shape), out = images)
+        generator.createSphericalInterferograms(spObj, frequencies, np.broadcast_to(dtype(0), images.shape), out = images)
+
+        normalizeImageStack(images, 255)
+        encodeImage(images[0])
+
+def warmupChambolle(size = 8):
+    '''
+    Function that compiles numba kernels used by CPU Chambolle projection by running them on tiny images.
+    Images are float64 when decoded from BMP or shards and read-only float32 views when read from memory-mapped dataset,
+    both cases are compiled for iterations in float64 and in float32.
+
+    Parameters
+    ----------
+    size : int
+        size of images used for warm-up (Default is 8)
+    '''
+    from src.chambolleProjection import chambolleProjection, chambolleProjectionStopCriterion
+    from src.chambolleProjectionBatch import chambolleProjectionBatch, chambolleProjectionStopCriterionBatch
+    from src.chambolleProjectionAccelerated import chambolleProjectionFGP, chambolleProjectionPrimalDual
+    from src.chambolleProjectionTiled import chambolleProjectionTiled, chambolleProjectionStopCriterionTiled
+
+    X, Y = np.meshgrid(np.linspace(-1, 1, size), np.linspace(-1, 1, size))
+    f_ref = np.cos(4 * X)
+    f = f_ref + X * Y
+
+    for dtype in (np.float64, np.float32):
+        view = f.astype(dtype)
+        view_ref = f_ref.astype(dtype)
+        view.setflags(write = False)
+        view_ref.setflags(write = False)
+        chambolleProjection(view, view_ref, tol = 1e-1)
+        chambolleProjectionStopCriterion(view, tol = 1e-1)
+        chambolleProjectionBatch(np.array([view]), np.array([view_ref]), tol = 1e-1)
+        chambolleProjectionStopCriterionBatch(np.array([view]), tol = 1e-1)
+        chambolleProjection(np.array(view), np.array(view_ref), tol = 1e-1)
+        chambolleProjectionFGP(view, view_ref, tol = 1e-1)
+        chambolleProjectionPrimalDual(view, view_ref, tol = 1e-1)
+        # Iterations in the dtype of the images
+        chambolleProjection(view, view_ref, tol = 1e-1, dtype = dtype)
+        chambolleProjectionStopCriterion(view, tol = 1e-1, dtype = dtype)
+        chambolleProjectionBatch(np.array([view]), np.array([view_ref]), tol = 1e-1, dtype = dtype)
+        chambolleProjectionStopCriterionBatch(np.array([view]), tol = 1e-1, dtype = dtype)
+        chambolleProjectionFGP(view, view_ref, tol = 1e-1, dtype = dtype)
+        chambolleProjectionPrimalDual(view, view_ref, tol = 1e-1, dtype = dtype)
+        chambolleProjectionTiled(view, view_ref, tol = 1e-1, workers = 1, dtype = dtype)
+        chambolleProjectionStopCriterionTiled(view, tol = 1e-1, workers = 1, dtype = dtype)
+
+def warmup():
+    '''
+    Function that compiles all numba kernels of the package, see `warmupGeneration` and `warmupChambolle`.
+    '''
+    warmupGeneration()
+    warmupChambolle()